@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Проверка совпадения выходов ONNX бэкенда с PyTorch для эмбеддера и реранкера."""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from dt_xml.config.settings import get_settings
+from dt_xml.runtime.onnx_backend import check_parity, load_model
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUERY = "смартфоны Samsung импорт из Китая"
+SAMPLE_TEXTS = [
+    "Товар: смартфоны Samsung Galaxy, код ТН ВЭД 8517130000, страна происхождения Вьетнам",
+    "Товар: планшетные компьютеры Apple iPad, код ТН ВЭД 8471300000, страна происхождения Китай",
+    "Отправитель: ТОО «Алматы Трейд», получатель: ООО «Импорт Логистик», таможенная процедура 40",
+    "Тауар: ұялы телефондар, шығарылған елі Қытай, кеден декларациясы",
+    "Фактурная стоимость 125000.00 USD, вес брутто 340 кг, количество мест 12",
+    "Товар: пылесосы бытовые с электродвигателем, код ТН ВЭД 8508110000",
+    "Условия поставки FCA Шанхай, транспорт морской, контейнер 40 футов",
+    "Сертификат соответствия ЕАЭС RU C-CN.АБ12.В.00123/24",
+]
+
+
+def check_embedder(backend: str, texts: list[str], min_cosine: float) -> bool:
+    """Сравнение эмбедингов PyTorch и ONNX модели.
+
+    Args:
+        backend: Проверяемый бэкенд.
+        texts: Тексты.
+        min_cosine: Минимально допустимое косинусное сходство.
+
+    Returns:
+        True, если расхождение в допуске.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    settings = get_settings().embedding
+    onnx_settings = settings.onnx
+    reference = load_model(SentenceTransformer, settings.model_name, device=settings.device)
+    candidate = load_model(
+        SentenceTransformer,
+        settings.model_name,
+        device=settings.device,
+        backend=backend,
+        export_dir=Path(onnx_settings.get("export_dir", "data/models/onnx")),
+        quantization_config=onnx_settings.get("quantization_config", "avx2"),
+    )
+
+    def encode(model):
+        return lambda inputs: model.encode(
+            list(inputs), normalize_embeddings=settings.normalize_embeddings, show_progress_bar=False
+        )
+
+    metrics = check_parity(encode(reference), encode(candidate), texts)
+    logger.info(f"Эмбеддер {settings.model_name} ({backend}): {metrics}")
+    return metrics["min_cosine"] >= min_cosine
+
+
+def check_reranker(backend: str, texts: list[str], min_order_agreement: float) -> bool:
+    """Сравнение скоров PyTorch и ONNX моделей реранкера.
+
+    Args:
+        backend: Проверяемый бэкенд.
+        texts: Тексты документов.
+        min_order_agreement: Минимально допустимая доля одинаково упорядоченных пар.
+
+    Returns:
+        True, если расхождение в допуске для всех моделей.
+    """
+    from sentence_transformers import CrossEncoder
+
+    from dt_xml.reranker.model_registry import RerankerRegistry
+
+    settings = get_settings().reranker
+    onnx_settings = settings.onnx
+    pairs = [(SAMPLE_QUERY, text) for text in texts]
+
+    passed = True
+    for model_name in RerankerRegistry(loader=lambda name: None).configured_models():
+        reference = load_model(CrossEncoder, model_name, device=settings.device)
+        candidate = load_model(
+            CrossEncoder,
+            model_name,
+            device=settings.device,
+            backend=backend,
+            export_dir=Path(onnx_settings.get("export_dir", "data/models/onnx")),
+            quantization_config=onnx_settings.get("quantization_config", "avx2"),
+        )
+
+        metrics = check_parity(
+            lambda inputs, model=reference: model.predict(list(inputs)),
+            lambda inputs, model=candidate: model.predict(list(inputs)),
+            pairs,
+        )
+        logger.info(f"Реранкер {model_name} ({backend}): {metrics}")
+        passed = passed and metrics["order_agreement"] >= min_order_agreement
+
+    return passed
+
+
+def main():
+    """Основная функция."""
+    parser = argparse.ArgumentParser(description="Проверка паритета ONNX и PyTorch бэкендов")
+    parser.add_argument("--backend", choices=["onnx", "onnx-int8"], default="onnx-int8")
+    parser.add_argument("--target", choices=["embedder", "reranker", "all"], default="all")
+    parser.add_argument("--texts", type=str, default=None, help="Файл с текстами (по одному на строку)")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-order-agreement", type=float, default=0.9)
+
+    args = parser.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        texts = [line.strip() for line in Path(args.texts).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    passed = True
+    if args.target in ("embedder", "all"):
+        passed = check_embedder(args.backend, texts, args.min_cosine) and passed
+    if args.target in ("reranker", "all"):
+        passed = check_reranker(args.backend, texts, args.min_order_agreement) and passed
+
+    if not passed:
+        logger.error("Выходы ONNX бэкенда расходятся с PyTorch сильнее допустимого")
+        sys.exit(1)
+
+    logger.info("Выходы ONNX бэкенда совпадают с PyTorch в пределах допуска")
+
+
+if __name__ == "__main__":
+    main()
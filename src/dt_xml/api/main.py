@@ -1,12 +1,23 @@
 """Основное FastAPI приложение."""
 
 import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from dt_xml.api.routes import health, index, schema, search
 from dt_xml.config.settings import get_settings
+from dt_xml.reranker.model_registry import get_reranker_registry
+from dt_xml.runtime.executors import (
+    get_inference_executor,
+    get_search_executor,
+    run_in_executor,
+    shutdown_executors,
+)
+from dt_xml.storage.database import dispose_engines
+from dt_xml.storage.metadata_store import get_metadata_store
 
 # Настройка логирования
 logging.basicConfig(
@@ -16,11 +27,32 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Жизненный цикл приложения: схема БД, прогрев моделей, освобождение клиентов и пулов."""
+    # Схема БД метаданных создается/мигрируется один раз при старте процесса;
+    # при недоступной БД API стартует, /health сообщает о деградации
+    try:
+        await run_in_executor(get_search_executor(), get_metadata_store().create_schema)
+    except Exception as e:
+        logger.error(f"Не удалось подготовить схему БД метаданных: {e}")
+
+    if get_settings().reranker.warmup:
+        await run_in_executor(get_inference_executor(), get_reranker_registry().warmup)
+    yield
+    await search.hybrid_search.aclose()
+    get_reranker_registry().close()
+    await dispose_engines()
+    shutdown_executors()
+
+
 # Создание приложения
 app = FastAPI(
     title="DT-XML API",
     description="API для поиска по таможенным декларациям ЕАЭС",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Настройка CORS
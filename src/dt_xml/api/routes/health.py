@@ -4,8 +4,8 @@ from fastapi import APIRouter
 
 from dt_xml.api.schemas.response import HealthResponse
 from dt_xml.config.settings import get_settings
-from dt_xml.storage.metadata_store import MetadataStore
-from dt_xml.storage.vector_store import VectorStore
+from dt_xml.storage.metadata_store import get_metadata_store
+from dt_xml.storage.vector_backend import create_vector_store
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -20,7 +20,7 @@ async def health_check() -> HealthResponse:
     # Проверка векторной БД
     vector_db_info = {}
     try:
-        vector_store = VectorStore()
+        vector_store = create_vector_store()
         vector_db_info = vector_store.get_collection_info()
     except Exception as e:
         status = "degraded"
@@ -29,27 +29,37 @@ async def health_check() -> HealthResponse:
     # Проверка метаданных БД
     metadata_db_info = {}
     try:
-        metadata_store = MetadataStore()
-        # Простая проверка подключения
-        metadata_db_info = {"status": "connected"}
+        # Запрос через общий асинхронный пул соединений
+        metadata_db_info = await get_metadata_store().aping()
     except Exception as e:
         status = "degraded"
         metadata_db_info = {"error": str(e)}
 
-    # Информация о модели эмбедингов
+    # Информация о модели эмбедингов (включая счетчики кэша эмбедингов)
     embedding_model_info = {}
     try:
-        from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder
+        from dt_xml.embedding.multilingual_embedder import get_embedder
 
-        embedder = MultilingualEmbedder()
-        embedding_model_info = embedder.get_model_info()
+        embedding_model_info = get_embedder().get_model_info()
     except Exception as e:
         status = "degraded"
         embedding_model_info = {"error": str(e)}
 
+    # Состояние и задержки моделей реранкера
+    from dt_xml.reranker.model_registry import RerankerModel, get_reranker_registry
+    from dt_xml.reranker.score_cache import get_rerank_score_cache
+
+    reranker_info = {
+        "models": get_reranker_registry().get_stats(),
+        "score_cache": get_rerank_score_cache().get_stats(),
+    }
+    if any(model["state"] == RerankerModel.FAILED for model in reranker_info["models"].values()):
+        status = "degraded"
+
     return HealthResponse(
         status=status,
         vector_db=vector_db_info,
         metadata_db=metadata_db_info,
         embedding_model=embedding_model_info,
+        reranker=reranker_info,
     )
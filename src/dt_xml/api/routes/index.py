@@ -1,5 +1,6 @@
 """Эндпоинт индексации деклараций."""
 
+import asyncio
 import uuid
 from datetime import datetime
 
@@ -8,14 +9,16 @@ from fastapi import APIRouter, HTTPException
 from dt_xml.api.schemas.response import IndexResponse
 from dt_xml.api.schemas.search import IndexRequest
 from dt_xml.chunker.semantic_chunker import SemanticChunker
-from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder
+from dt_xml.embedding.batcher import get_embedding_batcher
 from dt_xml.normalizer.field_normalizer import FieldNormalizer
 from dt_xml.ocr.ocr_processor import OCRProcessor
 from dt_xml.parser.xml_parser import XMLParser
+from dt_xml.runtime.executors import get_search_executor, run_in_executor
 from dt_xml.schema.schema_manager import SchemaManager
+from dt_xml.search.sparse_search import SparseSearch
 from dt_xml.storage.document_store import DocumentStore
-from dt_xml.storage.metadata_store import MetadataStore
-from dt_xml.storage.vector_store import VectorStore
+from dt_xml.storage.metadata_store import get_metadata_store
+from dt_xml.storage.vector_backend import create_vector_store
 
 router = APIRouter(prefix="/index", tags=["index"])
 
@@ -24,10 +27,11 @@ schema_manager = SchemaManager()
 parser = XMLParser(schema_manager=schema_manager)
 normalizer = FieldNormalizer()
 chunker = SemanticChunker()
-embedder = MultilingualEmbedder()
+embedding_batcher = get_embedding_batcher()
 ocr_processor = OCRProcessor(schema_manager=schema_manager)
-vector_store = VectorStore()
-metadata_store = MetadataStore()
+vector_store = create_vector_store()
+sparse_search = SparseSearch()
+metadata_store = get_metadata_store()
 document_store = DocumentStore()
 
 
@@ -69,19 +73,34 @@ async def index_declaration(request: IndexRequest) -> IndexResponse:
         # Чанкование
         chunks = chunker.chunk_declaration(declaration_id, text, normalized_data)
 
-        # Генерация эмбедингов
-        chunk_texts = [chunk.content for chunk in chunks]
-        embeddings = embedder.embed_batch(chunk_texts)
+        # Запись в индексы блокирующая и выполняется в пуле потоков поиска
+        executor = get_search_executor()
 
-        # Сохранение в векторную БД
-        vector_store.add_chunks(chunks, embeddings)
+        # Сравнение с проиндексированными чанками декларации
+        indexed = await run_in_executor(executor, vector_store.get_chunk_hashes, [declaration_id])
+        existing = indexed.get(declaration_id, {})
+        changed_chunks, stale_point_ids = vector_store.diff_chunks(chunks, existing)
+
+        # Генерация эмбедингов для новых и измененных чанков
+        # (чанки конкурентных запросов объединяются в общий батч)
+        chunk_texts = [chunk.content for chunk in changed_chunks]
+        embeddings = await embedding_batcher.aembed_batch(chunk_texts) if chunk_texts else []
+
+        # Сохранение в векторную БД и обновление индекса BM25
+        await asyncio.gather(
+            run_in_executor(executor, vector_store.add_chunks, changed_chunks, embeddings),
+            run_in_executor(executor, sparse_search.index_chunks, chunks),
+        )
+        await run_in_executor(executor, vector_store.delete_points, stale_point_ids)
 
         # Сохранение метаданных
-        metadata = parser.to_metadata(normalized_data)
-        metadata_store.save_metadata(metadata, declaration_id)
+        metadata = parser.to_metadata(normalized_data, tenant_id=tenant_id)
+        await metadata_store.asave_metadata(metadata, declaration_id)
 
         # Сохранение оригинального документа
-        document_store.save_document(declaration_id, normalized_data, metadata.model_dump())
+        await run_in_executor(
+            executor, document_store.save_document, declaration_id, normalized_data, metadata.model_dump()
+        )
 
         return IndexResponse(
             declaration_id=declaration_id,
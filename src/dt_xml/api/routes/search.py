@@ -6,6 +6,7 @@ from fastapi import APIRouter, HTTPException
 
 from dt_xml.api.schemas.response import SearchResponse, SearchResultResponse
 from dt_xml.api.schemas.search import SearchRequest
+from dt_xml.reranker.adaptive_reranker import get_adaptive_reranker
 from dt_xml.reranker.explainability import Explainability
 from dt_xml.search.hybrid_search import HybridSearch
 from dt_xml.temporal.temporal_awareness import TemporalAwareness
@@ -16,6 +17,7 @@ router = APIRouter(prefix="/search", tags=["search"])
 hybrid_search = HybridSearch()
 temporal_awareness = TemporalAwareness()
 explainability = Explainability()
+reranker = get_adaptive_reranker()
 
 
 @router.post("/", response_model=SearchResponse)
@@ -25,7 +27,7 @@ async def search(request: SearchRequest) -> SearchResponse:
 
     try:
         # Гибридный поиск
-        results = hybrid_search.search(
+        results = await hybrid_search.asearch(
             query=request.query,
             top_k=request.top_k,
             filters=request.filters,
@@ -33,20 +35,22 @@ async def search(request: SearchRequest) -> SearchResponse:
 
         # Реранкинг, если включен
         if request.rerank and results:
-            from dt_xml.reranker.adaptive_reranker import AdaptiveReranker
-
-            reranker = AdaptiveReranker()
             documents = [r.get("content", "") for r in results]
-            reranked = reranker.rerank(request.query, documents, top_k=request.top_k)
-
-            # Обновление результатов с новыми скорами
-            for i, rerank_result in enumerate(reranked):
-                if i < len(results):
-                    results[i]["score"] = rerank_result["score"]
-                    results[i]["rerank_info"] = {
-                        "complexity": rerank_result.get("complexity"),
-                        "model_used": rerank_result.get("model_used"),
+            reranked = await reranker.arerank(request.query, documents, top_k=request.top_k)
+
+            # Порядок и скоры результатов по реранкеру
+            if reranked:
+                results = [
+                    {
+                        **results[rerank_result["index"]],
+                        "score": rerank_result["score"],
+                        "rerank_info": {
+                            "complexity": rerank_result.get("complexity"),
+                            "model_used": rerank_result.get("model_used"),
+                        },
                     }
+                    for rerank_result in reranked
+                ]
 
         # Применение временной осведомленности
         for result in results:
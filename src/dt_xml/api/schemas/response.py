@@ -43,3 +43,4 @@ class HealthResponse(BaseModel):
     vector_db: dict[str, Any] = Field(default_factory=dict)
     metadata_db: dict[str, Any] = Field(default_factory=dict)
     embedding_model: dict[str, Any] = Field(default_factory=dict)
+    reranker: dict[str, Any] = Field(default_factory=dict)
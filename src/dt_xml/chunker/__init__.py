@@ -1,6 +1,6 @@
 """Модуль чанкования документов."""
 
-from dt_xml.chunker.semantic_chunker import SemanticChunker
+from dt_xml.chunker.semantic_chunker import SemanticChunker, make_chunk_id
 from dt_xml.chunker.section_extractor import SectionExtractor
 
-__all__ = ["SemanticChunker", "SectionExtractor"]
+__all__ = ["SemanticChunker", "SectionExtractor", "make_chunk_id"]
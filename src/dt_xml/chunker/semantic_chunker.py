@@ -2,22 +2,53 @@
 
 import logging
 import uuid
+from datetime import date
 from typing import Any
 
 from dt_xml.chunker.section_extractor import SectionExtractor
 from dt_xml.config.models import DeclarationChunk
-from dt_xml.config.settings import get_settings
+from dt_xml.config.settings import Settings, get_settings
 
 logger = logging.getLogger(__name__)
 
+# Пространство имен UUIDv5 для идентификаторов чанков
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2a4e-8d3b-5e7f-9a10-2b4c6d8e0f12")
+
+
+def make_chunk_id(declaration_id: str, section: str | None, chunk_index: int) -> str:
+    """Детерминированный идентификатор чанка.
+
+    Идентификатор зависит только от декларации, секции и номера чанка, поэтому
+    при повторной индексации чанк получает тот же идентификатор и перезаписывает
+    прежнюю точку, а не добавляет дубликат.
+
+    Args:
+        declaration_id: Идентификатор декларации.
+        section: Название секции.
+        chunk_index: Номер чанка в декларации.
+
+    Returns:
+        UUIDv5 в строковом виде.
+    """
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{declaration_id}\x1f{section or ''}\x1f{chunk_index}"))
+
 
 class SemanticChunker:
     """Семантическое чанкование документов с сохранением контекста."""
 
-    def __init__(self):
-        """Инициализация чанкера."""
-        self.settings = get_settings()
-        self.section_extractor = SectionExtractor()
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        section_extractor: SectionExtractor | None = None,
+    ):
+        """Инициализация чанкера.
+
+        Args:
+            settings: Настройки приложения. Если None, общие настройки процесса.
+            section_extractor: Экстрактор секций. Если None, создается новый.
+        """
+        self.settings = settings or get_settings()
+        self.section_extractor = section_extractor or SectionExtractor()
         self.chunk_size = self.settings.chunking.chunk_size
         self.chunk_overlap = self.settings.chunking.chunk_overlap
         self.min_chunk_size = self.settings.chunking.min_chunk_size
@@ -48,8 +79,35 @@ class SemanticChunker:
             # Простое чанкование по размеру
             chunks = self._chunk_by_size(declaration_id, text, data)
 
+        # Поля фильтрации декларации копируются в каждый чанк
+        filter_fields = self._filter_fields(data)
+        for chunk in chunks:
+            for key, value in filter_fields.items():
+                chunk.metadata.setdefault(key, value)
+
         return chunks
 
+    def _filter_fields(self, data: dict[str, Any] | None) -> dict[str, Any]:
+        """Значения полей фильтрации по метаданным.
+
+        Args:
+            data: Структурированные данные декларации.
+
+        Returns:
+            Словарь поле → значение (даты в формате ISO 8601).
+        """
+        metadata_filters = self.settings.search.metadata_filters
+        if not data or not metadata_filters.get("enabled", True):
+            return {}
+
+        fields: dict[str, Any] = {}
+        for key in metadata_filters.get("fields", []):
+            value = data.get(key)
+            if value is None or value == "":
+                continue
+            fields[key] = value.isoformat() if isinstance(value, date) else value
+        return fields
+
     def _chunk_by_sections(
         self,
         declaration_id: str,
@@ -86,7 +144,7 @@ class SemanticChunker:
                 )
                 for sub_chunk_content in sub_chunks:
                     chunk = DeclarationChunk(
-                        chunk_id=str(uuid.uuid4()),
+                        chunk_id=make_chunk_id(declaration_id, section_name, chunk_index),
                         declaration_id=declaration_id,
                         content=sub_chunk_content,
                         section=section_name,
@@ -103,7 +161,7 @@ class SemanticChunker:
                 # Секция помещается в один чанк
                 if len(section_content) >= self.min_chunk_size:
                     chunk = DeclarationChunk(
-                        chunk_id=str(uuid.uuid4()),
+                        chunk_id=make_chunk_id(declaration_id, section_name, chunk_index),
                         declaration_id=declaration_id,
                         content=section_content,
                         section=section_name,
@@ -141,7 +199,7 @@ class SemanticChunker:
             # Если текст слишком короткий, создаем один чанк
             if text:
                 chunk = DeclarationChunk(
-                    chunk_id=str(uuid.uuid4()),
+                    chunk_id=make_chunk_id(declaration_id, None, 0),
                     declaration_id=declaration_id,
                     content=text,
                     section=None,
@@ -163,7 +221,7 @@ class SemanticChunker:
             # Если достигли размера чанка
             if len(current_chunk_text) >= self.chunk_size:
                 chunk = DeclarationChunk(
-                    chunk_id=str(uuid.uuid4()),
+                    chunk_id=make_chunk_id(declaration_id, None, chunk_index),
                     declaration_id=declaration_id,
                     content=current_chunk_text,
                     section=None,
@@ -185,7 +243,7 @@ class SemanticChunker:
             remaining_text = " ".join(current_chunk_words)
             if len(remaining_text) >= self.min_chunk_size:
                 chunk = DeclarationChunk(
-                    chunk_id=str(uuid.uuid4()),
+                    chunk_id=make_chunk_id(declaration_id, None, chunk_index),
                     declaration_id=declaration_id,
                     content=remaining_text,
                     section=None,
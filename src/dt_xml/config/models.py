@@ -43,6 +43,7 @@ class DeclarationMetadata(BaseModel):
     language: str = "ru"
     version: str = "1.0"
     source: str | None = None
+    tenant_id: str = "default"
     processed_at: datetime | None = None
 
     class Config:
@@ -19,11 +19,17 @@ class DatabaseSettings(BaseSettings):
     password: str = Field(default="", validation_alias="POSTGRES_PASSWORD")
     pool_size: int = 10
     max_overflow: int = 20
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    bulk_batch_size: int = 1000
+    stream_page_size: int = 10000
+    stream_batch_size: int = 1000
 
     @property
     def url(self) -> str:
         """URL подключения к базе данных."""
-        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+        return f"postgresql+psycopg://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
 
 
 class VectorDBSettings(BaseSettings):
@@ -35,6 +41,34 @@ class VectorDBSettings(BaseSettings):
     grpc_port: int = 6334
     collection_name: str = "declarations"
     vector_size: int = 1024
+    prefer_grpc: bool = True
+    upload_batch_size: int = 256
+    upload_parallel: int = 4
+    upload_parallel_min_points: int = 10000
+    delete_batch_size: int = 1000
+    on_disk_vectors: bool = False
+    hnsw: dict[str, Any] = Field(
+        default_factory=lambda: {"m": 16, "ef_construct": 100, "on_disk": False, "ef": 128}
+    )
+    quantization: dict[str, Any] = Field(
+        default_factory=lambda: {
+            "type": "none",
+            "quantile": 0.99,
+            "always_ram": True,
+            "rescore": True,
+            "oversampling": 2.0,
+        }
+    )
+    local: dict[str, Any] = Field(
+        default_factory=lambda: {
+            "path": "data/processed/vectors",
+            "index": "exact",
+            "nlist": 0,
+            "nprobe": 8,
+            "ivf_min_rows": 10000,
+            "compact_ratio": 0.3,
+        }
+    )
 
 
 class EmbeddingSettings(BaseSettings):
@@ -44,7 +78,23 @@ class EmbeddingSettings(BaseSettings):
     device: str = "cpu"
     batch_size: int = 32
     max_length: int = 8192
+    token_budget: int = 16384
     normalize_embeddings: bool = True
+    backend: str = "torch"
+    onnx: dict[str, Any] = Field(
+        default_factory=lambda: {"export_dir": "data/models/onnx", "quantization_config": "avx2"}
+    )
+    batcher_max_wait_ms: float = 10.0
+    query_cache_max_entries: int = 10_000
+    query_cache_ttl_seconds: float = 3600.0
+    cache: dict[str, Any] = Field(
+        default_factory=lambda: {
+            "enabled": True,
+            "path": "data/cache/embeddings",
+            "max_entries": 100_000,
+            "flush_every": 1000,
+        }
+    )
 
 
 class RerankerSettings(BaseSettings):
@@ -52,14 +102,26 @@ class RerankerSettings(BaseSettings):
 
     model_name: str = "BAAI/bge-reranker-v2-m3"
     device: str = "cpu"
+    backend: str = "torch"
+    onnx: dict[str, Any] = Field(
+        default_factory=lambda: {"export_dir": "data/models/onnx", "quantization_config": "avx2"}
+    )
     batch_size: int = 16
     top_k: int = 100
+    warmup: bool = True
+    batcher_max_batch_size: int = 64
+    batcher_max_wait_ms: float = 5.0
+    score_cache_max_entries: int = 100_000
+    score_cache_ttl_seconds: float = 3600.0
     adaptive: dict[str, Any] = Field(
         default_factory=lambda: {
             "enabled": True,
             "complexity_threshold": 0.7,
             "simple_model": "BAAI/bge-reranker-base",
             "complex_model": "BAAI/bge-reranker-v2-m3",
+            "cascade": True,
+            "cascade_top_n": 20,
+            "cascade_latency_budget_ms": 0,
         }
     )
 
@@ -71,7 +133,18 @@ class SearchSettings(BaseSettings):
     rerank_top_k: int = 10
     hybrid_alpha: float = 0.5
     sparse: dict[str, Any] = Field(
-        default_factory=lambda: {"enabled": True, "k1": 1.5, "b": 0.75}
+        default_factory=lambda: {
+            "enabled": True,
+            "k1": 1.5,
+            "b": 0.75,
+            "index_path": "data/processed/bm25",
+            "max_segments": 10,
+            "merge_factor": 10,
+            "analyzer": "morphology",
+            "lemmatize": True,
+            "stop_words": True,
+            "lemma_cache_size": 100_000,
+        }
     )
     dense: dict[str, Any] = Field(
         default_factory=lambda: {"enabled": True, "similarity_threshold": 0.0}
@@ -87,6 +160,17 @@ class SearchSettings(BaseSettings):
                 "product_code",
                 "country_origin",
             ],
+            # Тип payload индекса Qdrant для поля (по умолчанию keyword)
+            "field_types": {"date_issued": "datetime"},
+        }
+    )
+    fuzzy_filters: dict[str, Any] = Field(
+        default_factory=lambda: {
+            "enabled": True,
+            # Поля, допускающие фильтр {"match": "..."} (нечеткий поиск по названию)
+            "fields": ["manufacturer", "importer", "exporter"],
+            "min_similarity": 0.4,
+            "max_candidates": 1000,
         }
     )
 
@@ -134,6 +218,8 @@ class APISettings(BaseSettings):
     port: int = 8000
     reload: bool = True
     workers: int = 1
+    inference_workers: int = 2
+    search_workers: int = 4
     cors_enabled: bool = True
     cors_origins: list[str] = Field(default_factory=lambda: ["*"])
 
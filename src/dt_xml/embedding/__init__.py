@@ -1,5 +1,6 @@
 """Модуль генерации эмбедингов."""
 
-from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder
+from dt_xml.embedding.batcher import EmbeddingBatcher, get_embedding_batcher
+from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder, get_embedder
 
-__all__ = ["MultilingualEmbedder"]
+__all__ = ["MultilingualEmbedder", "EmbeddingBatcher", "get_embedder", "get_embedding_batcher"]
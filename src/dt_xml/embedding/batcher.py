@@ -0,0 +1,109 @@
+"""Батчинг запросов на эмбединг между декларациями."""
+
+import logging
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+from dt_xml.config.settings import get_settings
+from dt_xml.runtime.batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Сборщик чанков разных деклараций в общий батч эмбединга.
+
+    Индексация одной декларации дает 3–6 чанков, что загружает лишь малую часть
+    батча модели. Батчер объединяет чанки конкурентных запросов до
+    embedding.batch_size или до истечения embedding.batcher_max_wait_ms и
+    возвращает каждому запросу его срез эмбедингов.
+    """
+
+    def __init__(
+        self,
+        embedder: Any | None = None,
+        max_batch_size: int | None = None,
+        max_wait_ms: float | None = None,
+    ):
+        """Инициализация батчера.
+
+        Args:
+            embedder: Эмбеддер с методом embed_batch. Если None, используется общий эмбеддер.
+            max_batch_size: Максимальное количество текстов в батче. Если None, из настроек.
+            max_wait_ms: Максимальное время ожидания добора батча. Если None, из настроек.
+        """
+        self.settings = get_settings()
+        if embedder is None:
+            from dt_xml.embedding.multilingual_embedder import get_embedder
+
+            embedder = get_embedder()
+        self.embedder = embedder
+        self.batcher: MicroBatcher[str, np.ndarray] = MicroBatcher(
+            self._embed,
+            max_batch_size=max_batch_size or self.settings.embedding.batch_size,
+            max_wait_ms=(
+                max_wait_ms if max_wait_ms is not None else self.settings.embedding.batcher_max_wait_ms
+            ),
+            name="embedding-batcher",
+        )
+
+    def _embed(self, texts: list[str]) -> list[np.ndarray]:
+        """Генерация эмбедингов для собранного батча.
+
+        Args:
+            texts: Тексты всех запросов батча.
+
+        Returns:
+            Список эмбедингов.
+        """
+        return self.embedder.embed_batch(texts, batch_size=len(texts))
+
+    def submit(self, texts: list[str]) -> Future[list[np.ndarray]]:
+        """Постановка текстов в очередь на эмбединг.
+
+        Args:
+            texts: Тексты чанков одной декларации.
+
+        Returns:
+            Future со списком эмбедингов.
+        """
+        return self.batcher.submit(texts)
+
+    def embed_batch(self, texts: list[str]) -> list[np.ndarray]:
+        """Синхронная генерация эмбедингов через общий батч.
+
+        Args:
+            texts: Тексты чанков.
+
+        Returns:
+            Список эмбедингов в порядке текстов.
+        """
+        return self.batcher.process(texts)
+
+    async def aembed_batch(self, texts: list[str]) -> list[np.ndarray]:
+        """Асинхронная генерация эмбедингов через общий батч.
+
+        Args:
+            texts: Тексты чанков.
+
+        Returns:
+            Список эмбедингов в порядке текстов.
+        """
+        return await self.batcher.aprocess(texts)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение статистики батчинга.
+
+        Returns:
+            Словарь со статистикой.
+        """
+        return self.batcher.get_stats()
+
+
+@lru_cache()
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Получить батчер эмбедингов (singleton)."""
+    return EmbeddingBatcher()
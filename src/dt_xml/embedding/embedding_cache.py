@@ -0,0 +1,280 @@
+"""Персистентный кэш эмбедингов с адресацией по содержимому."""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Any
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+if fcntl is None:
+    logger.warning("fcntl недоступен, кэш эмбедингов не защищен от записи из нескольких процессов")
+
+
+class EmbeddingCache:
+    """Дисковый кэш эмбедингов с LRU-вытеснением.
+
+    Эмбединги хранятся в отображаемой в память матрице float32 фиксированного
+    размера (max_entries x dimension), а индекс ключ → строка матрицы — в JSON
+    файле в порядке последнего использования. Ключ — хэш параметров модели и
+    текста, поэтому смена модели или ее настроек не возвращает устаревшие векторы.
+
+    Новые векторы пишутся только в строки, на которые не ссылается индекс на
+    диске: строки вытесненных записей переиспользуются после записи индекса
+    без них, поэтому после сбоя индекс не указывает на чужие векторы.
+    Директорией кэша владеет один процесс (файловая блокировка owner.lock);
+    остальные процессы используют поддиректории worker-N со своими кэшами.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "owner.lock"
+
+    def __init__(
+        self,
+        path: Path,
+        dimension: int,
+        model_name: str,
+        max_length: int,
+        normalize_embeddings: bool,
+        max_entries: int = 100_000,
+        flush_every: int = 1000,
+    ):
+        """Инициализация кэша.
+
+        Args:
+            path: Директория кэша.
+            dimension: Размерность эмбедингов.
+            model_name: Название модели (входит в ключ).
+            max_length: Максимальная длина входа модели (входит в ключ).
+            normalize_embeddings: Нормализация эмбедингов (входит в ключ).
+            max_entries: Максимальное количество эмбедингов в кэше.
+            flush_every: Сброс индекса на диск после указанного количества записей.
+        """
+        self.dimension = dimension
+        self.max_entries = max(max_entries, 1)
+        self.flush_every = max(flush_every, 1)
+        self._key_prefix = f"{model_name}\x00{max_length}\x00{int(normalize_embeddings)}\x00"
+
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._free_slots: list[int] = []
+        self._dirty = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock_file: IO[bytes] | None = None
+        self.path = self._acquire_path(Path(path))
+        self._vectors = self._open()
+        atexit.register(self.close)
+
+    def _acquire_path(self, path: Path) -> Path:
+        """Выбор директории кэша, не занятой другим процессом.
+
+        Args:
+            path: Основная директория кэша.
+
+        Returns:
+            Основная директория или первая свободная поддиректория worker-N.
+        """
+        number = 0
+        while True:
+            candidate = path if number == 0 else path / f"worker-{number}"
+            candidate.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                return candidate
+
+            lock_file = open(candidate / self.LOCK_FILE, "a+b")  # noqa: SIM115 — держится до close()
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                number += 1
+                continue
+
+            if number:
+                logger.info(f"Кэш эмбедингов {path} занят другим процессом, используется {candidate}")
+            self._lock_file = lock_file
+            return candidate
+
+    def _open(self) -> np.memmap:
+        """Открытие матрицы эмбедингов и загрузка индекса.
+
+        Returns:
+            Отображаемая в память матрица эмбедингов.
+        """
+        vectors_path = self.path / self.VECTORS_FILE
+        index_path = self.path / self.INDEX_FILE
+        shape = (self.max_entries, self.dimension)
+
+        if vectors_path.exists() and index_path.exists():
+            try:
+                with open(index_path, encoding="utf-8") as f:
+                    index_data = json.load(f)
+
+                if (
+                    index_data.get("dimension") == self.dimension
+                    and index_data.get("max_entries") == self.max_entries
+                ):
+                    vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=shape)
+                    self._index = OrderedDict((key, slot) for key, slot in index_data.get("entries", []))
+                    used = set(self._index.values())
+                    self._free_slots = [slot for slot in range(self.max_entries - 1, -1, -1) if slot not in used]
+                    logger.info(f"Кэш эмбедингов загружен: {len(self._index)} записей из {vectors_path}")
+                    return vectors
+
+                logger.warning("Параметры кэша эмбедингов изменились, кэш будет пересоздан")
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить кэш эмбедингов, кэш будет пересоздан: {e}")
+
+        self._index = OrderedDict()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=shape)
+        self._write_index()
+        return vectors
+
+    def make_key(self, text: str) -> str:
+        """Построение ключа кэша для текста.
+
+        Args:
+            text: Текст.
+
+        Returns:
+            Хэш параметров модели и текста.
+        """
+        return hashlib.sha256((self._key_prefix + text).encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """Получение эмбедингов из кэша.
+
+        Args:
+            texts: Список текстов.
+
+        Returns:
+            Список эмбедингов (копий) или None для отсутствующих текстов.
+        """
+        keys = [self.make_key(text) for text in texts]
+        results: list[np.ndarray | None] = []
+
+        with self._lock:
+            for key in keys:
+                slot = self._index.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._index.move_to_end(key)
+                    results.append(np.array(self._vectors[slot]))
+
+        return results
+
+    def put_many(self, texts: list[str], embeddings: list[np.ndarray] | np.ndarray) -> None:
+        """Сохранение эмбедингов в кэш.
+
+        Args:
+            texts: Список текстов.
+            embeddings: Эмбединги в порядке текстов.
+        """
+        with self._lock:
+            new_keys = {self.make_key(text) for text in texts} - self._index.keys()
+            if len(new_keys) > len(self._free_slots):
+                self._evict_locked(len(new_keys) - len(self._free_slots))
+
+            for text, embedding in zip(texts, embeddings, strict=True):
+                key = self.make_key(text)
+                slot = self._index.get(key)
+
+                if slot is None:
+                    if not self._free_slots:
+                        # Текстов больше, чем строк в кэше: остаток не кэшируется
+                        continue
+                    slot = self._free_slots.pop()
+
+                self._vectors[slot] = np.asarray(embedding, dtype=np.float32)
+                self._index[key] = slot
+                self._index.move_to_end(key)
+                self._dirty += 1
+
+            if self._dirty >= self.flush_every:
+                self._flush_locked()
+
+    def _evict_locked(self, count: int) -> None:
+        """Вытеснение давно не использованных записей (вызывается под блокировкой).
+
+        Вытесняется не меньше десятой части кэша (до flush_every записей),
+        чтобы индекс не переписывался на каждую новую запись. Освобожденные
+        строки становятся доступны только после записи индекса без них.
+
+        Args:
+            count: Минимальное количество освобождаемых строк.
+        """
+        count = min(max(count, min(self.flush_every, self.max_entries // 10)), len(self._index))
+        released = [self._index.popitem(last=False)[1] for _ in range(count)]
+        self.evictions += count
+        self._dirty += count
+        self._flush_locked()
+        self._free_slots.extend(released)
+
+    def flush(self) -> None:
+        """Сброс матрицы и индекса на диск."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        """Сброс на диск и освобождение директории кэша для других процессов."""
+        self.flush()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _flush_locked(self) -> None:
+        """Сброс на диск (вызывается под блокировкой)."""
+        if not self._dirty:
+            return
+        self._vectors.flush()
+        self._write_index()
+        self._dirty = 0
+
+    def _write_index(self) -> None:
+        """Атомарная запись индекса."""
+        index_path = self.path / self.INDEX_FILE
+        tmp_path = index_path.with_suffix(".tmp")
+        index_data = {
+            "dimension": self.dimension,
+            "max_entries": self.max_entries,
+            "entries": list(self._index.items()),
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index_data, f)
+        os.replace(tmp_path, index_path)
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение статистики кэша.
+
+        Returns:
+            Словарь со счетчиками попаданий и промахов.
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -17,6 +17,9 @@ class EmbeddingModelConfig:
         self.batch_size = settings.embedding.batch_size
         self.max_length = settings.embedding.max_length
         self.normalize_embeddings = settings.embedding.normalize_embeddings
+        self.token_budget = settings.embedding.token_budget
+        self.backend = settings.embedding.backend
+        self.onnx = dict(settings.embedding.onnx)
 
     def to_dict(self) -> dict[str, Any]:
         """Преобразование в словарь.
@@ -30,4 +33,6 @@ class EmbeddingModelConfig:
             "batch_size": self.batch_size,
             "max_length": self.max_length,
             "normalize_embeddings": self.normalize_embeddings,
+            "token_budget": self.token_budget,
+            "backend": self.backend,
         }
@@ -1,13 +1,17 @@
 """Многоязычный эмбеддер для генерации эмбедингов."""
 
 import logging
+from functools import lru_cache
+from pathlib import Path
 from typing import Any
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from dt_xml.config.settings import get_settings
+from dt_xml.embedding.embedding_cache import EmbeddingCache
 from dt_xml.embedding.models import EmbeddingModelConfig
+from dt_xml.runtime.onnx_backend import load_model
 
 logger = logging.getLogger(__name__)
 
@@ -15,29 +19,66 @@ logger = logging.getLogger(__name__)
 class MultilingualEmbedder:
     """Многоязычный эмбеддер для генерации эмбедингов текстов."""
 
-    def __init__(self, config: EmbeddingModelConfig | None = None):
+    def __init__(self, config: EmbeddingModelConfig | None = None, use_cache: bool | None = None):
         """Инициализация эмбеддера.
 
         Args:
             config: Конфигурация модели. Если None, используется конфигурация из настроек.
+            use_cache: Использовать дисковый кэш эмбедингов. Если None, из настроек.
         """
         self.config = config or EmbeddingModelConfig()
         self.model: SentenceTransformer | None = None
+        self.cache: EmbeddingCache | None = None
+        # Счетчики токенов для оценки потерь на паддинг в embed_batch
+        self.real_tokens = 0
+        self.padded_tokens = 0
         self._load_model()
 
+        cache_settings = get_settings().embedding.cache
+        if use_cache if use_cache is not None else cache_settings.get("enabled", False):
+            self._init_cache(cache_settings)
+
     def _load_model(self) -> None:
         """Загрузка модели эмбедингов."""
         try:
-            logger.info(f"Загрузка модели эмбедингов: {self.config.model_name}")
-            self.model = SentenceTransformer(
+            logger.info(f"Загрузка модели эмбедингов: {self.config.model_name} ({self.config.backend})")
+            self.model = load_model(
+                SentenceTransformer,
                 self.config.model_name,
                 device=self.config.device,
+                backend=self.config.backend,
+                export_dir=Path(self.config.onnx.get("export_dir", "data/models/onnx")),
+                quantization_config=self.config.onnx.get("quantization_config", "avx2"),
             )
             logger.info("Модель эмбедингов загружена успешно")
         except Exception as e:
             logger.error(f"Ошибка при загрузке модели эмбедингов: {e}")
             raise
 
+    def _init_cache(self, cache_settings: dict[str, Any]) -> None:
+        """Инициализация дискового кэша эмбедингов.
+
+        Args:
+            cache_settings: Настройки кэша (embedding.cache).
+        """
+        try:
+            self.cache = EmbeddingCache(
+                path=Path(cache_settings.get("path", "data/cache/embeddings")),
+                dimension=self.get_embedding_dimension(),
+                model_name=(
+                    self.config.model_name
+                    if self.config.backend == "torch"
+                    else f"{self.config.model_name}@{self.config.backend}"
+                ),
+                max_length=self.config.max_length,
+                normalize_embeddings=self.config.normalize_embeddings,
+                max_entries=cache_settings.get("max_entries", 100_000),
+                flush_every=cache_settings.get("flush_every", 1000),
+            )
+        except Exception as e:
+            logger.warning(f"Кэш эмбедингов отключен: {e}")
+            self.cache = None
+
     def embed(self, texts: str | list[str]) -> np.ndarray | list[np.ndarray]:
         """Генерация эмбедингов для текста или списка текстов.
 
@@ -61,20 +102,11 @@ class MultilingualEmbedder:
             return [] if not single_text else np.array([])
 
         try:
-            # Генерация эмбедингов
-            embeddings = self.model.encode(
-                texts,
-                batch_size=self.config.batch_size,
-                show_progress_bar=False,
-                normalize_embeddings=self.config.normalize_embeddings,
-                max_length=self.config.max_length,
-            )
-
-            # Преобразование в numpy array
-            if isinstance(embeddings, list):
-                embeddings = np.array(embeddings)
-            elif not isinstance(embeddings, np.ndarray):
-                embeddings = np.array(embeddings)
+            # Генерация эмбедингов только для отсутствующих в кэше текстов
+            if self.cache is not None:
+                embeddings = self._embed_with_cache(texts)
+            else:
+                embeddings = self._encode(texts)
 
             # Возврат одного эмбединга для одного текста
             if single_text:
@@ -86,35 +118,187 @@ class MultilingualEmbedder:
             logger.error(f"Ошибка при генерации эмбедингов: {e}")
             raise
 
+    def _embed_with_cache(self, texts: list[str]) -> np.ndarray:
+        """Генерация эмбедингов с использованием кэша.
+
+        Args:
+            texts: Список текстов.
+
+        Returns:
+            Матрица эмбедингов в порядке текстов.
+        """
+        assert self.cache is not None
+
+        cached = self.cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._encode(missing_texts)
+            self.cache.put_many(missing_texts, computed)
+            for i, embedding in zip(missing, computed, strict=True):
+                cached[i] = embedding
+
+        return np.stack([np.asarray(embedding, dtype=np.float32) for embedding in cached])
+
+    def _encode(self, texts: list[str], batch_size: int | None = None) -> np.ndarray:
+        """Вызов модели для списка текстов.
+
+        Args:
+            texts: Список текстов.
+            batch_size: Размер батча модели. Если None, используется из конфигурации.
+
+        Returns:
+            Матрица эмбедингов.
+        """
+        assert self.model is not None
+
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size or self.config.batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=self.config.normalize_embeddings,
+            max_length=self.config.max_length,
+        )
+
+        # Преобразование в numpy array
+        if not isinstance(embeddings, np.ndarray):
+            embeddings = np.array(embeddings)
+
+        return embeddings
+
     def embed_batch(self, texts: list[str], batch_size: int | None = None) -> list[np.ndarray]:
-        """Генерация эмбедингов для батча текстов.
+        """Генерация эмбедингов для батча текстов с группировкой по длине.
+
+        Тексты сортируются по длине в токенах и разбиваются на группы с
+        ограничением на количество токенов с учетом паддинга
+        (embedding.token_budget), поэтому короткие чанки не дополняются до
+        длины самых длинных. Результат возвращается в исходном порядке.
 
         Args:
             texts: Список текстов для эмбединга.
-            batch_size: Размер батча. Если None, используется из конфигурации.
+            batch_size: Максимальное количество текстов в группе. Если None, используется из конфигурации.
 
         Returns:
             Список массивов эмбедингов.
         """
+        if self.model is None:
+            raise RuntimeError("Модель не загружена")
+
         if not texts:
             return []
 
         batch_size = batch_size or self.config.batch_size
-        embeddings_list: list[np.ndarray] = []
 
-        # Обработка батчами
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            batch_embeddings = self.embed(batch)
+        try:
+            if self.cache is None:
+                return list(self._encode_bucketed(texts, batch_size))
 
-            if isinstance(batch_embeddings, np.ndarray):
-                # Разделяем на отдельные эмбединги
-                for j in range(len(batch)):
-                    embeddings_list.append(batch_embeddings[j])
-            else:
-                embeddings_list.extend(batch_embeddings)
+            # Модель получает только отсутствующие в кэше тексты
+            cached = self.cache.get_many(texts)
+            missing = [i for i, embedding in enumerate(cached) if embedding is None]
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                computed = self._encode_bucketed(missing_texts, batch_size)
+                self.cache.put_many(missing_texts, computed)
+                for i, embedding in zip(missing, computed, strict=True):
+                    cached[i] = embedding
+
+            return [np.asarray(embedding, dtype=np.float32) for embedding in cached]
+
+        except Exception as e:
+            logger.error(f"Ошибка при генерации эмбедингов: {e}")
+            raise
+
+    def _encode_bucketed(self, texts: list[str], max_count: int | None = None) -> np.ndarray:
+        """Вызов модели группами текстов близкой длины.
+
+        Args:
+            texts: Список текстов.
+            max_count: Максимальное количество текстов в группе.
+
+        Returns:
+            Матрица эмбедингов в порядке текстов.
+        """
+        lengths = self._token_lengths(texts)
+        # Сначала длинные тексты: пиковое потребление памяти видно на первой группе
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+        result: np.ndarray | None = None
+        for bucket in self._make_buckets(order, lengths, max_count):
+            # Группа уже ограничена бюджетом токенов и кодируется за один проход
+            embeddings = self._encode([texts[i] for i in bucket], batch_size=len(bucket))
+            if result is None:
+                result = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            result[bucket] = embeddings
+
+            self.real_tokens += sum(lengths[i] for i in bucket)
+            self.padded_tokens += lengths[bucket[0]] * len(bucket)
+
+        assert result is not None
+        return result
+
+    def _make_buckets(
+        self,
+        order: list[int],
+        lengths: list[int],
+        max_count: int | None = None,
+    ) -> list[list[int]]:
+        """Разбиение отсортированных по убыванию длины текстов на группы.
 
-        return embeddings_list
+        Стоимость группы — длина самого длинного текста, умноженная на
+        количество текстов (объем тензора после паддинга).
+
+        Args:
+            order: Индексы текстов по убыванию длины.
+            lengths: Длины текстов в токенах.
+            max_count: Максимальное количество текстов в группе.
+
+        Returns:
+            Список групп индексов.
+        """
+        token_budget = max(self.config.token_budget, 1)
+        buckets: list[list[int]] = []
+        bucket: list[int] = []
+
+        for i in order:
+            # Первый текст группы — самый длинный, он определяет длину паддинга
+            padded_length = lengths[bucket[0]] if bucket else lengths[i]
+            if bucket and (
+                padded_length * (len(bucket) + 1) > token_budget
+                or (max_count is not None and len(bucket) >= max_count)
+            ):
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(i)
+
+        if bucket:
+            buckets.append(bucket)
+        return buckets
+
+    def _token_lengths(self, texts: list[str]) -> list[int]:
+        """Длины текстов в токенах модели (с учетом усечения).
+
+        Args:
+            texts: Список текстов.
+
+        Returns:
+            Список длин.
+        """
+        assert self.model is not None
+
+        max_length = self.config.max_length
+        model_max_length = getattr(self.model, "max_seq_length", None)
+        if model_max_length:
+            max_length = min(max_length, model_max_length)
+
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            # Грубая оценка, если токенизатор недоступен
+            return [min(len(text) // 4 + 2, max_length) for text in texts]
+
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
 
     def get_embedding_dimension(self) -> int:
         """Получение размерности эмбедингов.
@@ -137,7 +321,19 @@ class MultilingualEmbedder:
         return {
             "model_name": self.config.model_name,
             "device": self.config.device,
+            "backend": self.config.backend,
             "embedding_dimension": self.get_embedding_dimension() if self.model else None,
             "max_length": self.config.max_length,
             "normalize_embeddings": self.config.normalize_embeddings,
+            "cache": self.cache.get_stats() if self.cache else None,
+            "token_budget": self.config.token_budget,
+            "padding_ratio": (
+                round(1.0 - self.real_tokens / self.padded_tokens, 4) if self.padded_tokens else 0.0
+            ),
         }
+
+
+@lru_cache()
+def get_embedder() -> MultilingualEmbedder:
+    """Получить эмбеддер с загруженной моделью (singleton)."""
+    return MultilingualEmbedder()
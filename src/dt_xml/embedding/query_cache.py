@@ -0,0 +1,161 @@
+"""Кэш эмбедингов поисковых запросов."""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Нормализация текста запроса для использования в качестве ключа кэша.
+
+    Регистр сохраняется: модель различает, например, артикулы и бренды
+    в разном регистре.
+
+    Args:
+        query: Текст запроса.
+
+    Returns:
+        Запрос в форме NFKC с единичными пробелами.
+    """
+    normalized = unicodedata.normalize("NFKC", query)
+    return _WHITESPACE_PATTERN.sub(" ", normalized).strip()
+
+
+class QueryEmbeddingCache:
+    """LRU кэш эмбедингов запросов с TTL и объединением одновременных запросов.
+
+    Одинаковые (после нормализации) запросы, пришедшие одновременно, ожидают
+    один вызов модели вместо того, чтобы кодировать запрос каждый сам.
+    Модель кодирует нормализованный текст — тот же, что служит ключом, поэтому
+    эмбединг не зависит от того, какой из вариантов запроса пришел первым.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], Any],
+        max_entries: int = 10_000,
+        ttl_seconds: float = 3600.0,
+    ):
+        """Инициализация кэша.
+
+        Args:
+            embed_fn: Функция получения эмбединга для текста запроса.
+            max_entries: Максимальное количество запросов в кэше.
+            ttl_seconds: Время жизни записи в секундах (0 — без ограничения).
+        """
+        self.embed_fn = embed_fn
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._in_flight: dict[str, Future[np.ndarray]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, query: str) -> np.ndarray:
+        """Получение эмбединга запроса.
+
+        Args:
+            query: Текст запроса.
+
+        Returns:
+            Эмбединг запроса (общий для запросов с одинаковым ключом).
+        """
+        key = normalize_query(query)
+
+        with self._lock:
+            vector = self._lookup(key)
+            if vector is not None:
+                self.hits += 1
+                return vector
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = Future()
+                self._in_flight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            vector = np.array(self.embed_fn(key), dtype=np.float32)
+            # Один и тот же вектор возвращается разным запросам
+            vector.setflags(write=False)
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._in_flight.pop(key, None)
+
+        future.set_result(vector)
+        return vector
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        """Поиск актуальной записи (вызывается под блокировкой).
+
+        Args:
+            key: Нормализованный запрос.
+
+        Returns:
+            Эмбединг или None, если записи нет или она устарела.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        created_at, vector = entry
+        if self.ttl_seconds > 0 and time.monotonic() - created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return vector
+
+    def clear(self) -> None:
+        """Очистка кэша."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение статистики кэша.
+
+        Returns:
+            Словарь со счетчиками.
+        """
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,5 @@
+"""Модуль загрузки и индексации деклараций."""
+
+from dt_xml.ingestion.pipeline import IngestionPipeline, StageStats
+
+__all__ = ["IngestionPipeline", "StageStats"]
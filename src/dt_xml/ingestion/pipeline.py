@@ -0,0 +1,532 @@
+"""Параллельный конвейер загрузки и индексации деклараций.
+
+Конвейер состоит из трех стадий, связанных ограниченными очередями:
+
+1. parse — парсинг XML, нормализация и чанкование в пуле процессов;
+2. embed — единственная стадия эмбединга, собирающая чанки разных файлов в общие батчи;
+3. write — отдельный поток записи в VectorStore, MetadataStore, DocumentStore и индекс BM25.
+
+Ошибки отдельных файлов и батчей учитываются в статистике стадии. Если стадия
+завершается исключением, конвейер останавливается: остальные стадии ждут
+очереди с таймаутом, проверяя общее событие ошибки, и run поднимает RuntimeError.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from dt_xml.chunker.semantic_chunker import SemanticChunker
+from dt_xml.config.models import DeclarationChunk, DeclarationMetadata
+from dt_xml.config.settings import get_settings
+from dt_xml.normalizer.field_normalizer import FieldNormalizer
+from dt_xml.parser.xml_parser import XMLParser
+
+logger = logging.getLogger(__name__)
+
+# Маркер завершения потока данных между стадиями
+_STOP = object()
+
+# Интервал проверки события ошибки при ожидании очередей, секунды
+_POLL_SECONDS = 0.1
+
+# Компоненты процесса-воркера (инициализируются один раз на процесс)
+_worker_parser: XMLParser | None = None
+_worker_normalizer: FieldNormalizer | None = None
+_worker_chunker: SemanticChunker | None = None
+
+
+class ParsedDeclaration(BaseModel):
+    """Результат CPU-стадии обработки одного файла."""
+
+    file_path: str
+    declaration_id: str
+    normalized_data: dict[str, Any]
+    metadata: DeclarationMetadata
+    chunks: list[DeclarationChunk] = Field(default_factory=list)
+    parse_seconds: float = 0.0
+    # Заполняются стадией эмбединга по результатам сравнения с индексом
+    changed_chunks: list[DeclarationChunk] = Field(default_factory=list)
+    stale_point_ids: list[int | str] = Field(default_factory=list)
+
+
+class _PipelineAbortedError(Exception):
+    """Остановка стадии из-за ошибки в другой стадии."""
+
+
+def _init_worker() -> None:
+    """Инициализация компонентов в процессе-воркере."""
+    global _worker_parser, _worker_normalizer, _worker_chunker
+    _worker_parser = XMLParser()
+    _worker_normalizer = FieldNormalizer()
+    _worker_chunker = SemanticChunker()
+
+
+def _process_file(file_path: Path, tenant_id: str = "default") -> ParsedDeclaration:
+    """Парсинг, нормализация и чанкование файла в процессе-воркере.
+
+    Args:
+        file_path: Путь к XML файлу.
+        tenant_id: Идентификатор заказчика.
+
+    Returns:
+        Результат обработки файла.
+    """
+    if _worker_parser is None or _worker_normalizer is None or _worker_chunker is None:
+        _init_worker()
+    assert _worker_parser is not None and _worker_normalizer is not None and _worker_chunker is not None
+
+    start_time = time.perf_counter()
+
+    parsed_data = _worker_parser.parse_file(file_path, tenant_id=tenant_id)
+    normalized_data = _worker_normalizer.normalize_all_fields(parsed_data)
+
+    declaration_id = normalized_data.get("declaration_number", file_path.stem)
+    text = normalized_data.get("full_text", "") or normalized_data.get("product_description", "")
+
+    chunks = _worker_chunker.chunk_declaration(declaration_id, text, normalized_data)
+    metadata = _worker_parser.to_metadata(normalized_data, tenant_id=tenant_id)
+
+    return ParsedDeclaration(
+        file_path=str(file_path),
+        declaration_id=declaration_id,
+        normalized_data=normalized_data,
+        metadata=metadata,
+        chunks=chunks,
+        parse_seconds=time.perf_counter() - start_time,
+    )
+
+
+class StageStats:
+    """Статистика пропускной способности стадии конвейера."""
+
+    def __init__(self, name: str):
+        """Инициализация статистики.
+
+        Args:
+            name: Название стадии.
+        """
+        self.name = name
+        self.items = 0
+        self.chunks = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    def record(self, items: int, chunks: int, seconds: float) -> None:
+        """Учет обработанной порции данных.
+
+        Args:
+            items: Количество деклараций.
+            chunks: Количество чанков.
+            seconds: Время работы стадии над порцией.
+        """
+        now = time.perf_counter()
+        if self.started_at is None:
+            self.started_at = now - seconds
+        self.finished_at = now
+        self.items += items
+        self.chunks += chunks
+        self.busy_seconds += seconds
+
+    @property
+    def wall_seconds(self) -> float:
+        """Время от начала до окончания работы стадии."""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> dict[str, Any]:
+        """Преобразование статистики в словарь.
+
+        Returns:
+            Словарь со статистикой стадии.
+        """
+        wall = self.wall_seconds
+        return {
+            "stage": self.name,
+            "declarations": self.items,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "declarations_per_second": round(self.items / wall, 2) if wall > 0 else 0.0,
+            "chunks_per_second": round(self.chunks / wall, 2) if wall > 0 else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """Параллельный конвейер индексации: parse → embed → write."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        embed_batch_size: int | None = None,
+        queue_size: int = 64,
+        tenant_id: str = "default",
+        embedder: Any | None = None,
+        vector_store: Any | None = None,
+        metadata_store: Any | None = None,
+        document_store: Any | None = None,
+        sparse_search: Any | None = None,
+    ):
+        """Инициализация конвейера.
+
+        Args:
+            workers: Количество процессов для CPU-стадии. Если None, по числу ядер.
+            embed_batch_size: Количество чанков в батче эмбединга. Если None, из настроек.
+            queue_size: Максимальное количество деклараций в очереди между стадиями.
+            tenant_id: Идентификатор заказчика.
+            embedder: Эмбеддер. Если None, создается MultilingualEmbedder.
+            vector_store: Векторное хранилище. Если None, создается по настройкам (create_vector_store).
+            metadata_store: Хранилище метаданных. Если None, общее хранилище
+                процесса (с созданием/миграцией схемы БД).
+            document_store: Хранилище документов. Если None, создается DocumentStore.
+            sparse_search: BM25 поиск для обновления индекса. Если None, создается SparseSearch.
+        """
+        self.settings = get_settings()
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size or self.settings.embedding.batch_size
+        self.queue_size = max(queue_size, 1)
+        self.tenant_id = tenant_id
+
+        if embedder is None:
+            from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder
+
+            embedder = MultilingualEmbedder()
+        if vector_store is None:
+            from dt_xml.storage.vector_backend import create_vector_store
+
+            vector_store = create_vector_store()
+        if metadata_store is None:
+            from dt_xml.storage.metadata_store import get_metadata_store
+
+            metadata_store = get_metadata_store()
+            metadata_store.create_schema()
+        if document_store is None:
+            from dt_xml.storage.document_store import DocumentStore
+
+            document_store = DocumentStore()
+        if sparse_search is None:
+            from dt_xml.search.sparse_search import SparseSearch
+
+            sparse_search = SparseSearch()
+
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.metadata_store = metadata_store
+        self.document_store = document_store
+        self.sparse_search = sparse_search
+
+        self.stats = {
+            "parse": StageStats("parse"),
+            "embed": StageStats("embed"),
+            "write": StageStats("write"),
+        }
+
+        self._failed = threading.Event()
+        self._error: BaseException | None = None
+        self._failed_stage: str | None = None
+
+    def run(self, files: list[Path]) -> dict[str, StageStats]:
+        """Запуск конвейера над списком файлов.
+
+        Args:
+            files: Список XML файлов для индексации.
+
+        Returns:
+            Статистика по стадиям конвейера.
+
+        Raises:
+            RuntimeError: Если одна из стадий завершилась исключением.
+        """
+        self._failed.clear()
+        self._error, self._failed_stage = None, None
+
+        parsed_queue: queue.Queue[Any] = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue[Any] = queue.Queue(maxsize=self.queue_size)
+
+        embed_thread = threading.Thread(
+            target=self._run_stage,
+            args=("embed", self._embed_stage, parsed_queue, write_queue),
+            name="ingest-embed",
+            daemon=True,
+        )
+        write_thread = threading.Thread(
+            target=self._run_stage,
+            args=("write", self._write_stage, write_queue),
+            name="ingest-write",
+            daemon=True,
+        )
+        embed_thread.start()
+        write_thread.start()
+
+        try:
+            self._run_stage("parse", self._parse_stage, files, parsed_queue)
+        except BaseException:
+            # Прерывание основного потока (KeyboardInterrupt) останавливает и остальные стадии
+            self._failed.set()
+            raise
+        finally:
+            embed_thread.join()
+            write_thread.join()
+
+        if self._error is not None:
+            raise RuntimeError(f"Конвейер остановлен из-за ошибки стадии {self._failed_stage}") from self._error
+
+        return self.stats
+
+    def _run_stage(self, name: str, stage: Callable[..., None], *args: Any) -> None:
+        """Выполнение стадии с остановкой конвейера при ее ошибке.
+
+        Args:
+            name: Название стадии.
+            stage: Функция стадии.
+            *args: Аргументы функции стадии.
+        """
+        try:
+            stage(*args)
+        except _PipelineAbortedError:
+            pass
+        except Exception as e:
+            logger.error(f"Стадия {name} конвейера завершилась с ошибкой: {e}")
+            if self._error is None:
+                self._error, self._failed_stage = e, name
+            self._failed.set()
+
+    def _put(self, target_queue: queue.Queue[Any], item: Any) -> None:
+        """Запись в очередь с ожиданием места, пока конвейер не остановлен.
+
+        Args:
+            target_queue: Очередь.
+            item: Элемент.
+        """
+        while True:
+            if self._failed.is_set():
+                raise _PipelineAbortedError
+            try:
+                target_queue.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source_queue: queue.Queue[Any], timeout: float | None = None) -> Any:
+        """Чтение из очереди, пока конвейер не остановлен.
+
+        Args:
+            source_queue: Очередь.
+            timeout: Максимальное время ожидания. Если None, без ограничения.
+
+        Returns:
+            Элемент очереди.
+
+        Raises:
+            queue.Empty: Если за timeout элемент не появился.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._failed.is_set():
+                raise _PipelineAbortedError
+            wait_seconds = _POLL_SECONDS if deadline is None else min(_POLL_SECONDS, deadline - time.monotonic())
+            try:
+                return source_queue.get(timeout=max(wait_seconds, 0.0))
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+
+    def _parse_stage(self, files: list[Path], parsed_queue: queue.Queue[Any]) -> None:
+        """CPU-стадия: распределение файлов по пулу процессов.
+
+        Количество одновременно обрабатываемых файлов ограничено размером очереди,
+        а запись в заполненную очередь блокируется до освобождения места в ней
+        или до остановки конвейера.
+
+        Args:
+            files: Список файлов.
+            parsed_queue: Очередь результатов для стадии эмбединга.
+        """
+        stats = self.stats["parse"]
+        pending: dict[Future[ParsedDeclaration], Path] = {}
+        files_iter = iter(files)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as executor:
+            try:
+                while True:
+                    # Пополнение окна задач до размера очереди
+                    while len(pending) < self.queue_size:
+                        file_path = next(files_iter, None)
+                        if file_path is None:
+                            break
+                        pending[executor.submit(_process_file, file_path, self.tenant_id)] = file_path
+
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file_path = pending.pop(future)
+                        try:
+                            parsed = future.result()
+                        except Exception as e:
+                            stats.errors += 1
+                            logger.error(f"Ошибка при обработке {file_path}: {e}")
+                            continue
+
+                        stats.record(1, len(parsed.chunks), parsed.parse_seconds)
+                        self._put(parsed_queue, parsed)
+            except BaseException:
+                # Файлы, еще не взятые воркерами, не обрабатываются
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        self._put(parsed_queue, _STOP)
+
+    def _embed_stage(self, parsed_queue: queue.Queue[Any], write_queue: queue.Queue[Any]) -> None:
+        """Стадия эмбединга: сбор чанков нескольких файлов в общий батч.
+
+        Args:
+            parsed_queue: Очередь результатов CPU-стадии.
+            write_queue: Очередь для стадии записи.
+        """
+        batch: list[ParsedDeclaration] = []
+        batch_chunks = 0
+
+        while True:
+            try:
+                # Если батч не пуст, не ждем долго: отправляем неполный батч
+                item = self._get(parsed_queue, timeout=0.05 if batch else None)
+            except queue.Empty:
+                self._embed_batch(batch, write_queue)
+                batch, batch_chunks = [], 0
+                continue
+
+            if item is _STOP:
+                if batch:
+                    self._embed_batch(batch, write_queue)
+                self._put(write_queue, _STOP)
+                return
+
+            batch.append(item)
+            batch_chunks += len(item.chunks)
+            if batch_chunks >= self.embed_batch_size:
+                self._embed_batch(batch, write_queue)
+                batch, batch_chunks = [], 0
+
+    def _embed_batch(self, batch: list[ParsedDeclaration], write_queue: queue.Queue[Any]) -> None:
+        """Генерация эмбедингов для батча деклараций одним вызовом модели.
+
+        Args:
+            batch: Декларации с чанками.
+            write_queue: Очередь для стадии записи.
+        """
+        if not batch:
+            return
+
+        stats = self.stats["embed"]
+        start_time = time.perf_counter()
+
+        # Эмбединги считаются только для новых и измененных чанков
+        try:
+            existing = self.vector_store.get_chunk_hashes([parsed.declaration_id for parsed in batch])
+        except Exception as e:
+            logger.warning(f"Не удалось получить проиндексированные чанки, батч индексируется полностью: {e}")
+            existing = {}
+        for parsed in batch:
+            parsed.changed_chunks, parsed.stale_point_ids = self.vector_store.diff_chunks(
+                parsed.chunks, existing.get(parsed.declaration_id, {})
+            )
+
+        chunk_texts = [chunk.content for parsed in batch for chunk in parsed.changed_chunks]
+
+        try:
+            embeddings = (
+                self.embedder.embed_batch(chunk_texts, batch_size=self.embed_batch_size) if chunk_texts else []
+            )
+        except Exception as e:
+            stats.errors += len(batch)
+            logger.error(f"Ошибка при генерации эмбедингов для батча из {len(batch)} деклараций: {e}")
+            return
+
+        stats.record(len(batch), len(chunk_texts), time.perf_counter() - start_time)
+
+        # Раздача эмбедингов по декларациям
+        offset = 0
+        items: list[tuple[ParsedDeclaration, list[np.ndarray]]] = []
+        for parsed in batch:
+            count = len(parsed.changed_chunks)
+            items.append((parsed, embeddings[offset : offset + count]))
+            offset += count
+
+        self._put(write_queue, items)
+
+    def _write_stage(self, write_queue: queue.Queue[Any]) -> None:
+        """Стадия записи в хранилища.
+
+        Args:
+            write_queue: Очередь батчей с эмбедингами.
+        """
+        stats = self.stats["write"]
+
+        while True:
+            items = self._get(write_queue)
+            if items is _STOP:
+                return
+
+            # Векторы и метаданные всего батча записываются массовыми операциями,
+            # устаревшие чанки переиндексированных деклараций удаляются
+            start_time = time.perf_counter()
+            try:
+                self.vector_store.add_chunks(
+                    [chunk for parsed, _ in items for chunk in parsed.changed_chunks],
+                    [embedding for _, embeddings in items for embedding in embeddings],
+                )
+                self.vector_store.delete_points(
+                    [point_id for parsed, _ in items for point_id in parsed.stale_point_ids]
+                )
+                self.metadata_store.save_metadata_many(
+                    [parsed.metadata for parsed, _ in items],
+                    [parsed.declaration_id for parsed, _ in items],
+                )
+            except Exception as e:
+                stats.errors += len(items)
+                logger.error(f"Ошибка при записи батча из {len(items)} деклараций: {e}")
+                continue
+            stats.busy_seconds += time.perf_counter() - start_time
+
+            written: list[ParsedDeclaration] = []
+            for parsed, _ in items:
+                start_time = time.perf_counter()
+                try:
+                    self.document_store.save_document(
+                        parsed.declaration_id,
+                        parsed.normalized_data,
+                        parsed.metadata.model_dump(),
+                    )
+                except Exception as e:
+                    stats.errors += 1
+                    logger.error(f"Ошибка при сохранении декларации {parsed.declaration_id}: {e}")
+                    continue
+
+                stats.record(1, len(parsed.chunks), time.perf_counter() - start_time)
+                written.append(parsed)
+                logger.info(
+                    f"Декларация {parsed.declaration_id} проиндексирована ({len(parsed.chunks)} чанков)"
+                )
+
+            # Индекс BM25 обновляется одним коммитом на батч
+            if written:
+                start_time = time.perf_counter()
+                try:
+                    self.sparse_search.index_chunks([chunk for parsed in written for chunk in parsed.chunks])
+                except Exception as e:
+                    logger.error(f"Ошибка при обновлении индекса BM25: {e}")
+                stats.busy_seconds += time.perf_counter() - start_time
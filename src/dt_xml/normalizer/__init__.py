@@ -1,7 +1,7 @@
 """Модуль нормализации данных."""
 
-from dt_xml.normalizer.field_normalizer import FieldNormalizer
+from dt_xml.normalizer.field_normalizer import FieldNormalizer, company_search_key
 from dt_xml.normalizer.language_normalizer import LanguageNormalizer
 from dt_xml.normalizer.code_normalizer import CodeNormalizer
 
-__all__ = ["FieldNormalizer", "LanguageNormalizer", "CodeNormalizer"]
+__all__ = ["FieldNormalizer", "LanguageNormalizer", "CodeNormalizer", "company_search_key"]
@@ -8,6 +8,37 @@ from unidecode import unidecode
 
 logger = logging.getLogger(__name__)
 
+# Организационно-правовые формы (после транслитерации), не влияющие на поиск компании
+_LEGAL_FORMS = frozenset(
+    {
+        "ooo", "oao", "zao", "pao", "ao", "ip", "too", "tov", "chp",
+        "llc", "llp", "ltd", "inc", "corp", "co", "plc", "gmbh", "ag", "sa", "srl", "bv",
+    }
+)
+_NON_ALNUM_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def company_search_key(name: str | None) -> str | None:
+    """Ключ нечеткого поиска компании.
+
+    Название транслитерируется в латиницу, приводится к нижнему регистру,
+    знаки препинания и организационно-правовые формы удаляются:
+    "ТОО «Самсунг Электроникс»" и "Samsung Electronics Co., Ltd" дают
+    близкие ключи "samsung elektroniks" и "samsung electronics".
+
+    Args:
+        name: Название компании или поисковый запрос.
+
+    Returns:
+        Ключ поиска или None, если в названии нет букв и цифр.
+    """
+    if not name:
+        return None
+
+    words = _NON_ALNUM_PATTERN.sub(" ", unidecode(name).lower()).split()
+    key = " ".join(word for word in words if word not in _LEGAL_FORMS)
+    return key or None
+
 
 class FieldNormalizer:
     """Нормализация полей деклараций."""
@@ -448,11 +448,12 @@ class XMLParser:
         else:
             return "en"  # Английский
 
-    def to_metadata(self, parsed_data: dict[str, Any]) -> DeclarationMetadata:
+    def to_metadata(self, parsed_data: dict[str, Any], tenant_id: str = "default") -> DeclarationMetadata:
         """Преобразование распарсенных данных в метаданные.
 
         Args:
             parsed_data: Распарсенные данные декларации.
+            tenant_id: Идентификатор заказчика.
 
         Returns:
             Объект метаданных декларации.
@@ -474,5 +475,6 @@ class XMLParser:
             language=parsed_data.get("language", "ru"),
             version=parsed_data.get("version", "1.0"),
             source=parsed_data.get("source"),
+            tenant_id=tenant_id,
             processed_at=datetime.now(),
         )
@@ -1,7 +1,19 @@
 """Модуль реранкинга."""
 
-from dt_xml.reranker.adaptive_reranker import AdaptiveReranker
+from dt_xml.reranker.adaptive_reranker import AdaptiveReranker, get_adaptive_reranker
 from dt_xml.reranker.explainability import Explainability
+from dt_xml.reranker.model_registry import RerankerModel, RerankerRegistry, get_reranker_registry
 from dt_xml.reranker.query_complexity import QueryComplexityAnalyzer
+from dt_xml.reranker.score_cache import RerankScoreCache, get_rerank_score_cache
 
-__all__ = ["AdaptiveReranker", "Explainability", "QueryComplexityAnalyzer"]
+__all__ = [
+    "AdaptiveReranker",
+    "Explainability",
+    "QueryComplexityAnalyzer",
+    "RerankerModel",
+    "RerankerRegistry",
+    "RerankScoreCache",
+    "get_adaptive_reranker",
+    "get_rerank_score_cache",
+    "get_reranker_registry",
+]
@@ -1,12 +1,14 @@
 """Адаптивный реранкер."""
 
 import logging
+import time
+from functools import lru_cache
 from typing import Any
 
-from sentence_transformers import CrossEncoder
-
 from dt_xml.config.settings import get_settings
+from dt_xml.reranker.model_registry import RerankerRegistry, get_reranker_registry
 from dt_xml.reranker.query_complexity import QueryComplexityAnalyzer
+from dt_xml.reranker.score_cache import RerankScoreCache, get_rerank_score_cache
 
 logger = logging.getLogger(__name__)
 
@@ -14,44 +16,86 @@ logger = logging.getLogger(__name__)
 class AdaptiveReranker:
     """Адаптивный реранкер с выбором модели в зависимости от сложности запроса."""
 
-    def __init__(self):
-        """Инициализация адаптивного реранкера."""
+    def __init__(
+        self,
+        registry: RerankerRegistry | None = None,
+        score_cache: RerankScoreCache | None = None,
+    ):
+        """Инициализация адаптивного реранкера.
+
+        Args:
+            registry: Реестр моделей. Если None, используется общий реестр процесса.
+            score_cache: Кэш скоров. Если None, используется общий кэш процесса.
+        """
         self.settings = get_settings()
         self.complexity_analyzer = QueryComplexityAnalyzer()
-        self.simple_model: CrossEncoder | None = None
-        self.complex_model: CrossEncoder | None = None
-        self._load_models()
+        self.registry = registry or get_reranker_registry()
+        self.score_cache = score_cache or get_rerank_score_cache()
 
-    def _load_models(self) -> None:
-        """Загрузка моделей реранкера."""
-        try:
-            if self.settings.reranker.adaptive["enabled"]:
-                simple_model_name = self.settings.reranker.adaptive["simple_model"]
-                complex_model_name = self.settings.reranker.adaptive["complex_model"]
+        if self.settings.reranker.adaptive["enabled"]:
+            self.simple_model: str = self.settings.reranker.adaptive["simple_model"]
+            self.complex_model: str | None = self.settings.reranker.adaptive["complex_model"]
+        else:
+            # Использование базовой модели
+            self.simple_model = self.settings.reranker.model_name
+            self.complex_model = None
 
-                logger.info(f"Загрузка простой модели реранкера: {simple_model_name}")
-                self.simple_model = CrossEncoder(simple_model_name)
+    def rerank(
+        self,
+        query: str,
+        documents: list[str],
+        top_k: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Реранкинг документов по запросу.
 
-                logger.info(f"Загрузка сложной модели реранкера: {complex_model_name}")
-                self.complex_model = CrossEncoder(complex_model_name)
+        Args:
+            query: Текст запроса.
+            documents: Список текстов документов для реранкинга.
+            top_k: Количество топ результатов. Если None, используется из настроек.
 
-                logger.info("Модели реранкера загружены")
+        Returns:
+            Список реранкированных документов с скорами. Поле index — позиция
+            документа во входном списке.
+        """
+        if not documents:
+            return []
+
+        # Определение сложности запроса
+        complexity = self.complexity_analyzer.analyze(query)
+
+        try:
+            complex_model = self.complex_model
+            if complex_model is not None and self._use_cascade(complexity):
+                started_at = time.perf_counter()
+                simple_scores = self._score(self.simple_model, query, documents)
+                survivors = self._cascade_survivors(simple_scores, started_at, complex_model)
+                complex_scores = (
+                    self._score(complex_model, query, [documents[i] for i in survivors])
+                    if survivors
+                    else []
+                )
+                scores, models_used = self._merge_cascade(simple_scores, survivors, complex_scores)
             else:
-                # Использование базовой модели
-                logger.info(f"Загрузка базовой модели реранкера: {self.settings.reranker.model_name}")
-                self.simple_model = CrossEncoder(self.settings.reranker.model_name)
+                model_name = self._select_model(complexity)
+                scores = self._score(model_name, query, documents)
+                models_used = [self._model_label(model_name)] * len(documents)
+
+            return self._build_results(documents, scores, complexity, models_used, top_k)
 
         except Exception as e:
-            logger.error(f"Ошибка при загрузке моделей реранкера: {e}")
-            raise
+            logger.error(f"Ошибка при реранкинге: {e}")
+            return []
 
-    def rerank(
+    async def arerank(
         self,
         query: str,
         documents: list[str],
         top_k: int | None = None,
     ) -> list[dict[str, Any]]:
-        """Реранкинг документов по запросу.
+        """Асинхронный реранкинг документов.
+
+        Пары запроса попадают в общий батч модели вместе с парами конкурентных
+        запросов; ожидание не занимает поток.
 
         Args:
             query: Текст запроса.
@@ -64,55 +108,235 @@ class AdaptiveReranker:
         if not documents:
             return []
 
-        top_k = top_k or self.settings.reranker.top_k
-
-        # Определение сложности запроса
         complexity = self.complexity_analyzer.analyze(query)
 
-        # Выбор модели
-        model = self._select_model(complexity)
-
         try:
-            # Подготовка пар (query, document)
-            pairs = [[query, doc] for doc in documents]
-
-            # Получение скоров от модели
-            scores = model.predict(pairs)
-
-            # Объединение документов и скоров
-            results = [
-                {
-                    "document": doc,
-                    "score": float(score),
-                    "complexity": complexity,
-                    "model_used": "simple" if model == self.simple_model else "complex",
-                }
-                for doc, score in zip(documents, scores)
-            ]
-
-            # Сортировка по убыванию скора
-            results.sort(key=lambda x: x["score"], reverse=True)
+            complex_model = self.complex_model
+            if complex_model is not None and self._use_cascade(complexity):
+                started_at = time.perf_counter()
+                simple_scores = await self._ascore(self.simple_model, query, documents)
+                survivors = self._cascade_survivors(simple_scores, started_at, complex_model)
+                complex_scores = (
+                    await self._ascore(complex_model, query, [documents[i] for i in survivors])
+                    if survivors
+                    else []
+                )
+                scores, models_used = self._merge_cascade(simple_scores, survivors, complex_scores)
+            else:
+                model_name = self._select_model(complexity)
+                scores = await self._ascore(model_name, query, documents)
+                models_used = [self._model_label(model_name)] * len(documents)
 
-            return results[:top_k]
+            return self._build_results(documents, scores, complexity, models_used, top_k)
 
         except Exception as e:
             logger.error(f"Ошибка при реранкинге: {e}")
             return []
 
-    def _select_model(self, complexity: float) -> CrossEncoder:
+    def _use_cascade(self, complexity: float) -> bool:
+        """Проверка, нужен ли каскадный реранкинг.
+
+        Args:
+            complexity: Оценка сложности запроса.
+
+        Returns:
+            True, если сложный запрос обрабатывается каскадом простой → сложной модели.
+        """
+        adaptive = self.settings.reranker.adaptive
+        threshold = adaptive.get("complexity_threshold", 0.7)
+        return (
+            bool(adaptive.get("cascade", False))
+            and self.complex_model is not None
+            and complexity >= threshold
+        )
+
+    def _cascade_survivors(
+        self,
+        simple_scores: list[float],
+        started_at: float,
+        complex_model: str,
+    ) -> list[int]:
+        """Отбор кандидатов для сложной модели по скорам простой модели.
+
+        Количество кандидатов ограничено cascade_top_n и остатком бюджета
+        задержки cascade_latency_budget_ms, оцененным по средней задержке
+        сложной модели на пару.
+
+        Args:
+            simple_scores: Скоры простой модели в порядке документов.
+            started_at: Момент начала реранкинга (time.perf_counter()).
+            complex_model: Название сложной модели.
+
+        Returns:
+            Позиции отобранных документов в порядке убывания скора простой модели.
+        """
+        adaptive = self.settings.reranker.adaptive
+        top_n = min(adaptive.get("cascade_top_n", 20), len(simple_scores))
+
+        budget_ms = adaptive.get("cascade_latency_budget_ms", 0)
+        if budget_ms > 0:
+            remaining = budget_ms / 1000.0 - (time.perf_counter() - started_at)
+            seconds_per_pair = self.registry.get(complex_model).seconds_per_pair()
+            if remaining <= 0:
+                top_n = 0
+            elif seconds_per_pair:
+                top_n = min(top_n, int(remaining / seconds_per_pair))
+            if top_n < adaptive.get("cascade_top_n", 20):
+                logger.debug(f"Бюджет задержки каскада: сложной модели передано {top_n} кандидатов")
+
+        order = sorted(range(len(simple_scores)), key=lambda i: simple_scores[i], reverse=True)
+        return order[: max(top_n, 0)]
+
+    def _merge_cascade(
+        self,
+        simple_scores: list[float],
+        survivors: list[int],
+        complex_scores: list[float],
+    ) -> tuple[list[float], list[str]]:
+        """Объединение скоров этапов каскада.
+
+        Args:
+            simple_scores: Скоры простой модели.
+            survivors: Позиции документов, оцененных сложной моделью.
+            complex_scores: Скоры сложной модели в порядке survivors.
+
+        Returns:
+            Итоговые скоры и метки моделей в порядке документов.
+        """
+        scores = list(simple_scores)
+        models_used = ["simple"] * len(simple_scores)
+        for i, score in zip(survivors, complex_scores, strict=True):
+            scores[i] = score
+            models_used[i] = "complex"
+        return scores, models_used
+
+    def _score(self, model_name: str, query: str, documents: list[str]) -> list[float]:
+        """Скоры документов: из кэша, недостающие — от модели.
+
+        Args:
+            model_name: Название модели.
+            query: Текст запроса.
+            documents: Тексты документов.
+
+        Returns:
+            Скоры в порядке документов.
+        """
+        keys = self.score_cache.make_keys(model_name, query, documents)
+        cached = self.score_cache.get_many(keys)
+        missing = [i for i, score in enumerate(cached) if score is None]
+        computed = self.registry.predict(model_name, [(query, documents[i]) for i in missing]) if missing else []
+        return self._complete_scores(keys, cached, missing, computed)
+
+    async def _ascore(self, model_name: str, query: str, documents: list[str]) -> list[float]:
+        """Асинхронное получение скоров: из кэша, недостающие — от модели.
+
+        Args:
+            model_name: Название модели.
+            query: Текст запроса.
+            documents: Тексты документов.
+
+        Returns:
+            Скоры в порядке документов.
+        """
+        keys = self.score_cache.make_keys(model_name, query, documents)
+        cached = self.score_cache.get_many(keys)
+        missing = [i for i, score in enumerate(cached) if score is None]
+        computed = (
+            await self.registry.apredict(model_name, [(query, documents[i]) for i in missing]) if missing else []
+        )
+        return self._complete_scores(keys, cached, missing, computed)
+
+    def _complete_scores(
+        self,
+        keys: list[tuple[str, str, str]],
+        cached: list[float | None],
+        missing: list[int],
+        computed: Any,
+    ) -> list[float]:
+        """Подстановка вычисленных скоров на места промахов и сохранение их в кэш.
+
+        Args:
+            keys: Ключи кэша всех документов.
+            cached: Скоры из кэша (None для промахов).
+            missing: Позиции промахов.
+            computed: Скоры модели в порядке промахов.
+
+        Returns:
+            Скоры всех документов.
+        """
+        computed_scores = [float(score) for score in computed]
+        if missing:
+            self.score_cache.put_many([keys[i] for i in missing], computed_scores)
+        filled = iter(computed_scores)
+        return [score if score is not None else next(filled) for score in cached]
+
+    def _build_results(
+        self,
+        documents: list[str],
+        scores: list[float],
+        complexity: float,
+        models_used: list[str],
+        top_k: int | None,
+    ) -> list[dict[str, Any]]:
+        """Формирование отсортированных результатов реранкинга.
+
+        Args:
+            documents: Тексты документов.
+            scores: Скоры в порядке документов.
+            complexity: Сложность запроса.
+            models_used: Метка модели ("simple"/"complex"), оценившей документ.
+            top_k: Количество топ результатов. Если None, используется из настроек.
+
+        Returns:
+            Список результатов, отсортированный по убыванию скора.
+        """
+        top_k = top_k or self.settings.reranker.top_k
+
+        results = [
+            {
+                "index": index,
+                "document": doc,
+                "score": float(score),
+                "complexity": complexity,
+                "model_used": model_used,
+            }
+            for index, (doc, score, model_used) in enumerate(zip(documents, scores, models_used, strict=True))
+        ]
+
+        # Сортировка по убыванию скора; в каскаде скоры моделей несопоставимы,
+        # поэтому документы, оцененные сложной моделью, идут первыми
+        results.sort(key=lambda x: (x["model_used"] == "complex", x["score"]), reverse=True)
+
+        return results[:top_k]
+
+    def _model_label(self, model_name: str) -> str:
+        """Метка модели для результатов.
+
+        Args:
+            model_name: Название модели.
+
+        Returns:
+            "simple" или "complex".
+        """
+        return "simple" if model_name == self.simple_model else "complex"
+
+    def _select_model(self, complexity: float) -> str:
         """Выбор модели в зависимости от сложности запроса.
 
         Args:
             complexity: Оценка сложности запроса (0.0 - 1.0).
 
         Returns:
-            Выбранная модель реранкера.
+            Название выбранной модели реранкера.
         """
         threshold = self.settings.reranker.adaptive.get("complexity_threshold", 0.7)
 
         if complexity >= threshold and self.complex_model is not None:
             return self.complex_model
-        else:
-            if self.simple_model is None:
-                raise RuntimeError("Простая модель реранкера не загружена")
-            return self.simple_model
+        return self.simple_model
+
+
+@lru_cache()
+def get_adaptive_reranker() -> AdaptiveReranker:
+    """Получить адаптивный реранкер (singleton)."""
+    return AdaptiveReranker()
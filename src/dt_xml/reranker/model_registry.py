@@ -0,0 +1,326 @@
+"""Реестр загруженных моделей реранкера."""
+
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from dt_xml.config.settings import get_settings
+from dt_xml.runtime.batching import MicroBatcher
+from dt_xml.runtime.onnx_backend import load_model
+
+logger = logging.getLogger(__name__)
+
+
+class RerankerModel:
+    """Модель реранкера с состоянием загрузки и статистикой задержек."""
+
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    # Количество последних вызовов для оценки перцентилей задержки
+    LATENCY_WINDOW = 1000
+
+    def __init__(self, name: str, loader: Callable[[str], Any], batch_size: int = 16):
+        """Инициализация модели (без загрузки весов).
+
+        Args:
+            name: Название модели.
+            loader: Функция загрузки модели по названию.
+            batch_size: Размер батча при инференсе.
+        """
+        self.name = name
+        self.loader = loader
+        self.batch_size = batch_size
+
+        self.model: Any | None = None
+        self.state = self.NOT_LOADED
+        self.error: str | None = None
+        self.load_seconds: float | None = None
+
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=self.LATENCY_WINDOW)
+        self.calls = 0
+        self.pairs = 0
+        self.total_seconds = 0.0
+
+    def load(self) -> Any:
+        """Загрузка модели (однократно, потокобезопасно).
+
+        Returns:
+            Загруженная модель.
+        """
+        if self.model is not None:
+            return self.model
+
+        with self._load_lock:
+            if self.model is not None:
+                return self.model
+
+            self.state = self.LOADING
+            start = time.perf_counter()
+            try:
+                logger.info(f"Загрузка модели реранкера: {self.name}")
+                model = self.loader(self.name)
+            except Exception as e:
+                self.state = self.FAILED
+                self.error = str(e)
+                logger.error(f"Ошибка при загрузке модели реранкера {self.name}: {e}")
+                raise
+
+            self.load_seconds = time.perf_counter() - start
+            self.model = model
+            self.state = self.READY
+            self.error = None
+            logger.info(f"Модель реранкера {self.name} загружена за {self.load_seconds:.1f} с")
+            return model
+
+    def predict(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        """Оценка пар (запрос, документ).
+
+        Args:
+            pairs: Пары (запрос, документ).
+
+        Returns:
+            Массив скоров в порядке пар.
+        """
+        model = self.load()
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+
+        start = time.perf_counter()
+        scores = model.predict([list(pair) for pair in pairs], batch_size=self.batch_size)
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.calls += 1
+            self.pairs += len(pairs)
+            self.total_seconds += elapsed
+            self._latencies.append(elapsed)
+
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+
+    def seconds_per_pair(self) -> float | None:
+        """Средняя задержка модели в расчете на одну пару.
+
+        Returns:
+            Секунды на пару или None, если вызовов еще не было.
+        """
+        with self._stats_lock:
+            return self.total_seconds / self.pairs if self.pairs else None
+
+    def warmup(self) -> None:
+        """Загрузка модели и пробный прогон (инициализация ядер и аллокаций)."""
+        self.load()
+        self.predict([("warmup", "warmup")])
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение состояния и статистики задержек модели.
+
+        Returns:
+            Словарь со статистикой.
+        """
+        with self._stats_lock:
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000.0
+            calls, pairs, total_seconds = self.calls, self.pairs, self.total_seconds
+
+        stats: dict[str, Any] = {
+            "state": self.state,
+            "error": self.error,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "calls": calls,
+            "pairs": pairs,
+            "avg_latency_ms": round(total_seconds * 1000.0 / calls, 2) if calls else 0.0,
+        }
+        if len(latencies):
+            stats["p50_latency_ms"] = round(float(np.percentile(latencies, 50)), 2)
+            stats["p95_latency_ms"] = round(float(np.percentile(latencies, 95)), 2)
+            stats["max_latency_ms"] = round(float(latencies.max()), 2)
+        return stats
+
+
+def load_cross_encoder(name: str) -> Any:
+    """Загрузка CrossEncoder с устройством и бэкендом из настроек.
+
+    Args:
+        name: Название модели.
+
+    Returns:
+        Модель CrossEncoder.
+    """
+    from sentence_transformers import CrossEncoder
+
+    settings = get_settings().reranker
+    return load_model(
+        CrossEncoder,
+        name,
+        device=settings.device,
+        backend=settings.backend,
+        export_dir=Path(settings.onnx.get("export_dir", "data/models/onnx")),
+        quantization_config=settings.onnx.get("quantization_config", "avx2"),
+    )
+
+
+class RerankerRegistry:
+    """Процессный реестр моделей реранкера.
+
+    Каждая модель загружается один раз и используется всеми запросами. Перед
+    каждой моделью стоит микро-батчер: пары (запрос, документ) конкурентных
+    запросов собираются в общий батч до max_batch_size пар или до истечения
+    max_wait_ms, оцениваются одним вызовом predict в потоке батчера модели,
+    и каждый запрос получает свои скоры.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any] | None = None,
+        batch_size: int | None = None,
+        max_batch_size: int | None = None,
+        max_wait_ms: float | None = None,
+    ):
+        """Инициализация реестра.
+
+        Args:
+            loader: Функция загрузки модели по названию. Если None, загружается CrossEncoder.
+            batch_size: Размер батча модели при инференсе. Если None, из настроек.
+            max_batch_size: Максимальное количество пар в общем батче. Если None, из настроек.
+            max_wait_ms: Максимальное время ожидания добора батча. Если None, из настроек.
+        """
+        self.settings = get_settings()
+        self.loader = loader or load_cross_encoder
+        self.batch_size = batch_size or self.settings.reranker.batch_size
+        self.max_batch_size = max_batch_size or self.settings.reranker.batcher_max_batch_size
+        self.max_wait_ms = (
+            max_wait_ms if max_wait_ms is not None else self.settings.reranker.batcher_max_wait_ms
+        )
+        self._models: dict[str, RerankerModel] = {}
+        self._batchers: dict[str, MicroBatcher[tuple[str, str], float]] = {}
+        self._lock = threading.Lock()
+
+    def configured_models(self) -> list[str]:
+        """Модели, используемые реранкером согласно настройкам.
+
+        Returns:
+            Список названий моделей.
+        """
+        adaptive = self.settings.reranker.adaptive
+        if adaptive.get("enabled", True):
+            return list(dict.fromkeys([adaptive["simple_model"], adaptive["complex_model"]]))
+        return [self.settings.reranker.model_name]
+
+    def get(self, name: str) -> RerankerModel:
+        """Получение модели по названию (загрузка при первом использовании).
+
+        Args:
+            name: Название модели.
+
+        Returns:
+            Модель реранкера.
+        """
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                model = RerankerModel(name, self.loader, batch_size=self.batch_size)
+                self._models[name] = model
+        return model
+
+    def _get_batcher(self, name: str) -> MicroBatcher[tuple[str, str], float]:
+        """Получение микро-батчера модели.
+
+        Args:
+            name: Название модели.
+
+        Returns:
+            Микро-батчер, выполняющий predict модели.
+        """
+        model = self.get(name)
+        with self._lock:
+            batcher = self._batchers.get(name)
+            if batcher is None:
+                batcher = MicroBatcher[tuple[str, str], float](
+                    lambda pairs: model.predict(pairs).tolist(),
+                    max_batch_size=self.max_batch_size,
+                    max_wait_ms=self.max_wait_ms,
+                    name=f"rerank-batcher-{name}",
+                )
+                self._batchers[name] = batcher
+        return batcher
+
+    def predict(self, name: str, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        """Синхронная оценка пар моделью через общий батч.
+
+        Args:
+            name: Название модели.
+            pairs: Пары (запрос, документ).
+
+        Returns:
+            Массив скоров в порядке пар.
+        """
+        items = [(pair[0], pair[1]) for pair in pairs]
+        return np.asarray(self._get_batcher(name).process(items), dtype=np.float32)
+
+    async def apredict(self, name: str, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        """Асинхронная оценка пар моделью через общий батч.
+
+        Запрос не занимает поток: инференс выполняется потоком батчера модели.
+
+        Args:
+            name: Название модели.
+            pairs: Пары (запрос, документ).
+
+        Returns:
+            Массив скоров в порядке пар.
+        """
+        items = [(pair[0], pair[1]) for pair in pairs]
+        return np.asarray(await self._get_batcher(name).aprocess(items), dtype=np.float32)
+
+    def close(self) -> None:
+        """Остановка микро-батчеров моделей."""
+        with self._lock:
+            batchers = list(self._batchers.values())
+            self._batchers = {}
+        for batcher in batchers:
+            batcher.close()
+
+    def warmup(self, names: list[str] | None = None) -> None:
+        """Загрузка и прогрев моделей.
+
+        Args:
+            names: Названия моделей. Если None, все модели из настроек.
+        """
+        for name in names or self.configured_models():
+            try:
+                self.get(name).warmup()
+            except Exception as e:
+                logger.error(f"Не удалось прогреть модель реранкера {name}: {e}")
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение состояния моделей.
+
+        Returns:
+            Словарь название модели → статистика.
+        """
+        with self._lock:
+            models = dict(self._models)
+            batchers = dict(self._batchers)
+        stats = {name: model.get_stats() for name, model in models.items()}
+        for name, batcher in batchers.items():
+            stats[name]["batching"] = batcher.get_stats()
+        for name in self.configured_models():
+            stats.setdefault(name, {"state": RerankerModel.NOT_LOADED})
+        return stats
+
+
+@lru_cache()
+def get_reranker_registry() -> RerankerRegistry:
+    """Получить реестр моделей реранкера (singleton)."""
+    return RerankerRegistry()
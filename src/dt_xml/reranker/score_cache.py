@@ -0,0 +1,146 @@
+"""Кэш скоров реранкера."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+
+from dt_xml.config.settings import get_settings
+
+
+def _digest(text: str) -> str:
+    """Короткий хэш текста для ключа кэша."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RerankScoreCache:
+    """LRU кэш скоров cross-encoder с TTL.
+
+    Ключ — (модель, хэш запроса, хэш текста документа) по тому же тексту, который
+    оценивает модель. Ключ по содержимому, а не по chunk_id, остается корректным
+    при переиндексации и совпадает для одинаковых чанков разных деклараций.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 3600.0):
+        """Инициализация кэша.
+
+        Args:
+            max_entries: Максимальное количество скоров в кэше.
+            ttl_seconds: Время жизни записи в секундах (0 — без ограничения).
+        """
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str, str], tuple[float, float]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self._model_counters: dict[str, list[int]] = {}
+
+    def make_keys(self, model_name: str, query: str, documents: list[str]) -> list[tuple[str, str, str]]:
+        """Построение ключей кэша.
+
+        Args:
+            model_name: Название модели.
+            query: Текст запроса.
+            documents: Тексты документов.
+
+        Returns:
+            Список ключей в порядке документов.
+        """
+        query_hash = _digest(query)
+        return [(model_name, query_hash, _digest(document)) for document in documents]
+
+    def get_many(self, keys: list[tuple[str, str, str]]) -> list[float | None]:
+        """Получение скоров из кэша.
+
+        Args:
+            keys: Ключи кэша.
+
+        Returns:
+            Список скоров или None для отсутствующих записей.
+        """
+        now = time.monotonic()
+        results: list[float | None] = []
+
+        with self._lock:
+            for key in keys:
+                score = None
+                entry = self._entries.get(key)
+                if entry is not None:
+                    created_at, cached_score = entry
+                    if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                        del self._entries[key]
+                    else:
+                        self._entries.move_to_end(key)
+                        score = cached_score
+
+                counters = self._model_counters.setdefault(key[0], [0, 0])
+                if score is None:
+                    self.misses += 1
+                    counters[1] += 1
+                else:
+                    self.hits += 1
+                    counters[0] += 1
+                results.append(score)
+
+        return results
+
+    def put_many(self, keys: list[tuple[str, str, str]], scores: list[float]) -> None:
+        """Сохранение скоров в кэш.
+
+        Args:
+            keys: Ключи кэша.
+            scores: Скоры в порядке ключей.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key, score in zip(keys, scores, strict=True):
+                self._entries[key] = (now, float(score))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очистка кэша."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение статистики кэша.
+
+        Returns:
+            Словарь со счетчиками, в том числе по моделям.
+        """
+        total = self.hits + self.misses
+        with self._lock:
+            models = {
+                name: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                }
+                for name, (hits, misses) in self._model_counters.items()
+            }
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "models": models,
+        }
+
+
+@lru_cache()
+def get_rerank_score_cache() -> RerankScoreCache:
+    """Получить кэш скоров реранкера из настроек (singleton)."""
+    settings = get_settings().reranker
+    return RerankScoreCache(
+        max_entries=settings.score_cache_max_entries,
+        ttl_seconds=settings.score_cache_ttl_seconds,
+    )
@@ -0,0 +1,17 @@
+"""Инфраструктура выполнения: батчинг запросов к моделям и пулы потоков."""
+
+from dt_xml.runtime.batching import MicroBatcher
+from dt_xml.runtime.executors import (
+    get_inference_executor,
+    get_search_executor,
+    run_in_executor,
+    shutdown_executors,
+)
+
+__all__ = [
+    "MicroBatcher",
+    "get_inference_executor",
+    "get_search_executor",
+    "run_in_executor",
+    "shutdown_executors",
+]
@@ -0,0 +1,194 @@
+"""Динамический микро-батчинг запросов к моделям."""
+
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest[T, R]:
+    """Запрос, ожидающий обработки в батче."""
+
+    def __init__(self, items: list[T]):
+        self.items = items
+        self.future: Future[list[R]] = Future()
+
+
+class MicroBatcher[T, R]:
+    """Сборщик элементов из конкурентных запросов в общие батчи.
+
+    Фоновый поток ждет первый запрос, затем добирает запросы, пока суммарное
+    количество элементов не достигнет max_batch_size или не истечет max_wait_ms
+    с момента поступления первого запроса. Батч обрабатывается одним вызовом
+    process_fn, после чего каждый запрос получает свой срез результатов.
+    """
+
+    def __init__(
+        self,
+        process_fn: Callable[[list[T]], Sequence[R]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        name: str = "micro-batcher",
+    ):
+        """Инициализация батчера.
+
+        Args:
+            process_fn: Функция обработки батча; возвращает результаты в порядке элементов.
+            max_batch_size: Максимальное количество элементов в батче.
+            max_wait_ms: Максимальное время ожидания добора батча в миллисекундах.
+            name: Имя фонового потока.
+        """
+        self.process_fn = process_fn
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self.name = name
+
+        self._pending: list[_PendingRequest[T, R]] = []
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+
+    def submit(self, items: list[T]) -> Future[list[R]]:
+        """Постановка элементов в очередь на обработку.
+
+        Args:
+            items: Элементы одного запроса.
+
+        Returns:
+            Future со списком результатов для переданных элементов.
+        """
+        request: _PendingRequest[T, R] = _PendingRequest(list(items))
+        if not request.items:
+            request.future.set_result([])
+            return request.future
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"Батчер {self.name} остановлен")
+            self._ensure_thread()
+            self._pending.append(request)
+            self._condition.notify()
+
+        return request.future
+
+    def process(self, items: list[T]) -> list[R]:
+        """Синхронная обработка элементов через общий батч.
+
+        Args:
+            items: Элементы одного запроса.
+
+        Returns:
+            Список результатов.
+        """
+        return self.submit(items).result()
+
+    async def aprocess(self, items: list[T]) -> list[R]:
+        """Асинхронная обработка элементов через общий батч.
+
+        Args:
+            items: Элементы одного запроса.
+
+        Returns:
+            Список результатов.
+        """
+        return await asyncio.wrap_future(self.submit(items))
+
+    def close(self) -> None:
+        """Остановка фонового потока после обработки уже поставленных запросов."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение статистики батчинга.
+
+        Returns:
+            Словарь со статистикой.
+        """
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def _ensure_thread(self) -> None:
+        """Запуск фонового потока при первом запросе."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _collect_batch(self) -> list[_PendingRequest[T, R]] | None:
+        """Сбор запросов в батч.
+
+        Returns:
+            Список запросов или None, если батчер остановлен и очередь пуста.
+        """
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return None
+
+            deadline = time.monotonic() + self.max_wait
+            while not self._closed:
+                total = sum(len(request.items) for request in self._pending)
+                remaining = deadline - time.monotonic()
+                if total >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+            # Забираем запросы, пока батч не заполнен (первый запрос берется всегда)
+            batch: list[_PendingRequest[T, R]] = []
+            count = 0
+            while self._pending:
+                request = self._pending[0]
+                if batch and count + len(request.items) > self.max_batch_size:
+                    break
+                batch.append(self._pending.pop(0))
+                count += len(request.items)
+
+            return batch
+
+    def _run(self) -> None:
+        """Цикл фонового потока."""
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            items = [item for request in batch for item in request.items]
+            try:
+                results = list(self.process_fn(items))
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"Батчер {self.name}: получено {len(results)} результатов для {len(items)} элементов"
+                    )
+            except Exception as e:
+                logger.error(f"Ошибка при обработке батча в {self.name}: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.items += len(items)
+
+            offset = 0
+            for request in batch:
+                count = len(request.items)
+                request.future.set_result(results[offset : offset + count])
+                offset += count
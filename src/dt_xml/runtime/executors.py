@@ -0,0 +1,57 @@
+"""Пулы потоков для блокирующих операций в асинхронном API."""
+
+import asyncio
+import functools
+import logging
+from collections.abc import Callable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any
+
+from dt_xml.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Получить пул потоков для инференса моделей (singleton).
+
+    Инференс (эмбединги, реранкинг) выполняется в отдельном небольшом пуле,
+    чтобы не блокировать event loop и не конкурировать с поиском по индексам.
+    """
+    workers = get_settings().api.inference_workers
+    logger.info(f"Пул инференса: {workers} потоков")
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+
+
+@lru_cache()
+def get_search_executor() -> ThreadPoolExecutor:
+    """Получить пул потоков для поиска по локальным индексам (singleton)."""
+    workers = get_settings().api.search_workers
+    logger.info(f"Пул поиска: {workers} потоков")
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+
+
+async def run_in_executor[R](executor: Executor, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    """Выполнение блокирующей функции в пуле без блокировки event loop.
+
+    Args:
+        executor: Пул потоков.
+        fn: Функция.
+        *args: Позиционные аргументы функции.
+        **kwargs: Именованные аргументы функции.
+
+    Returns:
+        Результат функции.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Остановка созданных пулов потоков."""
+    for getter in (get_inference_executor, get_search_executor):
+        if getter.cache_info().currsize:
+            getter().shutdown(wait=False, cancel_futures=True)
+            getter.cache_clear()
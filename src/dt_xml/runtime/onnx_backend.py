@@ -0,0 +1,137 @@
+"""Бэкенды инференса моделей sentence-transformers: PyTorch и ONNX Runtime.
+
+Бэкенд "onnx-int8" экспортирует модель в ONNX, применяет динамическую
+int8-квантизацию весов и выполняет ее в ONNX Runtime. Экспорт выполняется один
+раз и сохраняется в export_dir; последующие запуски загружают готовый файл.
+Требует дополнительных зависимостей: pip install "dt-xml[onnx]".
+"""
+
+import logging
+import re
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _local_model_dir(export_dir: Path, model_name: str) -> Path:
+    """Директория экспортированной модели.
+
+    Args:
+        export_dir: Базовая директория экспорта.
+        model_name: Название модели.
+
+    Returns:
+        Путь к директории модели.
+    """
+    return Path(export_dir) / re.sub(r"[^\w.-]+", "__", model_name)
+
+
+def load_model(
+    model_class: type,
+    model_name: str,
+    device: str = "cpu",
+    backend: str = "torch",
+    export_dir: Path | str = "data/models/onnx",
+    quantization_config: str = "avx2",
+    **kwargs: Any,
+) -> Any:
+    """Загрузка SentenceTransformer или CrossEncoder с выбранным бэкендом.
+
+    Args:
+        model_class: Класс модели (SentenceTransformer или CrossEncoder).
+        model_name: Название модели.
+        device: Устройство.
+        backend: Бэкенд: torch, onnx (fp32) или onnx-int8.
+        export_dir: Директория для экспортированных ONNX моделей.
+        quantization_config: Целевой набор инструкций квантизации
+            (arm64, avx2, avx512, avx512_vnni).
+        **kwargs: Дополнительные аргументы конструктора модели.
+
+    Returns:
+        Загруженная модель.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд инференса: {backend}. Допустимые: {', '.join(BACKENDS)}")
+
+    if backend == "torch":
+        return model_class(model_name, device=device, **kwargs)
+
+    local_dir = _local_model_dir(Path(export_dir), model_name)
+    fp32_file = local_dir / "onnx" / "model.onnx"
+
+    if not fp32_file.exists():
+        logger.info(f"Экспорт модели {model_name} в ONNX: {local_dir}")
+        model = model_class(model_name, device=device, backend="onnx", **kwargs)
+        model.save_pretrained(str(local_dir))
+
+    if backend == "onnx":
+        return model_class(str(local_dir), device=device, backend="onnx", **kwargs)
+
+    quantized_name = f"model_qint8_{quantization_config}.onnx"
+    quantized_file = local_dir / "onnx" / quantized_name
+    if not quantized_file.exists():
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        logger.info(f"Динамическая int8-квантизация модели {model_name} ({quantization_config})")
+        model = model_class(str(local_dir), device=device, backend="onnx", **kwargs)
+        export_dynamic_quantized_onnx_model(model, quantization_config, str(local_dir))
+
+    return model_class(
+        str(local_dir),
+        device=device,
+        backend="onnx",
+        model_kwargs={"file_name": f"onnx/{quantized_name}"},
+        **kwargs,
+    )
+
+
+def check_parity(
+    reference_fn: Callable[[Sequence[Any]], Any],
+    candidate_fn: Callable[[Sequence[Any]], Any],
+    inputs: Sequence[Any],
+) -> dict[str, float]:
+    """Сравнение выходов двух бэкендов на одинаковых входах.
+
+    Для матриц эмбедингов считается косинусное сходство строк, для векторов
+    скоров — абсолютная разница и совпадение порядка (доля пар, упорядоченных
+    одинаково).
+
+    Args:
+        reference_fn: Функция эталонного бэкенда (PyTorch).
+        candidate_fn: Функция проверяемого бэкенда (ONNX).
+        inputs: Входные данные.
+
+    Returns:
+        Словарь метрик расхождения.
+    """
+    reference = np.asarray(reference_fn(inputs), dtype=np.float64)
+    candidate = np.asarray(candidate_fn(inputs), dtype=np.float64)
+    if reference.shape != candidate.shape:
+        raise ValueError(f"Размерности выходов не совпадают: {reference.shape} и {candidate.shape}")
+
+    if reference.ndim == 2:
+        norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+        cosine = np.sum(reference * candidate, axis=1) / np.maximum(norms, 1e-12)
+        return {
+            "min_cosine": float(cosine.min()),
+            "mean_cosine": float(cosine.mean()),
+        }
+
+    reference = reference.reshape(-1)
+    candidate = candidate.reshape(-1)
+    diff = np.abs(reference - candidate)
+    reference_order = np.sign(reference[:, None] - reference[None, :])
+    candidate_order = np.sign(candidate[:, None] - candidate[None, :])
+    pairs = max(len(reference) * (len(reference) - 1), 1)
+    agreement = (np.sum(reference_order == candidate_order) - len(reference)) / pairs
+    return {
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "order_agreement": float(agreement),
+    }
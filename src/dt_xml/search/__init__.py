@@ -4,5 +4,6 @@ from dt_xml.search.hybrid_search import HybridSearch
 from dt_xml.search.sparse_search import SparseSearch
 from dt_xml.search.dense_search import DenseSearch
 from dt_xml.search.metadata_filter import MetadataFilter
+from dt_xml.search.text_analyzer import TextAnalyzer
 
-__all__ = ["HybridSearch", "SparseSearch", "DenseSearch", "MetadataFilter"]
+__all__ = ["HybridSearch", "SparseSearch", "DenseSearch", "MetadataFilter", "TextAnalyzer"]
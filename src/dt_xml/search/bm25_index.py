@@ -0,0 +1,1371 @@
+"""Персистентный инвертированный индекс BM25 с инкрементальным обновлением.
+
+Индекс устроен как набор сегментов:
+
+- буфер в памяти принимает новые документы до вызова commit();
+- commit() сбрасывает буфер в неизменяемый сегмент на диске (postings и длины
+  документов в .npy, открываемых через mmap, сохраненные поля — в docs.jsonl);
+- удаления записываются как поколения файлов удалений сегмента;
+- сегменты сливаются по уровням размера (log-structured merge): уровень
+  сегмента — целая часть логарифма числа документов по основанию
+  merge_factor; когда на одном уровне накапливается max_segments сегментов,
+  они сливаются в сегмент следующего уровня с физическим удалением помеченных
+  документов. Каждый документ переписывается O(log N) раз.
+
+Состояние индекса описывается файлом manifest.json, который заменяется атомарно.
+Писатели из разных процессов (воркеры API, конвейер загрузки) сериализуются
+файловой блокировкой write.lock: изменения выполняются внутри writer(),
+который перед записью подхватывает изменения других процессов. Читающие
+процессы подхватывают их через refresh(): открываются только новые сегменты,
+у остальных перечитываются лишь файлы удалений.
+
+Поиск не берет блокировок: он работает с неизменяемым снимком индекса
+(сегменты с масками удалений и буфер на момент снимка), который писатель
+заменяет после каждого изменения.
+"""
+
+import bisect
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from collections.abc import Callable, Collection, Iterable, Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from dt_xml.config.settings import get_settings
+from dt_xml.search.text_analyzer import get_text_analyzer
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+if fcntl is None:
+    logger.warning("fcntl недоступен, запись в индекс BM25 не блокируется между процессами")
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def simple_tokenize(text: str) -> list[str]:
+    """Простая токенизация: слова в нижнем регистре.
+
+    Args:
+        text: Текст.
+
+    Returns:
+        Список токенов.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class _Segment:
+    """Неизменяемый сегмент индекса на диске."""
+
+    def __init__(self, path: Path, segment_id: int, deletes_gen: int = 0):
+        """Открытие сегмента.
+
+        Args:
+            path: Директория сегмента.
+            segment_id: Идентификатор сегмента.
+            deletes_gen: Поколение файла удалений (0 — удалений нет).
+        """
+        self.path = path
+        self.segment_id = segment_id
+        self.deletes_gen = deletes_gen
+
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(path / "terms.json", encoding="utf-8") as f:
+            self.terms: dict[str, list[int]] = json.load(f)
+        with open(path / "ids.json", encoding="utf-8") as f:
+            ids = json.load(f)
+
+        self.doc_count: int = meta["doc_count"]
+        self.total_length: int = meta["total_length"]
+        self.chunk_ids: list[str] = [item[0] for item in ids]
+        self.declaration_ids: list[str] = [item[1] for item in ids]
+
+        self.postings_docs = np.load(path / "postings_docs.npy", mmap_mode="r")
+        self.postings_tfs = np.load(path / "postings_tfs.npy", mmap_mode="r")
+        self.doc_lengths = np.load(path / "doc_lengths.npy", mmap_mode="r")
+        self.doc_offsets = np.load(path / "doc_offsets.npy", mmap_mode="r")
+
+        self.set_deletes(deletes_gen, self.read_deletes(deletes_gen))
+
+        # Сохраненные поля читаются через mmap: без общего файлового дескриптора
+        # и блокировок, отображение остается валидным после удаления сегмента
+        docs_path = path / "docs.jsonl"
+        if docs_path.stat().st_size:
+            self._docs: np.ndarray = np.memmap(docs_path, dtype=np.uint8, mode="r")
+        else:
+            self._docs = np.zeros(0, dtype=np.uint8)
+        self._docs_by_declaration: dict[str, list[int]] | None = None
+
+    def read_deletes(self, deletes_gen: int) -> np.ndarray:
+        """Чтение маски удаленных документов поколения.
+
+        Args:
+            deletes_gen: Поколение файла удалений (0 — удалений нет).
+
+        Returns:
+            Маска удаленных документов.
+        """
+        deleted = np.zeros(self.doc_count, dtype=bool)
+        if deletes_gen:
+            deleted[np.load(self.path / f"deletes_{deletes_gen}.npy")] = True
+        return deleted
+
+    def set_deletes(self, deletes_gen: int, deleted: np.ndarray) -> None:
+        """Замена маски удаленных документов.
+
+        Args:
+            deletes_gen: Поколение файла удалений.
+            deleted: Маска удаленных документов.
+        """
+        self.deletes_gen = deletes_gen
+        self.deleted = deleted
+        self.deleted_count = int(deleted.sum())
+        self.deleted_length = int(self.doc_lengths[deleted].sum()) if self.deleted_count else 0
+        self.pending_deletes = False
+        # Маска передана в снимок поиска и не должна изменяться на месте
+        self._deleted_shared = False
+
+    def share_deleted(self) -> np.ndarray:
+        """Маска удаленных документов для снимка поиска (далее копируется при записи)."""
+        self._deleted_shared = True
+        return self.deleted
+
+    @property
+    def deleted_ratio(self) -> float:
+        """Доля удаленных документов сегмента."""
+        return 1.0 - self.live_count / self.doc_count if self.doc_count else 0.0
+
+    @property
+    def live_count(self) -> int:
+        """Количество неудаленных документов."""
+        return self.doc_count - self.deleted_count
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Список вхождений термина.
+
+        Args:
+            term: Термин.
+
+        Returns:
+            Пара массивов (номера документов, частоты) или None.
+        """
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        offset, length = entry[0], entry[1]
+        return (
+            self.postings_docs[offset : offset + length],
+            self.postings_tfs[offset : offset + length],
+        )
+
+    def term_bounds(self, term: str) -> tuple[int, int] | None:
+        """Максимальная частота термина и минимальная длина содержащего его документа.
+
+        Args:
+            term: Термин.
+
+        Returns:
+            Пара (max_tf, min_dl) или None для сегментов без этой статистики.
+        """
+        entry = self.terms.get(term)
+        if entry is None or len(entry) < 4:
+            return None
+        return entry[2], entry[3]
+
+    def delete(self, local_id: int) -> None:
+        """Пометка документа как удаленного.
+
+        Args:
+            local_id: Номер документа в сегменте.
+        """
+        if not self.deleted[local_id]:
+            if self._deleted_shared:
+                self.deleted = self.deleted.copy()
+                self._deleted_shared = False
+            self.deleted[local_id] = True
+            self.deleted_count += 1
+            self.deleted_length += int(self.doc_lengths[local_id])
+            self.pending_deletes = True
+
+    def declaration_docs(self, declaration_ids: Collection[str]) -> list[int]:
+        """Номера документов деклараций (включая удаленные).
+
+        Индекс декларация → документы строится при первом обращении.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+
+        Returns:
+            Номера документов.
+        """
+        index = self._docs_by_declaration
+        if index is None:
+            index = {}
+            for local_id, declaration_id in enumerate(self.declaration_ids):
+                index.setdefault(declaration_id, []).append(local_id)
+            self._docs_by_declaration = index
+        return [local_id for declaration_id in declaration_ids for local_id in index.get(declaration_id, ())]
+
+    def raw_document(self, local_id: int) -> bytes:
+        """Сохраненные поля документа в виде строки JSON.
+
+        Args:
+            local_id: Номер документа в сегменте.
+
+        Returns:
+            Строка JSON (с переводом строки).
+        """
+        start = int(self.doc_offsets[local_id])
+        end = int(self.doc_offsets[local_id + 1]) if local_id + 1 < self.doc_count else len(self._docs)
+        return self._docs[start:end].tobytes()
+
+    def document(self, local_id: int) -> dict[str, Any]:
+        """Сохраненные поля документа.
+
+        Args:
+            local_id: Номер документа в сегменте.
+
+        Returns:
+            Словарь с полями документа.
+        """
+        return json.loads(self.raw_document(local_id))
+
+    def write_deletes(self) -> None:
+        """Запись нового поколения файла удалений."""
+        if not self.pending_deletes:
+            return
+        new_gen = self.deletes_gen + 1
+        np.save(self.path / f"deletes_{new_gen}.npy", np.flatnonzero(self.deleted).astype(np.int32))
+        self.deletes_gen = new_gen
+        self.pending_deletes = False
+
+    def remove_old_deletes(self) -> None:
+        """Удаление устаревших поколений файла удалений."""
+        for deletes_file in self.path.glob("deletes_*.npy"):
+            if deletes_file.name != f"deletes_{self.deletes_gen}.npy":
+                deletes_file.unlink(missing_ok=True)
+
+
+class _SegmentView:
+    """Сегмент в снимке поиска: файлы сегмента и маска удалений на момент снимка."""
+
+    def __init__(self, segment: _Segment):
+        """Фиксация состояния сегмента.
+
+        Args:
+            segment: Сегмент.
+        """
+        self.segment = segment
+        self.segment_id = segment.segment_id
+        self.doc_count = segment.doc_count
+        self.doc_lengths = segment.doc_lengths
+        self.deleted = segment.share_deleted()
+        self.live_count = segment.live_count
+        self.live_length = segment.total_length - segment.deleted_length
+
+    def df(self, term: str) -> int:
+        """Количество документов сегмента с термином (включая удаленные)."""
+        entry = self.segment.terms.get(term)
+        return entry[1] if entry is not None else 0
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Список вхождений термина (см. _Segment.postings)."""
+        return self.segment.postings(term)
+
+    def term_bounds(self, term: str) -> tuple[int, int] | None:
+        """Статистика термина для MaxScore (см. _Segment.term_bounds)."""
+        return self.segment.term_bounds(term)
+
+    def deleted_mask(self) -> np.ndarray:
+        """Маска удаленных документов на момент снимка."""
+        return self.deleted
+
+    def declaration_docs(self, declaration_ids: Collection[str]) -> list[int]:
+        """Номера документов деклараций (см. _Segment.declaration_docs)."""
+        return self.segment.declaration_docs(declaration_ids)
+
+    def document(self, local_id: int) -> dict[str, Any]:
+        """Сохраненные поля документа."""
+        return self.segment.document(local_id)
+
+
+class _MemorySegment:
+    """Буфер документов в памяти до сброса на диск."""
+
+    def __init__(self):
+        """Инициализация пустого буфера."""
+        self.documents: list[bytes] = []
+        self.chunk_ids: list[str] = []
+        self.declaration_ids: list[str] = []
+        self.lengths: list[int] = []
+        self.postings_map: dict[str, list[tuple[int, int]]] = {}
+        self.deleted: set[int] = set()
+
+    @property
+    def doc_count(self) -> int:
+        """Количество документов в буфере."""
+        return len(self.documents)
+
+    @property
+    def live_count(self) -> int:
+        """Количество неудаленных документов."""
+        return len(self.documents) - len(self.deleted)
+
+    @property
+    def live_length(self) -> int:
+        """Суммарная длина неудаленных документов."""
+        return sum(self.lengths) - sum(self.lengths[i] for i in self.deleted)
+
+    def add(self, document: dict[str, Any], tokens: list[str]) -> int:
+        """Добавление документа.
+
+        Args:
+            document: Сохраняемые поля документа.
+            tokens: Токены документа.
+
+        Returns:
+            Номер документа в буфере.
+        """
+        local_id = len(self.documents)
+        self.documents.append(json.dumps(document, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        self.chunk_ids.append(document["chunk_id"])
+        self.declaration_ids.append(document.get("declaration_id") or "")
+        self.lengths.append(len(tokens))
+
+        term_freqs: dict[str, int] = {}
+        for token in tokens:
+            term_freqs[token] = term_freqs.get(token, 0) + 1
+        for term, tf in term_freqs.items():
+            self.postings_map.setdefault(term, []).append((local_id, tf))
+
+        return local_id
+
+    def deleted_mask(self) -> np.ndarray:
+        """Маска удаленных документов буфера."""
+        mask = np.zeros(len(self.documents), dtype=bool)
+        if self.deleted:
+            mask[list(self.deleted)] = True
+        return mask
+
+    def delete(self, local_id: int) -> None:
+        """Пометка документа как удаленного.
+
+        Args:
+            local_id: Номер документа в буфере.
+        """
+        self.deleted.add(local_id)
+
+    def document(self, local_id: int) -> dict[str, Any]:
+        """Сохраненные поля документа.
+
+        Args:
+            local_id: Номер документа в буфере.
+
+        Returns:
+            Словарь с полями документа.
+        """
+        return json.loads(self.documents[local_id])
+
+
+class _BufferView:
+    """Буфер в снимке поиска: первые doc_count документов и удаления на момент снимка.
+
+    Буфер только дополняется (сброс заменяет его новым), поэтому снимку
+    достаточно запомнить количество документов.
+    """
+
+    segment_id = 0
+
+    def __init__(self, buffer: _MemorySegment):
+        """Фиксация состояния буфера.
+
+        Args:
+            buffer: Буфер документов.
+        """
+        self.buffer = buffer
+        self.doc_count = buffer.doc_count
+        self.doc_lengths = np.asarray(buffer.lengths[: self.doc_count], dtype=np.int32)
+        self.deleted = buffer.deleted_mask()
+        self.live_count = buffer.live_count
+        self.live_length = buffer.live_length
+
+    def _entries(self, term: str) -> list[tuple[int, int]]:
+        """Вхождения термина в документы снимка."""
+        entries = self.buffer.postings_map.get(term, [])
+        return entries[: bisect.bisect_left(entries, (self.doc_count,))]
+
+    def df(self, term: str) -> int:
+        """Количество документов буфера с термином (включая удаленные)."""
+        return len(self._entries(term))
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Список вхождений термина.
+
+        Args:
+            term: Термин.
+
+        Returns:
+            Пара массивов (номера документов, частоты) или None.
+        """
+        entries = self._entries(term)
+        if not entries:
+            return None
+        docs = np.fromiter((doc for doc, _ in entries), dtype=np.int32, count=len(entries))
+        tfs = np.fromiter((tf for _, tf in entries), dtype=np.int32, count=len(entries))
+        return docs, tfs
+
+    def term_bounds(self, term: str) -> tuple[int, int] | None:
+        """Максимальная частота термина и минимальная длина содержащего его документа.
+
+        Args:
+            term: Термин.
+
+        Returns:
+            Пара (max_tf, min_dl) или None.
+        """
+        entries = self._entries(term)
+        if not entries:
+            return None
+        return max(tf for _, tf in entries), min(int(self.doc_lengths[doc]) for doc, _ in entries)
+
+    def deleted_mask(self) -> np.ndarray:
+        """Маска удаленных документов на момент снимка."""
+        return self.deleted
+
+    def declaration_docs(self, declaration_ids: Collection[str]) -> list[int]:
+        """Номера документов деклараций.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+
+        Returns:
+            Номера документов.
+        """
+        wanted = set(declaration_ids)
+        return [i for i in range(self.doc_count) if self.buffer.declaration_ids[i] in wanted]
+
+    def document(self, local_id: int) -> dict[str, Any]:
+        """Сохраненные поля документа."""
+        return self.buffer.document(local_id)
+
+
+class _Snapshot:
+    """Неизменяемый снимок индекса для поиска."""
+
+    def __init__(self, sources: list[_SegmentView | _BufferView]):
+        """Инициализация снимка.
+
+        Args:
+            sources: Сегменты и буфер на момент снимка.
+        """
+        self.sources = sources
+        self.doc_count = sum(source.live_count for source in sources)
+        total_length = sum(source.live_length for source in sources)
+        self.avgdl = total_length / self.doc_count if self.doc_count else 0.0
+
+
+def _write_segment(
+    path: Path,
+    raw_documents: list[bytes],
+    ids: list[tuple[str, str]],
+    lengths: list[int],
+    postings_map: dict[str, list[tuple[int, int]]],
+) -> None:
+    """Запись сегмента на диск (через временную директорию).
+
+    Args:
+        path: Директория сегмента.
+        raw_documents: Сохраненные поля документов (строки JSON).
+        ids: Пары (chunk_id, declaration_id) по номерам документов.
+        lengths: Длины документов в токенах.
+        postings_map: Термин → список (номер документа, частота), упорядоченный по номеру.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    terms: dict[str, list[int]] = {}
+    total_postings = sum(len(entries) for entries in postings_map.values())
+    postings_docs = np.empty(total_postings, dtype=np.int32)
+    postings_tfs = np.empty(total_postings, dtype=np.int32)
+
+    offset = 0
+    for term in sorted(postings_map):
+        entries = postings_map[term]
+        length = len(entries)
+        max_tf = 0
+        min_dl = None
+        for i, (doc, tf) in enumerate(entries):
+            postings_docs[offset + i] = doc
+            postings_tfs[offset + i] = tf
+            max_tf = max(max_tf, tf)
+            min_dl = lengths[doc] if min_dl is None else min(min_dl, lengths[doc])
+        # Статистика для верхней оценки вклада термина (MaxScore)
+        terms[term] = [offset, length, max_tf, min_dl or 0]
+        offset += length
+
+    doc_offsets = np.empty(len(raw_documents), dtype=np.int64)
+    with open(tmp_path / "docs.jsonl", "wb") as f:
+        position = 0
+        for i, raw in enumerate(raw_documents):
+            doc_offsets[i] = position
+            f.write(raw)
+            position += len(raw)
+
+    np.save(tmp_path / "postings_docs.npy", postings_docs)
+    np.save(tmp_path / "postings_tfs.npy", postings_tfs)
+    np.save(tmp_path / "doc_lengths.npy", np.asarray(lengths, dtype=np.int32))
+    np.save(tmp_path / "doc_offsets.npy", doc_offsets)
+
+    with open(tmp_path / "terms.json", "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+    with open(tmp_path / "ids.json", "w", encoding="utf-8") as f:
+        json.dump(ids, f, ensure_ascii=False)
+    with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"doc_count": len(raw_documents), "total_length": int(sum(lengths))}, f)
+
+    os.replace(tmp_path, path)
+
+
+class _TermCursor:
+    """Курсор по списку вхождений термина."""
+
+    EXHAUSTED = 2**62
+
+    def __init__(self, docs: np.ndarray, tfs: np.ndarray, idf: float, upper_bound: float):
+        """Инициализация курсора.
+
+        Args:
+            docs: Упорядоченные номера документов.
+            tfs: Частоты термина в документах.
+            idf: IDF термина.
+            upper_bound: Верхняя оценка вклада термина в скор документа.
+        """
+        self.docs = docs
+        self.tfs = tfs
+        self.idf = idf
+        self.upper_bound = upper_bound
+        self.position = 0
+        self.size = len(docs)
+        self.current = int(docs[0]) if self.size else self.EXHAUSTED
+
+    def take_until(self, doc_limit: int) -> tuple[np.ndarray, np.ndarray]:
+        """Выборка вхождений с номерами документов меньше doc_limit и сдвиг курсора.
+
+        Args:
+            doc_limit: Граница окна номеров документов.
+
+        Returns:
+            Пара массивов (номера документов, частоты).
+        """
+        end = self.position + int(np.searchsorted(self.docs[self.position :], doc_limit))
+        docs = self.docs[self.position : end]
+        tfs = self.tfs[self.position : end]
+        self.position = end
+        self.current = int(self.docs[end]) if end < self.size else self.EXHAUSTED
+        return docs, tfs
+
+    def lookup(self, docs: np.ndarray) -> np.ndarray:
+        """Частоты термина в заданных документах (бинарный поиск).
+
+        Args:
+            docs: Упорядоченные номера документов.
+
+        Returns:
+            Массив частот (0 для документов без термина).
+        """
+        positions = np.searchsorted(self.docs, docs)
+        clipped = np.minimum(positions, self.size - 1)
+        found = (positions < self.size) & (np.asarray(self.docs[clipped]) == docs)
+        return np.where(found, np.asarray(self.tfs[clipped]), 0)
+
+    def scores(self, tfs: np.ndarray, length_norms: np.ndarray, k1: float) -> np.ndarray:
+        """Вклад термина в BM25 скор документов.
+
+        Args:
+            tfs: Частоты термина в документах.
+            length_norms: k1 * (1 - b + b * dl / avgdl) для документов.
+            k1: Параметр насыщения.
+
+        Returns:
+            Массив вкладов термина.
+        """
+        tfs = np.asarray(tfs, dtype=np.float64)
+        return self.idf * tfs * (k1 + 1.0) / (tfs + length_norms)
+
+
+def _size_level(size: int, base: int) -> int:
+    """Уровень размера сегмента: целая часть log_base(size)."""
+    level = 0
+    while size >= base:
+        size //= base
+        level += 1
+    return level
+
+
+def select_tiered_merge(sizes: list[int], segments_per_level: int, merge_factor: int) -> list[int]:
+    """Выбор сегментов для слияния по уровням размера.
+
+    Сливаются только сегменты одного уровня (близкого размера), поэтому
+    большой сегмент не переписывается при каждом сбросе маленького буфера.
+
+    Args:
+        sizes: Количество неудаленных документов сегментов.
+        segments_per_level: Количество сегментов уровня, при котором запускается слияние.
+        merge_factor: Основание уровней и максимум сегментов в одном слиянии.
+
+    Returns:
+        Индексы сегментов для слияния (пустой список, если слияние не нужно).
+    """
+    levels: dict[int, list[int]] = {}
+    for i, size in enumerate(sizes):
+        levels.setdefault(_size_level(size, merge_factor), []).append(i)
+
+    for level in sorted(levels):
+        members = levels[level]
+        if len(members) >= segments_per_level:
+            return sorted(members, key=lambda i: sizes[i])[:merge_factor]
+    return []
+
+
+class BM25Index:
+    """Сегментированный инвертированный индекс BM25."""
+
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = "write.lock"
+    # Размер окна номеров документов при вычислении MaxScore
+    WINDOW_SIZE = 16384
+    # Доля удаленных документов, при которой сегмент переписывается отдельно
+    EXPUNGE_DELETES_RATIO = 0.5
+
+    def __init__(
+        self,
+        path: Path,
+        k1: float = 1.5,
+        b: float = 0.75,
+        tokenizer: Callable[[str], list[str]] | None = None,
+        max_segments: int = 10,
+        merge_factor: int = 10,
+    ):
+        """Инициализация индекса.
+
+        Args:
+            path: Директория индекса.
+            k1: Параметр насыщения частоты термина.
+            b: Параметр нормализации по длине документа.
+            tokenizer: Функция токенизации (для индекса и запросов). Атрибут name
+                функции, если есть, сохраняется в manifest.json.
+            max_segments: Количество сегментов одного уровня размера, при котором
+                запускается их слияние.
+            merge_factor: Основание уровней размера сегментов и максимум
+                сегментов, сливаемых за раз.
+        """
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer or simple_tokenize
+        self.analyzer_name = getattr(self.tokenizer, "name", "simple")
+        self.max_segments = max(max_segments, 2)
+        self.merge_factor = max(merge_factor, 2)
+
+        self._lock = threading.RLock()
+        self._segments: list[_Segment] = []
+        self._buffer = _MemorySegment()
+        self._next_segment_id = 1
+        self._manifest_version: tuple[int, int, int] | None = None
+        # Есть изменения в памяти, не записанные commit()
+        self._dirty = False
+        # Поток, выполняющий изменения внутри writer()
+        self._writer_thread: int | None = None
+
+        # chunk_id → (segment_id или 0 для буфера, номер документа)
+        self._locations: dict[str, tuple[int, int]] = {}
+        self._declarations: dict[str, set[str]] = {}
+        # Снимок для поиска, заменяется целиком после каждого изменения
+        self._snapshot = _Snapshot([])
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Загрузка и сохранение
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        """Загрузка сегментов по manifest.json (вызывается под блокировкой).
+
+        Открываются только сегменты, которых еще нет в памяти; у открытых
+        сегментов с новым поколением удалений перечитывается маска удалений.
+        Файлы читаются до изменения состояния в памяти, поэтому ошибка чтения
+        оставляет индекс в прежнем состоянии.
+        """
+        manifest_path = self.path / self.MANIFEST_FILE
+        if not manifest_path.exists():
+            return
+
+        version = self._read_manifest_version()
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        analyzer_name = manifest.get("analyzer", "simple")
+        if self._manifest_version is None and manifest.get("segments") and analyzer_name != self.analyzer_name:
+            logger.warning(
+                f"Индекс BM25 построен анализатором {analyzer_name}, текущий анализатор "
+                f"{self.analyzer_name}: требуется переиндексация"
+            )
+
+        current = {segment.segment_id: segment for segment in self._segments}
+        segments: list[_Segment] = []
+        opened: list[_Segment] = []
+        new_deletes: list[tuple[_Segment, int, np.ndarray]] = []
+        for entry in manifest.get("segments", []):
+            deletes_gen = entry.get("deletes_gen", 0)
+            segment = current.pop(entry["id"], None)
+            if segment is None:
+                segment = _Segment(self.path / self._segment_name(entry["id"]), entry["id"], deletes_gen=deletes_gen)
+                opened.append(segment)
+            elif segment.deletes_gen != deletes_gen:
+                new_deletes.append((segment, deletes_gen, segment.read_deletes(deletes_gen)))
+            segments.append(segment)
+
+        for segment, deletes_gen, deleted in new_deletes:
+            for local_id in np.flatnonzero(deleted & ~segment.deleted).tolist():
+                self._unregister(segment, local_id)
+            segment.set_deletes(deletes_gen, deleted)
+        for segment in current.values():
+            # Слитые или удаленные сегменты: документы остаются только в новых сегментах
+            for local_id in range(segment.doc_count):
+                self._unregister(segment, local_id)
+
+        self._segments = segments
+        for segment in opened:
+            self._register_segment(segment)
+        self._next_segment_id = manifest.get("next_segment_id", 1)
+        self._manifest_version = version
+        self._publish()
+
+        logger.info(
+            f"Индекс BM25 загружен: {len(self._segments)} сегментов ({len(opened)} новых), {len(self)} документов"
+        )
+
+    def _register_segment(self, segment: _Segment) -> None:
+        """Регистрация идентификаторов документов сегмента.
+
+        Args:
+            segment: Сегмент.
+        """
+        for local_id, (chunk_id, declaration_id) in enumerate(
+            zip(segment.chunk_ids, segment.declaration_ids, strict=True)
+        ):
+            if segment.deleted[local_id]:
+                continue
+            self._locations[chunk_id] = (segment.segment_id, local_id)
+            self._declarations.setdefault(declaration_id, set()).add(chunk_id)
+
+    def _unregister(self, segment: _Segment, local_id: int) -> None:
+        """Снятие регистрации документа сегмента, если он не перемещен в другой сегмент.
+
+        Args:
+            segment: Сегмент.
+            local_id: Номер документа в сегменте.
+        """
+        chunk_id = segment.chunk_ids[local_id]
+        if self._locations.get(chunk_id) != (segment.segment_id, local_id):
+            return
+        del self._locations[chunk_id]
+        declaration_id = segment.declaration_ids[local_id]
+        chunk_ids = self._declarations.get(declaration_id)
+        if chunk_ids is not None:
+            chunk_ids.discard(chunk_id)
+            if not chunk_ids:
+                del self._declarations[declaration_id]
+
+    def _publish(self) -> None:
+        """Замена снимка для поиска текущим состоянием (вызывается под блокировкой)."""
+        self._snapshot = _Snapshot([*(_SegmentView(segment) for segment in self._segments), _BufferView(self._buffer)])
+
+    @staticmethod
+    def _segment_name(segment_id: int) -> str:
+        """Имя директории сегмента."""
+        return f"seg_{segment_id:06d}"
+
+    def _write_manifest(self) -> None:
+        """Атомарная запись manifest.json."""
+        manifest = {
+            "version": 1,
+            "next_segment_id": self._next_segment_id,
+            "k1": self.k1,
+            "b": self.b,
+            "analyzer": self.analyzer_name,
+            "segments": [
+                {"id": segment.segment_id, "doc_count": segment.doc_count, "deletes_gen": segment.deletes_gen}
+                for segment in self._segments
+            ],
+        }
+        manifest_path = self.path / self.MANIFEST_FILE
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+        self._manifest_version = self._read_manifest_version()
+
+    def _read_manifest_version(self) -> tuple[int, int, int] | None:
+        """Версия manifest.json на диске: inode, время и размер файла.
+
+        Файл заменяется через os.replace, поэтому каждая запись меняет inode.
+        """
+        try:
+            stat = (self.path / self.MANIFEST_FILE).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> None:
+        """Подхват изменений, если manifest.json изменен другим процессом.
+
+        Не выполняется, пока в памяти есть незаписанные изменения, а также
+        если блокировку индекса держит другой поток (писатель сам подхватывает
+        изменения, поиск продолжает работать с текущим снимком).
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._dirty:
+                return
+            version = self._read_manifest_version()
+            if version is None or version == self._manifest_version:
+                return
+            try:
+                self._load()
+            except FileNotFoundError as e:
+                # Другой процесс успел заменить файлы; изменения подхватятся при следующем вызове
+                logger.debug(f"Индекс BM25 изменяется другим процессом: {e}")
+        finally:
+            self._lock.release()
+
+    @contextmanager
+    def writer(self) -> Iterator["BM25Index"]:
+        """Изменение индекса под блокировкой писателя.
+
+        Берет файловую блокировку write.lock (общую для процессов), затем
+        блокировку потоков и подхватывает изменения других процессов. Файловая
+        блокировка берется первой, чтобы ожидание чужой записи не задерживало
+        потоки этого процесса. Изменения (add_documents, delete_*, commit)
+        выполняются внутри блока; вложенные вызовы из того же потока повторно
+        используют блокировку.
+
+        Yields:
+            Этот индекс.
+        """
+        if self._writer_thread == threading.get_ident():
+            yield self
+            return
+
+        with open(self.path / self.LOCK_FILE, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                with self._lock:
+                    self._writer_thread = threading.get_ident()
+                    try:
+                        if not self._dirty and self._read_manifest_version() != self._manifest_version:
+                            self._load()
+                        yield self
+                    finally:
+                        self._writer_thread = None
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reset_state(self) -> None:
+        """Очистка состояния в памяти."""
+        self._segments = []
+        self._buffer = _MemorySegment()
+        self._locations = {}
+        self._declarations = {}
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Изменение индекса
+    # ------------------------------------------------------------------
+
+    def add_documents(self, documents: Iterable[dict[str, Any]]) -> int:
+        """Добавление документов (с заменой документов с тем же chunk_id).
+
+        Args:
+            documents: Документы с полями chunk_id, declaration_id, content и metadata.
+
+        Returns:
+            Количество добавленных документов.
+        """
+        count = 0
+        with self._lock:
+            for document in documents:
+                chunk_id = str(document["chunk_id"])
+                self._delete_chunk(chunk_id)
+
+                stored = {
+                    "chunk_id": chunk_id,
+                    "declaration_id": document.get("declaration_id"),
+                    "content": document.get("content", ""),
+                    "section": document.get("section"),
+                    "metadata": document.get("metadata") or {},
+                }
+                tokens = self.tokenizer(stored["content"])
+                local_id = self._buffer.add(stored, tokens)
+
+                self._locations[chunk_id] = (0, local_id)
+                self._declarations.setdefault(stored["declaration_id"] or "", set()).add(chunk_id)
+                self._dirty = True
+                count += 1
+            self._publish()
+
+        return count
+
+    def delete_documents(self, chunk_ids: Iterable[str]) -> int:
+        """Удаление документов по chunk_id.
+
+        Args:
+            chunk_ids: Идентификаторы документов.
+
+        Returns:
+            Количество удаленных документов.
+        """
+        with self._lock:
+            deleted = sum(1 for chunk_id in chunk_ids if self._delete_chunk(chunk_id))
+            if deleted:
+                self._publish()
+            return deleted
+
+    def delete_by_declaration_id(self, declaration_id: str) -> int:
+        """Удаление всех документов декларации.
+
+        Args:
+            declaration_id: Идентификатор декларации.
+
+        Returns:
+            Количество удаленных документов.
+        """
+        with self._lock:
+            chunk_ids = list(self._declarations.get(declaration_id, ()))
+            return self.delete_documents(chunk_ids)
+
+    def _delete_chunk(self, chunk_id: str) -> bool:
+        """Пометка документа как удаленного (вызывается под блокировкой).
+
+        Args:
+            chunk_id: Идентификатор документа.
+
+        Returns:
+            True, если документ существовал.
+        """
+        location = self._locations.pop(chunk_id, None)
+        if location is None:
+            return False
+        self._dirty = True
+
+        segment_id, local_id = location
+        if segment_id == 0:
+            declaration_id = self._buffer.declaration_ids[local_id]
+            self._buffer.delete(local_id)
+        else:
+            segment = self._get_segment(segment_id)
+            declaration_id = segment.declaration_ids[local_id]
+            segment.delete(local_id)
+
+        chunk_ids = self._declarations.get(declaration_id)
+        if chunk_ids is not None:
+            chunk_ids.discard(chunk_id)
+            if not chunk_ids:
+                del self._declarations[declaration_id]
+        return True
+
+    def _get_segment(self, segment_id: int) -> _Segment:
+        """Поиск сегмента по идентификатору."""
+        for segment in self._segments:
+            if segment.segment_id == segment_id:
+                return segment
+        raise KeyError(f"Сегмент {segment_id} не найден")
+
+    def clear(self) -> None:
+        """Удаление всех документов индекса."""
+        with self.writer():
+            self._reset_state()
+            for segment_dir in self.path.glob("seg_*"):
+                shutil.rmtree(segment_dir, ignore_errors=True)
+            self._write_manifest()
+            self._publish()
+
+    def commit(self) -> None:
+        """Сброс буфера в новый сегмент, запись удалений и слияние сегментов.
+
+        Raises:
+            RuntimeError: Индекс изменен другим процессом после загрузки, а
+                изменения внесены вне writer() — запись потеряла бы чужие сегменты.
+        """
+        with self.writer():
+            if self._dirty and self._read_manifest_version() != self._manifest_version:
+                raise RuntimeError(
+                    f"Индекс BM25 {self.path} изменен другим процессом: изменения нужно выполнять внутри writer()"
+                )
+            if self._buffer.doc_count:
+                self._flush_buffer()
+
+            for segment in self._segments:
+                segment.write_deletes()
+            self._write_manifest()
+            for segment in self._segments:
+                segment.remove_old_deletes()
+            self._dirty = False
+            self._publish()
+
+            self.merge()
+
+    def _flush_buffer(self) -> None:
+        """Запись буфера в новый сегмент (вызывается под блокировкой)."""
+        buffer = self._buffer
+        live = [i for i in range(buffer.doc_count) if i not in buffer.deleted]
+        if not live:
+            self._buffer = _MemorySegment()
+            return
+
+        # Перенумерация документов без удаленных
+        remap = {old: new for new, old in enumerate(live)}
+        postings_map: dict[str, list[tuple[int, int]]] = {}
+        for term, entries in buffer.postings_map.items():
+            remapped = [(remap[doc], tf) for doc, tf in entries if doc in remap]
+            if remapped:
+                postings_map[term] = remapped
+
+        segment_id = self._next_segment_id
+        self._next_segment_id += 1
+        segment_path = self.path / self._segment_name(segment_id)
+
+        _write_segment(
+            segment_path,
+            [buffer.documents[i] for i in live],
+            [(buffer.chunk_ids[i], buffer.declaration_ids[i]) for i in live],
+            [buffer.lengths[i] for i in live],
+            postings_map,
+        )
+
+        segment = _Segment(segment_path, segment_id)
+        self._segments.append(segment)
+        for new_id, old_id in enumerate(live):
+            self._locations[buffer.chunk_ids[old_id]] = (segment_id, new_id)
+        self._buffer = _MemorySegment()
+
+    def merge(self, force: bool = False) -> None:
+        """Слияние сегментов с физическим удалением помеченных документов.
+
+        Args:
+            force: Слить все сегменты в один. Иначе сливаются сегменты
+                заполненных уровней размера (см. select_tiered_merge), пока
+                такие есть, и переписываются сегменты с большой долей удалений.
+        """
+        with self.writer():
+            if self._dirty:
+                # commit() сбрасывает буфер и удаления и сам выполняет слияние по уровням
+                self.commit()
+
+            if force:
+                if len(self._segments) > 1 or any(s.deleted.any() for s in self._segments):
+                    self._merge_segments(list(self._segments))
+                return
+
+            while True:
+                selected = select_tiered_merge(
+                    [segment.live_count for segment in self._segments], self.max_segments, self.merge_factor
+                )
+                sources = [self._segments[i] for i in selected]
+                if not sources:
+                    sources = [s for s in self._segments if s.deleted_ratio >= self.EXPUNGE_DELETES_RATIO][:1]
+                if not sources:
+                    return
+                self._merge_segments(sources)
+
+    def _merge_segments(self, sources: list[_Segment]) -> None:
+        """Слияние сегментов в новый сегмент (вызывается под блокировкой).
+
+        Args:
+            sources: Сливаемые сегменты.
+        """
+        raw_documents: list[bytes] = []
+        ids: list[tuple[str, str]] = []
+        lengths: list[int] = []
+        postings_map: dict[str, list[tuple[int, int]]] = {}
+
+        for segment in sources:
+            live_ids = np.flatnonzero(~segment.deleted)
+            remap = np.full(segment.doc_count, -1, dtype=np.int64)
+            remap[live_ids] = np.arange(len(raw_documents), len(raw_documents) + len(live_ids))
+
+            for local_id in live_ids:
+                raw_documents.append(segment.raw_document(int(local_id)))
+                ids.append((segment.chunk_ids[local_id], segment.declaration_ids[local_id]))
+                lengths.append(int(segment.doc_lengths[local_id]))
+
+            for term, entry in segment.terms.items():
+                offset, length = entry[0], entry[1]
+                docs = remap[segment.postings_docs[offset : offset + length]]
+                tfs = segment.postings_tfs[offset : offset + length]
+                keep = docs >= 0
+                if keep.any():
+                    postings_map.setdefault(term, []).extend(
+                        zip(docs[keep].tolist(), tfs[keep].tolist(), strict=True)
+                    )
+
+        segment_id = self._next_segment_id
+        self._next_segment_id += 1
+        segment_path = self.path / self._segment_name(segment_id)
+        _write_segment(segment_path, raw_documents, ids, lengths, postings_map)
+
+        source_ids = {segment.segment_id for segment in sources}
+        self._segments = [s for s in self._segments if s.segment_id not in source_ids]
+        merged = _Segment(segment_path, segment_id)
+        self._segments.append(merged)
+        for local_id, (chunk_id, _) in enumerate(ids):
+            self._locations[chunk_id] = (segment_id, local_id)
+        for segment in self._segments:
+            segment.write_deletes()
+        self._write_manifest()
+        self._publish()
+
+        # Снимки поиска, открытые до слияния, читают удаленные сегменты через mmap
+        for segment in sources:
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+        logger.info(f"Слияние {len(sources)} сегментов BM25 в сегмент {segment_id}: {len(ids)} документов")
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        """Количество неудаленных документов."""
+        return self._snapshot.doc_count
+
+    @staticmethod
+    def _idf(term: str, snapshot: _Snapshot) -> float:
+        """IDF термина (вариант BM25 с неотрицательным значением).
+
+        Частота термина учитывает удаленные, но еще не слитые документы, поэтому
+        ограничивается сверху количеством документов: вклад термина должен
+        оставаться неотрицательным, иначе верхние оценки MaxScore некорректны.
+
+        Args:
+            term: Термин.
+            snapshot: Снимок индекса.
+
+        Returns:
+            Значение IDF.
+        """
+        df = min(sum(source.df(term) for source in snapshot.sources), snapshot.doc_count)
+        return math.log(1.0 + (snapshot.doc_count - df + 0.5) / (df + 0.5))
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        declaration_ids: Collection[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск top-k документов по запросу.
+
+        Обрабатываются только списки вхождений терминов запроса; документы,
+        которые заведомо не попадают в top-k, отсекаются по верхним оценкам
+        вклада терминов (MaxScore), а лучшие результаты отбираются через кучу.
+        Поиск выполняется без блокировок по снимку индекса.
+
+        Args:
+            query: Текст запроса.
+            top_k: Количество результатов.
+            declaration_ids: Декларации, среди документов которых выполняется
+                поиск. Документы остальных деклараций исключаются до отбора
+                top-k. Если None, поиск по всему индексу.
+
+        Returns:
+            Список документов с полем score, по убыванию скора.
+        """
+        terms = list(dict.fromkeys(self.tokenizer(query)))
+        if not terms or top_k <= 0:
+            return []
+
+        snapshot = self._snapshot
+        if snapshot.doc_count == 0:
+            return []
+
+        idfs = {term: self._idf(term, snapshot) for term in terms}
+
+        # Min-куча (score, номер источника, номер документа) размером top_k
+        heap: list[tuple[float, int, int]] = []
+        for source_index, source in enumerate(snapshot.sources):
+            if not source.doc_count:
+                continue
+            excluded = None
+            if declaration_ids is not None:
+                local_ids = source.declaration_docs(declaration_ids)
+                if not local_ids:
+                    continue
+                excluded = np.ones(source.doc_count, dtype=bool)
+                excluded[local_ids] = False
+            self._search_source(source, source_index, terms, idfs, snapshot.avgdl, top_k, heap, excluded)
+
+        results = []
+        for score, source_index, local_id in sorted(heap, reverse=True):
+            document = snapshot.sources[source_index].document(local_id)
+            document["score"] = score
+            results.append(document)
+
+        return results
+
+    def _search_source(
+        self,
+        source: _SegmentView | _BufferView,
+        source_index: int,
+        terms: list[str],
+        idfs: dict[str, float],
+        avgdl: float,
+        top_k: int,
+        heap: list[tuple[float, int, int]],
+        excluded: np.ndarray | None = None,
+    ) -> None:
+        """Вычисление top-k по одному сегменту методом MaxScore.
+
+        Термины упорядочиваются по верхней оценке вклада. Префикс терминов, сумма
+        оценок которых не превышает текущий порог кучи, считается «несущественным»:
+        кандидаты порождаются только существенными списками, а несущественные
+        проверяются бинарным поиском лишь для кандидатов, которые еще могут
+        превысить порог. Документы обрабатываются окнами номеров, внутри окна
+        вычисления векторизованы, порог обновляется после каждого окна.
+
+        Args:
+            source: Сегмент или буфер.
+            source_index: Номер источника для кучи.
+            terms: Термины запроса.
+            idfs: IDF терминов.
+            avgdl: Средняя длина документа.
+            top_k: Количество результатов.
+            heap: Общая для всех сегментов min-куча результатов.
+            excluded: Маска документов источника, исключенных фильтром.
+        """
+        k1, b = self.k1, self.b
+        cursors: list[_TermCursor] = []
+        for term in terms:
+            postings = source.postings(term)
+            if postings is None:
+                continue
+            idf = idfs[term]
+            bounds = source.term_bounds(term)
+            if bounds is None:
+                upper_bound = idf * (k1 + 1.0)
+            else:
+                max_tf, min_dl = bounds
+                upper_bound = idf * max_tf * (k1 + 1.0) / (max_tf + k1 * (1.0 - b + b * min_dl / avgdl))
+            cursors.append(_TermCursor(postings[0], postings[1], idf, upper_bound))
+
+        if not cursors:
+            return
+
+        cursors.sort(key=lambda cursor: cursor.upper_bound)
+        # prefix_bounds[i] — сумма верхних оценок терминов 0..i
+        prefix_bounds = np.cumsum([cursor.upper_bound for cursor in cursors]).tolist()
+
+        doc_lengths = np.asarray(source.doc_lengths)
+        deleted = source.deleted_mask()
+        if excluded is not None:
+            deleted = deleted | excluded
+
+        def length_norms(docs: np.ndarray) -> np.ndarray:
+            return k1 * (1.0 - b + b * doc_lengths[docs] / avgdl)
+
+        threshold = heap[0][0] if len(heap) >= top_k else 0.0
+        first_essential = bisect.bisect_right(prefix_bounds, threshold) if len(heap) >= top_k else 0
+
+        while first_essential < len(cursors):
+            essential = cursors[first_essential:]
+            window_start = min(cursor.current for cursor in essential)
+            if window_start == _TermCursor.EXHAUSTED:
+                break
+            window_end = window_start + self.WINDOW_SIZE
+
+            # Кандидаты окна и их скоры по существенным терминам
+            doc_parts: list[np.ndarray] = []
+            score_parts: list[np.ndarray] = []
+            for cursor in essential:
+                docs, tfs = cursor.take_until(window_end)
+                if len(docs):
+                    docs = np.asarray(docs)
+                    doc_parts.append(docs)
+                    score_parts.append(cursor.scores(tfs, length_norms(docs), k1))
+
+            candidates, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            live = ~deleted[candidates]
+            candidates, scores = candidates[live], scores[live]
+
+            # Несущественные термины: от большей оценки к меньшей
+            heap_full = len(heap) >= top_k
+            for i in range(first_essential - 1, -1, -1):
+                if heap_full:
+                    keep = scores + prefix_bounds[i] > threshold
+                    candidates, scores = candidates[keep], scores[keep]
+                if not len(candidates):
+                    break
+                tfs = cursors[i].lookup(candidates)
+                scores = scores + cursors[i].scores(tfs, length_norms(candidates), k1)
+
+            if heap_full:
+                keep = scores > threshold
+                candidates, scores = candidates[keep], scores[keep]
+            if len(scores) > top_k:
+                top = np.argpartition(-scores, top_k)[:top_k]
+                candidates, scores = candidates[top], scores[top]
+
+            for doc, score in zip(candidates.tolist(), scores.tolist(), strict=True):
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (score, source_index, doc))
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, (score, source_index, doc))
+
+            if len(heap) >= top_k:
+                threshold = heap[0][0]
+                first_essential = bisect.bisect_right(prefix_bounds, threshold)
+
+
+@lru_cache()
+def get_bm25_index() -> BM25Index:
+    """Получить индекс BM25 из настроек (singleton)."""
+    sparse_settings = get_settings().search.sparse
+    analyzer = sparse_settings.get("analyzer", "morphology")
+    if analyzer == "morphology":
+        tokenizer = get_text_analyzer()
+    elif analyzer == "simple":
+        tokenizer = simple_tokenize
+    else:
+        raise ValueError(f"Неизвестный анализатор BM25: {analyzer}")
+
+    return BM25Index(
+        path=Path(sparse_settings.get("index_path", "data/processed/bm25")),
+        k1=sparse_settings.get("k1", 1.5),
+        b=sparse_settings.get("b", 0.75),
+        tokenizer=tokenizer,
+        max_segments=sparse_settings.get("max_segments", 10),
+        merge_factor=sparse_settings.get("merge_factor", 10),
+    )
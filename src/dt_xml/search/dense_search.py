@@ -3,11 +3,12 @@
 import logging
 from typing import Any
 
-import numpy as np
-
-from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder
+from dt_xml.config.settings import get_settings
+from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder, get_embedder
+from dt_xml.embedding.query_cache import QueryEmbeddingCache
+from dt_xml.runtime.executors import get_inference_executor, run_in_executor
 from dt_xml.search.metadata_filter import MetadataFilter
-from dt_xml.storage.vector_store import VectorStore
+from dt_xml.storage.vector_backend import create_vector_store
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +22,15 @@ class DenseSearch:
         Args:
             embedder: Эмбеддер для генерации эмбедингов запросов.
         """
-        self.vector_store = VectorStore()
-        self.embedder = embedder or MultilingualEmbedder()
+        self.settings = get_settings()
+        self.vector_store = create_vector_store()
+        self.embedder = embedder or get_embedder()
         self.metadata_filter = MetadataFilter()
+        self.query_cache = QueryEmbeddingCache(
+            self.embedder.embed,
+            max_entries=self.settings.embedding.query_cache_max_entries,
+            ttl_seconds=self.settings.embedding.query_cache_ttl_seconds,
+        )
 
     def search(
         self,
@@ -42,11 +49,8 @@ class DenseSearch:
             Список результатов поиска.
         """
         try:
-            # Генерация эмбединга запроса
-            query_embedding = self.embedder.embed(query)
-
-            if isinstance(query_embedding, list):
-                query_embedding = np.array(query_embedding)
+            # Генерация эмбединга запроса (через кэш запросов)
+            query_embedding = self.query_cache.get(query)
 
             # Поиск в векторной БД
             results = self.vector_store.search(
@@ -64,3 +68,40 @@ class DenseSearch:
         except Exception as e:
             logger.error(f"Ошибка при векторном поиске: {e}")
             return []
+
+    async def asearch(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Асинхронный векторный поиск по запросу.
+
+        Эмбединг запроса вычисляется в пуле инференса, запрос к Qdrant
+        выполняется асинхронным клиентом.
+
+        Args:
+            query: Текст запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Список результатов поиска.
+        """
+        try:
+            query_embedding = await run_in_executor(get_inference_executor(), self.query_cache.get, query)
+
+            results = await self.vector_store.asearch(
+                query_embedding=query_embedding,
+                top_k=top_k,
+                filters=filters,
+            )
+
+            if filters:
+                results = self.metadata_filter.filter_results(results, filters)
+
+            return results
+
+        except Exception as e:
+            logger.error(f"Ошибка при векторном поиске: {e}")
+            return []
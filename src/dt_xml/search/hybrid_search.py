@@ -1,11 +1,15 @@
 """Гибридный поиск (sparse + dense)."""
 
+import asyncio
 import logging
 from typing import Any
 
-from dt_xml.config.settings import get_settings
+from dt_xml.config.settings import Settings, get_settings
+from dt_xml.runtime.executors import get_search_executor, run_in_executor
 from dt_xml.search.dense_search import DenseSearch
+from dt_xml.search.metadata_filter import MetadataFilter
 from dt_xml.search.sparse_search import SparseSearch
+from dt_xml.storage.metadata_store import MetadataStore, get_metadata_store
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +17,37 @@ logger = logging.getLogger(__name__)
 class HybridSearch:
     """Гибридный поиск, объединяющий sparse и dense результаты."""
 
-    def __init__(self):
-        """Инициализация гибридного поиска."""
-        self.settings = get_settings()
-        self.sparse_search = SparseSearch()
-        self.dense_search = DenseSearch()
-        self.alpha = self.settings.search.hybrid_alpha
+    def __init__(
+        self,
+        sparse_search: SparseSearch | None = None,
+        dense_search: DenseSearch | None = None,
+        metadata_store: MetadataStore | None = None,
+        settings: Settings | None = None,
+        alpha: float | None = None,
+    ):
+        """Инициализация гибридного поиска.
+
+        Args:
+            sparse_search: BM25 поиск. Если None, поиск по общему индексу.
+            dense_search: Векторный поиск. Если None, создается по настройкам.
+            metadata_store: Хранилище метаданных для нечетких фильтров. Если None,
+                общее хранилище (подключается при первом нечетком фильтре).
+            settings: Настройки приложения. Если None, общие настройки процесса.
+            alpha: Вес векторного поиска. Если None, search.hybrid_alpha из настроек.
+        """
+        self.settings = settings or get_settings()
+        self.sparse_search = sparse_search or SparseSearch()
+        self.dense_search = dense_search or DenseSearch()
+        self.alpha = alpha if alpha is not None else self.settings.search.hybrid_alpha
+        self._metadata_store = metadata_store
+        self.metadata_filter = MetadataFilter()
+
+    @property
+    def metadata_store(self) -> MetadataStore:
+        """Хранилище метаданных (для нечетких фильтров)."""
+        if self._metadata_store is None:
+            self._metadata_store = get_metadata_store()
+        return self._metadata_store
 
     def search(
         self,
@@ -36,19 +65,137 @@ class HybridSearch:
         Returns:
             Список результатов с объединенными скорами.
         """
+        # Кандидаты по нечетким фильтрам компаний
+        filters, candidates = self._resolve_fuzzy_filters(filters)
+        if candidates is not None and not candidates:
+            return []
+
         # Dense поиск
         dense_results = self.dense_search.search(query, top_k=top_k * 2, filters=filters)
 
-        # Sparse поиск (если есть индексированные документы)
+        # Sparse поиск по персистентному индексу BM25 среди деклараций-кандидатов
         sparse_results = []
-        if self.sparse_search.bm25 is not None:
-            sparse_results = self.sparse_search.search(query, top_k=top_k * 2)
+        if self.settings.search.sparse.get("enabled", True):
+            sparse_results = self._sparse(query, top_k * 2, filters, candidates)
 
         # Объединение результатов через RRF (Reciprocal Rank Fusion)
         combined_results = self._rrf_fusion(dense_results, sparse_results, top_k)
 
         return combined_results
 
+    async def asearch(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Асинхронный гибридный поиск по запросу.
+
+        Dense и sparse поиск выполняются конкурентно: запрос к Qdrant — через
+        асинхронный клиент, поиск BM25 — в пуле потоков поиска.
+
+        Args:
+            query: Текст запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Список результатов с объединенными скорами.
+        """
+        candidates = None
+        if filters:
+            filters, candidates = await run_in_executor(get_search_executor(), self._resolve_fuzzy_filters, filters)
+        if candidates is not None and not candidates:
+            return []
+
+        dense_task = self.dense_search.asearch(query, top_k=top_k * 2, filters=filters)
+
+        if self.settings.search.sparse.get("enabled", True):
+            sparse_task = run_in_executor(get_search_executor(), self._sparse, query, top_k * 2, filters, candidates)
+            dense_results, sparse_results = await asyncio.gather(dense_task, sparse_task)
+        else:
+            dense_results, sparse_results = await dense_task, []
+
+        return self._rrf_fusion(dense_results, sparse_results, top_k)
+
+    def _sparse(
+        self,
+        query: str,
+        top_k: int,
+        filters: dict[str, Any] | None,
+        candidates: set[str] | None,
+    ) -> list[dict[str, Any]]:
+        """Поиск BM25 с теми же фильтрами по метаданным, что и у векторного поиска.
+
+        Args:
+            query: Текст запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным (после разрешения нечетких фильтров).
+            candidates: Декларации-кандидаты нечетких фильтров.
+
+        Returns:
+            Список результатов BM25, удовлетворяющих фильтрам.
+        """
+        results = self.sparse_search.search(query, top_k=top_k, declaration_ids=candidates)
+        if filters:
+            results = self.metadata_filter.filter_results(results, filters)
+        return results
+
+    def _resolve_fuzzy_filters(
+        self,
+        filters: dict[str, Any] | None,
+    ) -> tuple[dict[str, Any] | None, set[str] | None]:
+        """Замена нечетких фильтров компаний списком деклараций-кандидатов.
+
+        Фильтр вида {"manufacturer": {"match": "самсунг"}} разрешается через
+        trigram/полнотекстовые индексы хранилища метаданных в фильтр
+        {"declaration_id": [...]}, который векторный поиск применяет по
+        payload индексу; поиск BM25 получает то же множество кандидатов.
+
+        Args:
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Кортеж (фильтры без нечетких условий, множество деклараций-кандидатов).
+            Если нечетких фильтров нет, множество — None.
+        """
+        fuzzy_settings = self.settings.search.fuzzy_filters
+        if not filters or not fuzzy_settings.get("enabled", True):
+            return filters, None
+
+        fuzzy_fields = fuzzy_settings.get("fields", [])
+        fuzzy = {
+            key: value["match"]
+            for key, value in filters.items()
+            if key in fuzzy_fields and isinstance(value, dict) and "match" in value
+        }
+        if not fuzzy:
+            return filters, None
+
+        candidate_sets = [
+            {
+                declaration_id
+                for declaration_id, _ in self.metadata_store.lookup_companies(
+                    match, fields=[field], tenant_id=filters.get("tenant_id")
+                )
+            }
+            for field, match in fuzzy.items()
+        ]
+
+        resolved = {key: value for key, value in filters.items() if key not in fuzzy}
+        if "declaration_id" in resolved:
+            allowed = resolved["declaration_id"]
+            candidate_sets.append(set(allowed if isinstance(allowed, list) else [allowed]))
+        candidates = set.intersection(*candidate_sets)
+        resolved["declaration_id"] = sorted(candidates)
+
+        logger.debug(f"Нечеткие фильтры {fuzzy}: {len(candidates)} деклараций-кандидатов")
+        return resolved, candidates
+
+    async def aclose(self) -> None:
+        """Освобождение асинхронных ресурсов."""
+        await self.dense_search.vector_store.aclose()
+
     def _rrf_fusion(
         self,
         dense_results: list[dict[str, Any]],
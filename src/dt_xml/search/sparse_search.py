@@ -1,11 +1,12 @@
 """BM25/keyword поиск."""
 
 import logging
+from collections.abc import Callable, Collection
 from typing import Any
 
-from rank_bm25 import BM25Okapi
-
+from dt_xml.config.models import DeclarationChunk
 from dt_xml.config.settings import get_settings
+from dt_xml.search.bm25_index import BM25Index, get_bm25_index
 
 logger = logging.getLogger(__name__)
 
@@ -13,15 +14,33 @@ logger = logging.getLogger(__name__)
 class SparseSearch:
     """BM25 поиск по ключевым словам."""
 
-    def __init__(self):
-        """Инициализация BM25 поиска."""
+    def __init__(self, index: BM25Index | None = None):
+        """Инициализация BM25 поиска.
+
+        Args:
+            index: Индекс BM25. Если None, используется общий персистентный индекс из настроек.
+        """
         self.settings = get_settings()
-        self.bm25: BM25Okapi | None = None
-        self.documents: list[str] = []
-        self.document_metadata: list[dict[str, Any]] = []
+        self.index = index if index is not None else get_bm25_index()
+
+    @property
+    def analyzer(self) -> Callable[[str], list[str]]:
+        """Анализатор текста индекса (общий для индексации и запросов)."""
+        return self.index.tokenizer
+
+    def is_empty(self) -> bool:
+        """Проверка, что в индексе нет документов.
+
+        Returns:
+            True если индекс пуст.
+        """
+        return len(self.index) == 0
 
     def index_documents(self, documents: list[str], metadata: list[dict[str, Any]] | None = None) -> None:
-        """Индексация документов для BM25 поиска.
+        """Полная переиндексация набора документов для BM25 поиска.
+
+        Существующее содержимое индекса удаляется; идентификатором документа
+        служит его позиция в списке.
 
         Args:
             documents: Список текстов документов.
@@ -31,57 +50,95 @@ class SparseSearch:
             logger.warning("Пустой список документов для индексации")
             return
 
-        self.documents = documents
-        self.document_metadata = metadata or [{}] * len(documents)
+        metadata = metadata or [{}] * len(documents)
+        if len(metadata) != len(documents):
+            raise ValueError("Количество документов и метаданных должно совпадать")
 
-        # Токенизация документов
-        tokenized_docs = [doc.lower().split() for doc in documents]
-
-        # Создание BM25 индекса
-        self.bm25 = BM25Okapi(
-            tokenized_docs,
-            k1=self.settings.search.sparse.get("k1", 1.5),
-            b=self.settings.search.sparse.get("b", 0.75),
-        )
+        with self.index.writer():
+            self.index.clear()
+            self.index.add_documents(
+                {
+                    "chunk_id": str(i),
+                    "declaration_id": doc_metadata.get("declaration_id"),
+                    "content": document,
+                    "metadata": doc_metadata,
+                }
+                for i, (document, doc_metadata) in enumerate(zip(documents, metadata, strict=True))
+            )
+            self.index.commit()
 
         logger.info(f"Индексировано {len(documents)} документов для BM25 поиска")
 
-    def search(self, query: str, top_k: int = 10) -> list[dict[str, Any]]:
+    def index_chunks(self, chunks: list[DeclarationChunk]) -> None:
+        """Инкрементальная индексация чанков деклараций.
+
+        Прежние чанки тех же деклараций удаляются из индекса. Запись
+        выполняется под блокировкой писателя индекса (общей для процессов).
+
+        Args:
+            chunks: Список чанков.
+        """
+        with self.index.writer():
+            for declaration_id in {chunk.declaration_id for chunk in chunks}:
+                self.index.delete_by_declaration_id(declaration_id)
+
+            self.index.add_documents(
+                {
+                    "chunk_id": chunk.chunk_id,
+                    "declaration_id": chunk.declaration_id,
+                    "content": chunk.content,
+                    "section": chunk.section,
+                    "metadata": chunk.metadata,
+                }
+                for chunk in chunks
+            )
+            self.index.commit()
+
+        logger.info(f"Индексировано {len(chunks)} чанков для BM25 поиска")
+
+    def delete_declaration(self, declaration_id: str) -> None:
+        """Удаление чанков декларации из индекса.
+
+        Args:
+            declaration_id: Идентификатор декларации.
+        """
+        with self.index.writer():
+            if self.index.delete_by_declaration_id(declaration_id):
+                self.index.commit()
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        declaration_ids: Collection[str] | None = None,
+    ) -> list[dict[str, Any]]:
         """Поиск по запросу.
 
         Args:
             query: Текст запроса.
             top_k: Количество результатов.
+            declaration_ids: Декларации-кандидаты. Если None, поиск по всему индексу.
 
         Returns:
             Список результатов с метаданными и скором.
         """
-        if self.bm25 is None or len(self.documents) == 0:
+        self.index.refresh()
+
+        if self.is_empty():
             logger.warning("Индекс BM25 не создан или пуст")
             return []
 
-        # Токенизация запроса
-        tokenized_query = query.lower().split()
-
-        # Поиск
-        scores = self.bm25.get_scores(tokenized_query)
-
-        # Сортировка по убыванию скора
-        top_indices = sorted(
-            range(len(scores)),
-            key=lambda i: scores[i],
-            reverse=True,
-        )[:top_k]
-
-        # Формирование результатов
         results = []
-        for idx in top_indices:
+        for document in self.index.search(query, top_k=top_k, declaration_ids=declaration_ids):
             results.append(
                 {
-                    "document_id": idx,
-                    "content": self.documents[idx],
-                    "score": float(scores[idx]),
-                    "metadata": self.document_metadata[idx],
+                    "document_id": document["chunk_id"],
+                    "chunk_id": document["chunk_id"],
+                    "declaration_id": document.get("declaration_id"),
+                    "content": document.get("content", ""),
+                    "section": document.get("section"),
+                    "score": document["score"],
+                    "metadata": document.get("metadata", {}),
                 }
             )
 
@@ -0,0 +1,262 @@
+"""Морфологический анализатор текста для BM25 поиска."""
+
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any
+
+from dt_xml.config.settings import get_settings
+
+try:
+    import pymorphy3
+except ImportError:
+    pymorphy3 = None
+
+logger = logging.getLogger(__name__)
+
+if pymorphy3 is None:
+    logger.warning("pymorphy3 не установлен, лемматизация отключена")
+
+# Код ТН ВЭД / HS: ровно 10 цифр подряд либо группы 4-2-3-1 / 4-2-2-2 через пробел или
+# точку ("8517 12 000 0", "8517.12.00.00"). Более короткие числа (номера деклараций,
+# даты, ОГРН по частям) кодами не считаются; цены вида "1234.56" под шаблон не попадают
+_HS_CODE_PATTERN = re.compile(
+    r"(?<![\w.,])"
+    r"(?:\d{4}[ .]\d{2}[ .]\d{3}(?:[ .]\d)?|\d{4}[ .]\d{2}[ .]\d{2}[ .]\d{2}|\d{10})"
+    r"(?!\w|[.,]\d)"
+)
+# Метка идентификатора перед 10-значным числом: ИНН юрлица и т.п. не являются кодом ТН ВЭД
+_ID_LABEL_PATTERN = re.compile(r"(?<!\w)(?:инн|кпп|огрн|бин|иин)\W{0,3}$")
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_PATTERN = re.compile(r"[а-яё]")
+
+# Знаки ударения и мягкий перенос, не влияющие на слово
+_IGNORED_CHARS = str.maketrans("", "", "\u0300\u0301\u00ad")
+
+# Латинские буквы, совпадающие по начертанию с кириллическими (смешанные слова OCR/ручного ввода)
+_LATIN_TO_CYRILLIC = str.maketrans("aceopxykmthb", "асеорхукмтнв")
+
+# Варианты написания казахских букв, встречающиеся в документах
+_KAZAKH_VARIANTS = str.maketrans(
+    {
+        "ə": "ә",  # латинская шва
+        "ɵ": "ө",  # латинская перечеркнутая o
+        "ӊ": "ң",
+        "i": "і",  # латинская i внутри кириллического слова
+        "ё": "е",
+    }
+)
+
+# Буквы, которых нет в русском алфавите: такие слова не лемматизируются русским словарем
+_KAZAKH_LETTERS = set("әіңғұүқөһ")
+
+DEFAULT_STOP_WORDS = frozenset(
+    {
+        # Русский
+        "а", "без", "более", "бы", "быть", "в", "во", "вот", "весь", "все", "вы", "для", "до",
+        "если", "есть", "же", "за", "и", "из", "или", "к", "как", "который", "ли", "на",
+        "над", "не", "нет", "но", "о", "об", "он", "она", "они", "оно", "от", "по", "под",
+        "при", "с", "свой", "со", "так", "также", "то", "тот", "у", "уже", "что", "это", "этот",
+        # Казахский
+        "және", "мен", "бен", "пен", "да", "де", "та", "те", "үшін", "бойынша", "бұл", "сол",
+        # Английский
+        "a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with",
+    }
+)
+
+
+class TextAnalyzer:
+    """Анализатор текста: токенизация, нормализация, лемматизация, стоп-слова.
+
+    Коды ТН ВЭД сохраняются целиком (без разбиения на группы цифр), а также
+    индексируются их товарная позиция (4 знака) и субпозиция (6 знаков), чтобы
+    запрос по части кода находил полные коды. Аббревиатуры (ИНН, КПП) не
+    лемматизируются.
+    """
+
+    def __init__(
+        self,
+        lemmatize: bool = True,
+        stop_words: frozenset[str] | set[str] | None = DEFAULT_STOP_WORDS,
+        cache_size: int = 100_000,
+        hs_code_prefixes: bool = True,
+    ):
+        """Инициализация анализатора.
+
+        Args:
+            lemmatize: Приводить слова к нормальной форме (pymorphy3).
+            stop_words: Стоп-слова в нормальной форме. None — без фильтрации.
+            cache_size: Размер кэша лемм.
+            hs_code_prefixes: Добавлять позицию и субпозицию кода ТН ВЭД.
+        """
+        self.stop_words = frozenset(stop_words or ())
+        self.hs_code_prefixes = hs_code_prefixes
+        self.cache_size = cache_size
+
+        self.morph = None
+        if lemmatize and pymorphy3 is not None:
+            try:
+                self.morph = pymorphy3.MorphAnalyzer()
+            except Exception as e:
+                logger.warning(f"Не удалось инициализировать pymorphy3, лемматизация отключена: {e}")
+
+        # Кэш лемм: словарь словоформ естественного языка ограничен, поэтому после
+        # прогрева почти все слова обрабатываются без обращения к словарю
+        self._lemma = lru_cache(maxsize=cache_size)(self._lemmatize_word)
+
+    @property
+    def name(self) -> str:
+        """Идентификатор конфигурации анализатора (сохраняется в индексе)."""
+        lemmas = "lemma" if self.morph is not None else "nolemma"
+        prefixes = "hs" if self.hs_code_prefixes else "nohs"
+        return f"morphology:v2:{lemmas}:{prefixes}:stop{len(self.stop_words)}"
+
+    def __call__(self, text: str) -> list[str]:
+        """Анализ текста.
+
+        Args:
+            text: Текст.
+
+        Returns:
+            Список термов.
+        """
+        return self.analyze(text)
+
+    def analyze(self, text: str) -> list[str]:
+        """Анализ текста.
+
+        Args:
+            text: Текст.
+
+        Returns:
+            Список термов в порядке появления в тексте.
+        """
+        if not text:
+            return []
+
+        # Регистр сохраняется до токенизации: по нему отличаются аббревиатуры
+        text = self.normalize(text, lower=False)
+        # В тексте целиком в верхнем регистре регистр слова ничего не говорит
+        mixed_case = not text.isupper()
+        terms: list[str] = []
+        position = 0
+        for match in _HS_CODE_PATTERN.finditer(text):
+            if _ID_LABEL_PATTERN.search(text[max(match.start() - 8, 0) : match.start()].lower()):
+                continue
+            terms.extend(self._analyze_words(text[position : match.start()], mixed_case))
+            terms.extend(self._hs_code_terms(match.group()))
+            position = match.end()
+        terms.extend(self._analyze_words(text[position:], mixed_case))
+        return terms
+
+    @staticmethod
+    def normalize(text: str, lower: bool = True) -> str:
+        """Unicode-нормализация текста.
+
+        Args:
+            text: Текст.
+            lower: Привести текст к нижнему регистру.
+
+        Returns:
+            Текст в форме NFKC без знаков ударения.
+        """
+        # Разложение отделяет знаки ударения от букв; буквы й/ё после удаления
+        # ударений собираются обратно при NFKC
+        text = unicodedata.normalize("NFKD", text.lower() if lower else text).translate(_IGNORED_CHARS)
+        return unicodedata.normalize("NFKC", text)
+
+    def _analyze_words(self, text: str, mixed_case: bool = False) -> list[str]:
+        """Анализ фрагмента текста без кодов ТН ВЭД.
+
+        Args:
+            text: Нормализованный текст с исходным регистром.
+            mixed_case: Текст не целиком в верхнем регистре: слова в верхнем
+                регистре считаются аббревиатурами и не лемматизируются.
+
+        Returns:
+            Список термов.
+        """
+        terms = []
+        for token in _TOKEN_PATTERN.findall(text):
+            abbreviation = mixed_case and len(token) > 1 and token.isupper()
+            term = self._lemma(token.lower(), abbreviation)
+            if term and term not in self.stop_words:
+                terms.append(term)
+        return terms
+
+    def _hs_code_terms(self, code: str) -> list[str]:
+        """Термы кода ТН ВЭД.
+
+        Args:
+            code: Код с возможными разделителями групп.
+
+        Returns:
+            Код без разделителей и (опционально) его позиция и субпозиция.
+        """
+        digits = re.sub(r"\D", "", code)
+        if not self.hs_code_prefixes or len(digits) <= 4:
+            return [digits]
+        terms = [digits, digits[:4]]
+        if len(digits) > 6:
+            terms.append(digits[:6])
+        return terms
+
+    def _lemmatize_word(self, token: str, abbreviation: bool = False) -> str:
+        """Нормализация и лемматизация одного слова.
+
+        Args:
+            token: Слово в нижнем регистре.
+            abbreviation: Слово — аббревиатура (не лемматизируется).
+
+        Returns:
+            Нормальная форма слова.
+        """
+        if not _CYRILLIC_PATTERN.search(token) and not _KAZAKH_LETTERS.intersection(token):
+            return token
+
+        # Слово с кириллицей: латинские двойники заменяются кириллическими буквами
+        token = token.translate(_KAZAKH_VARIANTS).translate(_LATIN_TO_CYRILLIC)
+
+        if abbreviation or self.morph is None or _KAZAKH_LETTERS.intersection(token) or not token.isalpha():
+            return token
+
+        # Незнакомые словарю слова не лемматизируются: предсказание по окончанию
+        # искажает казахские слова без специфических букв ("кеден" → "кесть")
+        if not self.morph.word_is_known(token):
+            return token
+
+        # Словарные аббревиатуры сохраняются и в запросах в нижнем регистре ("инн", не "инна")
+        parses = self.morph.parse(token)
+        if any("Abbr" in parse.tag for parse in parses):
+            return token
+
+        return parses[0].normal_form.replace("ё", "е")
+
+    def get_stats(self) -> dict[str, Any]:
+        """Получение статистики кэша лемм.
+
+        Returns:
+            Словарь со счетчиками.
+        """
+        info = self._lemma.cache_info()
+        total = info.hits + info.misses
+        return {
+            "analyzer": self.name,
+            "lemma_cache_size": info.currsize,
+            "lemma_cache_max_size": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / total, 4) if total else 0.0,
+        }
+
+
+@lru_cache()
+def get_text_analyzer() -> TextAnalyzer:
+    """Получить анализатор текста из настроек (singleton)."""
+    sparse_settings = get_settings().search.sparse
+    return TextAnalyzer(
+        lemmatize=sparse_settings.get("lemmatize", True),
+        stop_words=DEFAULT_STOP_WORDS if sparse_settings.get("stop_words", True) else None,
+        cache_size=sparse_settings.get("lemma_cache_size", 100_000),
+    )
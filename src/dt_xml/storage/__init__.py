@@ -1,7 +1,17 @@
 """Модуль хранения данных."""
 
+from dt_xml.storage.vector_backend import VectorBackend, create_vector_store
 from dt_xml.storage.vector_store import VectorStore
-from dt_xml.storage.metadata_store import MetadataStore
+from dt_xml.storage.local_vector_store import LocalVectorStore
+from dt_xml.storage.metadata_store import MetadataStore, get_metadata_store
 from dt_xml.storage.document_store import DocumentStore
 
-__all__ = ["VectorStore", "MetadataStore", "DocumentStore"]
+__all__ = [
+    "VectorBackend",
+    "create_vector_store",
+    "VectorStore",
+    "LocalVectorStore",
+    "MetadataStore",
+    "get_metadata_store",
+    "DocumentStore",
+]
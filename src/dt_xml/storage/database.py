@@ -0,0 +1,61 @@
+"""Общие движки SQLAlchemy базы метаданных.
+
+Процесс использует один синхронный и один асинхронный движок (psycopg 3)
+со своими пулами соединений; хранилища получают их через get_engine и
+get_async_engine, а не создают собственные.
+"""
+
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import Engine, create_engine
+
+from dt_xml.config.settings import get_settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+def _pool_options() -> dict[str, Any]:
+    """Параметры пула соединений из настроек database."""
+    settings = get_settings().database
+    return {
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_recycle": settings.pool_recycle,
+        "pool_pre_ping": settings.pool_pre_ping,
+    }
+
+
+@lru_cache()
+def get_engine() -> Engine:
+    """Получить синхронный движок базы метаданных (singleton)."""
+    settings = get_settings().database
+    logger.info(f"Пул соединений БД метаданных: {settings.pool_size} (+{settings.max_overflow})")
+    return create_engine(settings.url, **_pool_options())
+
+
+@lru_cache()
+def get_async_engine() -> "AsyncEngine":
+    """Получить асинхронный движок базы метаданных (singleton).
+
+    Модуль sqlalchemy.ext.asyncio импортируется при первом обращении: ему
+    нужен greenlet, который не требуется синхронному коду (конвейер, скрипты).
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(get_settings().database.url, **_pool_options())
+
+
+async def dispose_engines() -> None:
+    """Закрытие пулов соединений созданных движков."""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+        get_async_engine.cache_clear()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+        get_engine.cache_clear()
@@ -59,9 +59,9 @@ class DocumentStore:
                 "saved_at": datetime.utcnow().isoformat(),
             }
 
-            # Сохранение в JSON
+            # Сохранение в JSON (даты и числа Decimal — строками)
             with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(document_data, f, ensure_ascii=False, indent=2)
+                json.dump(document_data, f, ensure_ascii=False, indent=2, default=str)
 
             logger.info(f"Документ {declaration_id} сохранен в {file_path}")
             return file_path
@@ -0,0 +1,897 @@
+"""Встроенное векторное хранилище без внешних сервисов.
+
+Векторы хранятся нормализованными в файле float32, отображенном в память
+(np.memmap), payload точек — в журнале операций JSON Lines. Запись
+инкрементальная: новые векторы дописываются в конец файла, операции записи и
+удаления — в конец журнала, поэтому сохранение не требует перезаписи индекса.
+Когда доля удаленных строк превышает compact_ratio, файлы переписываются в
+новое поколение, на которое атомарно переключается manifest.json.
+
+Поиск точный (скалярное произведение со всей матрицей) или IVF: векторы
+разбиты на кластеры сферическим k-means, запрос сравнивается только с
+векторами nprobe ближайших кластеров.
+
+Писатели из разных процессов (воркеры API, конвейер загрузки) сериализуются
+файловой блокировкой write.lock: перед записью писатель дочитывает журнал,
+а номера новых строк берет из размера файла векторов. Читающие процессы
+дочитывают журнал (или перезагружают новое поколение) перед поиском.
+"""
+
+import json
+import logging
+import operator
+import os
+import threading
+from collections.abc import Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from datetime import UTC, date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from dt_xml.config.settings import get_settings
+from dt_xml.storage.vector_backend import MISSING, VectorBackend
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+if fcntl is None:
+    logger.warning("fcntl недоступен, запись в локальное векторное хранилище не блокируется между процессами")
+
+INDEX_TYPES = ("exact", "ivf")
+
+# Операторы диапазонного фильтра (как Range в Qdrant)
+_RANGE_OPERATORS = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def _as_datetime(value: Any) -> datetime | None:
+    """Приведение значения к datetime с часовым поясом (UTC по умолчанию).
+
+    Args:
+        value: Дата, datetime или строка ISO 8601.
+
+    Returns:
+        datetime или None, если значение не является датой.
+    """
+    if isinstance(value, datetime):
+        result = value
+    elif isinstance(value, date):
+        result = datetime(value.year, value.month, value.day)
+    elif isinstance(value, str):
+        try:
+            result = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    return result if result.tzinfo is not None else result.replace(tzinfo=UTC)
+
+
+def _is_number(value: Any) -> bool:
+    """Проверка, что значение — число (не bool)."""
+    return isinstance(value, int | float) and not isinstance(value, bool)
+
+
+def _in_range(value: Any, bounds: dict[str, Any]) -> bool:
+    """Проверка попадания значения в диапазон.
+
+    Args:
+        value: Значение (None — не сравнимо).
+        bounds: Границы gt/gte/lt/lte.
+
+    Returns:
+        True, если значение в диапазоне.
+    """
+    if value is None or any(bound is None for bound in bounds.values()):
+        return False
+    return all(
+        compare(value, bounds[name]) for name, compare in _RANGE_OPERATORS.items() if name in bounds
+    )
+
+
+def matches_filters(payload: dict[str, Any], filters: dict[str, Any] | None) -> bool:
+    """Проверка payload точки по фильтрам (семантика фильтров VectorStore).
+
+    Args:
+        payload: Payload точки.
+        filters: Фильтры по метаданным.
+
+    Returns:
+        True, если точка удовлетворяет всем фильтрам.
+    """
+    for key, expected in (filters or {}).items():
+        if key not in payload:
+            return False
+
+        value = payload[key]
+        values = value if isinstance(value, list) else [value]
+
+        if isinstance(expected, dict):
+            # Диапазоны и операторы
+            if "eq" in expected and expected["eq"] not in values:
+                return False
+            bounds = {op: expected[op] for op in ("gt", "gte", "lt", "lte") if op in expected}
+            if bounds:
+                # Числовой диапазон или диапазон дат, как Range и DatetimeRange в Qdrant
+                if all(_is_number(bound) for bound in bounds.values()):
+                    comparable = [v for v in values if _is_number(v)]
+                else:
+                    bounds = {op: _as_datetime(bound) for op, bound in bounds.items()}
+                    comparable = [_as_datetime(v) for v in values]
+                if not any(_in_range(v, bounds) for v in comparable):
+                    return False
+        elif isinstance(expected, list):
+            # Список допустимых значений
+            if not any(v in expected for v in values):
+                return False
+        elif isinstance(expected, date):
+            # Точная дата
+            target = _as_datetime(expected)
+            if not any(_as_datetime(v) == target for v in values):
+                return False
+        elif expected not in values:
+            return False
+
+    return True
+
+
+class LocalVectorStore(VectorBackend):
+    """Векторное хранилище в процессе над memory-mapped матрицей."""
+
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = "write.lock"
+
+    # Размер блока строк при полном проходе по матрице
+    BLOCK_ROWS = 65536
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        vector_size: int | None = None,
+        index: str | None = None,
+        nlist: int | None = None,
+        nprobe: int | None = None,
+        ivf_min_rows: int | None = None,
+        compact_ratio: float | None = None,
+    ):
+        """Инициализация хранилища (загрузка с диска, если оно существует).
+
+        Args:
+            path: Директория хранилища. Если None, из настроек.
+            vector_size: Размерность векторов. Если None, из настроек.
+            index: Тип индекса: exact или ivf. Если None, из настроек.
+            nlist: Количество кластеров IVF (0 — корень из числа векторов).
+            nprobe: Количество просматриваемых кластеров IVF при запросе.
+            ivf_min_rows: Минимальное количество векторов для построения IVF
+                (на меньших объемах поиск точный).
+            compact_ratio: Доля удаленных строк, при которой выполняется компакция.
+        """
+        self.settings = get_settings()
+        local = self.settings.vector_db.local
+
+        self.path = Path(path or local.get("path", "data/processed/vectors"))
+        self.collection_name = self.settings.vector_db.collection_name
+        self.vector_size = vector_size or self.settings.vector_db.vector_size
+        self.index = index or local.get("index", "exact")
+        self.nlist = nlist if nlist is not None else local.get("nlist", 0)
+        self.nprobe = nprobe or local.get("nprobe", 8)
+        self.ivf_min_rows = ivf_min_rows if ivf_min_rows is not None else local.get("ivf_min_rows", 10000)
+        self.compact_ratio = compact_ratio if compact_ratio is not None else local.get("compact_ratio", 0.3)
+
+        if self.index not in INDEX_TYPES:
+            raise ValueError(f"Неизвестный тип локального индекса: {self.index}. Допустимые: {', '.join(INDEX_TYPES)}")
+
+        self._lock = threading.RLock()
+        self._generation = 0
+        # Прочитанная часть журнала и версия manifest.json, по которым загружено состояние
+        self._log_offset = 0
+        self._manifest_version: tuple[int, int] | None = None
+        # Поток, выполняющий запись под блокировкой писателя
+        self._writer_thread: int | None = None
+        self._reset_state(0)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._file_lock(exclusive=True), self._lock:
+            self._load(recover=True)
+
+    def _reset_state(self, rows: int) -> None:
+        """Сброс состояния в памяти.
+
+        Args:
+            rows: Количество строк в файле векторов.
+        """
+        self._rows = rows
+        self._log_offset = 0
+        self._matrix: np.ndarray = np.zeros((0, self.vector_size), dtype=np.float32)
+        self._ids: list[int | str | None] = [None] * rows
+        self._payloads: list[dict[str, Any] | None] = [None] * rows
+        self._deleted = np.ones(rows, dtype=bool)
+        self._row_by_id: dict[int | str, int] = {}
+        self._rows_by_declaration: dict[str, set[int]] = {}
+        self._centroids: np.ndarray | None = None
+        self._assign: np.ndarray = np.zeros(0, dtype=np.int32)
+        self._trained_rows = 0
+
+    def _file(self, kind: str, generation: int | None = None) -> Path:
+        """Путь к файлу поколения.
+
+        Args:
+            kind: Вид файла: vectors, log или ivf.
+            generation: Поколение. Если None, текущее.
+
+        Returns:
+            Путь к файлу.
+        """
+        generation = self._generation if generation is None else generation
+        suffix = {"vectors": "f32", "log": "jsonl", "ivf": "npz"}[kind]
+        return self.path / f"{kind}_{generation}.{suffix}"
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Файловая блокировка write.lock, общая для процессов.
+
+        Args:
+            exclusive: Эксклюзивная блокировка писателя. Иначе разделяемая
+                блокировка читателя, который дочитывает изменения.
+        """
+        with open(self.path / self.LOCK_FILE, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writer(self) -> Iterator[None]:
+        """Изменение хранилища под блокировкой писателя.
+
+        Берет файловую блокировку write.lock, затем блокировку потоков и
+        дочитывает изменения других процессов. Вложенные вызовы из того же
+        потока повторно используют блокировку.
+        """
+        if self._writer_thread == threading.get_ident():
+            yield
+            return
+
+        with self._file_lock(exclusive=True), self._lock:
+            self._writer_thread = threading.get_ident()
+            try:
+                self._catch_up(recover=True)
+                yield
+            finally:
+                self._writer_thread = None
+
+    def refresh(self) -> None:
+        """Подхват изменений, записанных другими процессами.
+
+        Проверка изменений не требует блокировок; дочитывание журнала
+        выполняется под разделяемой файловой блокировкой.
+        """
+        if self._writer_thread == threading.get_ident() or not self._is_stale():
+            return
+        with self._file_lock(exclusive=False), self._lock:
+            if self._is_stale():
+                self._catch_up(recover=False)
+
+    def _is_stale(self) -> bool:
+        """Проверка, что на диске есть изменения, не загруженные в память."""
+        try:
+            manifest = (self.path / self.MANIFEST_FILE).stat()
+            log_size = self._file("log").stat().st_size
+        except FileNotFoundError:
+            return True
+        return (manifest.st_ino, manifest.st_mtime_ns) != self._manifest_version or log_size != self._log_offset
+
+    def _read_manifest(self) -> dict[str, Any]:
+        """Чтение manifest.json."""
+        with open(self.path / self.MANIFEST_FILE, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _catch_up(self, recover: bool) -> None:
+        """Загрузка изменений с диска (вызывается под блокировками).
+
+        Args:
+            recover: Отбросить неполные строки матрицы и журнала, оставшиеся
+                после сбоя писателя (только под блокировкой писателя).
+        """
+        # Новое поколение (или состояние, освобожденное close()) загружается целиком
+        if self._manifest_version is None or self._read_manifest().get("generation", 0) != self._generation:
+            self._load(recover)
+            return
+
+        if recover:
+            self._truncate_partial_rows()
+            self._truncate_partial_line(self._file("log"))
+        self._replay_log()
+
+    def _load(self, recover: bool = False) -> None:
+        """Загрузка хранилища по manifest.json и воспроизведение журнала.
+
+        Args:
+            recover: Отбросить неполные строки матрицы и журнала после сбоя.
+        """
+        manifest_path = self.path / self.MANIFEST_FILE
+        if manifest_path.exists():
+            manifest = self._read_manifest()
+            if manifest.get("vector_size", self.vector_size) != self.vector_size:
+                raise ValueError(
+                    f"Размерность векторов хранилища {manifest['vector_size']} "
+                    f"не совпадает с настройками ({self.vector_size})"
+                )
+            self._generation = manifest.get("generation", 0)
+            stat = manifest_path.stat()
+            self._manifest_version = (stat.st_ino, stat.st_mtime_ns)
+        else:
+            self._write_manifest()
+
+        vectors_path = self._file("vectors")
+        log_path = self._file("log")
+        vectors_path.touch(exist_ok=True)
+        log_path.touch(exist_ok=True)
+
+        # Отбрасывание неполной строки матрицы и неполной записи журнала после сбоя
+        if recover:
+            self._truncate_partial_rows()
+            self._truncate_partial_line(log_path)
+
+        self._reset_state(0)
+        self._replay_log()
+        self._load_ivf()
+
+        logger.info(
+            f"Локальное векторное хранилище загружено: {self.path} "
+            f"({len(self._row_by_id)} векторов, поколение {self._generation})"
+        )
+
+    def _replay_log(self) -> None:
+        """Воспроизведение новых завершенных записей журнала.
+
+        Журнал читается до файла векторов: писатель дописывает векторы раньше
+        операций, которые на них ссылаются, поэтому все прочитанные строки уже
+        есть в файле.
+        """
+        with open(self._file("log"), "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        data = data[: data.rfind(b"\n") + 1]
+
+        rows = self._file("vectors").stat().st_size // (self.vector_size * 4)
+        first_new_row = self._rows
+        self._extend_rows(rows)
+
+        for line in data.splitlines():
+            operation = json.loads(line)
+            if operation["op"] == "upsert":
+                if operation["row"] < rows:
+                    self._apply_upsert(operation["id"], operation["row"], operation["payload"])
+            elif operation["op"] == "delete":
+                self._apply_delete(operation["ids"])
+        self._log_offset += len(data)
+
+        if rows != first_new_row:
+            self._remap()
+            if self._centroids is not None:
+                self._assign = np.concatenate([self._assign, self._nearest_centroids(first_new_row, rows)])
+
+    def _extend_rows(self, rows: int) -> None:
+        """Добавление строк матрицы в состояние в памяти (как удаленных до записи в журнал).
+
+        Args:
+            rows: Новое количество строк.
+        """
+        count = rows - self._rows
+        if count <= 0:
+            return
+        self._rows = rows
+        self._ids.extend([None] * count)
+        self._payloads.extend([None] * count)
+        self._deleted = np.concatenate([self._deleted, np.ones(count, dtype=bool)])
+
+    def _truncate_partial_rows(self) -> None:
+        """Отбрасывание неполной последней строки файла векторов."""
+        row_bytes = self.vector_size * 4
+        vectors_path = self._file("vectors")
+        size = vectors_path.stat().st_size
+        if size % row_bytes:
+            with open(vectors_path, "r+b") as f:
+                f.truncate(size - size % row_bytes)
+
+    @staticmethod
+    def _truncate_partial_line(path: Path, block_size: int = 65536) -> None:
+        """Отбрасывание незавершенной последней строки файла.
+
+        Args:
+            path: Путь к файлу.
+            block_size: Размер блока чтения с конца файла.
+        """
+        with open(path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(position - block_size, 0)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                f.truncate(position)
+
+    def _load_ivf(self) -> None:
+        """Загрузка кластеров IVF текущего поколения."""
+        ivf_path = self._file("ivf")
+        if self.index != "ivf" or not ivf_path.exists():
+            return
+
+        with np.load(ivf_path) as data:
+            centroids = data["centroids"]
+            assign = data["assign"][: self._rows]
+            trained_rows = int(data["trained_rows"])
+
+        if centroids.shape[1] != self.vector_size:
+            return
+
+        self._centroids = centroids
+        self._trained_rows = trained_rows
+        self._assign = np.concatenate([assign, self._nearest_centroids(len(assign), self._rows)])
+
+    def _write_manifest(self) -> None:
+        """Атомарная запись manifest.json."""
+        manifest = {
+            "generation": self._generation,
+            "vector_size": self.vector_size,
+            "distance": "cosine",
+        }
+        manifest_path = self.path / self.MANIFEST_FILE
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+        stat = manifest_path.stat()
+        self._manifest_version = (stat.st_ino, stat.st_mtime_ns)
+
+    def _remap(self) -> None:
+        """Отображение файла векторов в память."""
+        if self._rows:
+            self._matrix = np.memmap(
+                self._file("vectors"), dtype=np.float32, mode="r", shape=(self._rows, self.vector_size)
+            )
+        else:
+            self._matrix = np.zeros((0, self.vector_size), dtype=np.float32)
+
+    def _apply_upsert(self, point_id: int | str, row: int, payload: dict[str, Any]) -> None:
+        """Применение записи точки к состоянию в памяти.
+
+        Точка без declaration_id доступна поиску и удалению по идентификатору,
+        но не попадает в выборки по декларациям.
+
+        Args:
+            point_id: Идентификатор точки.
+            row: Строка матрицы.
+            payload: Payload точки.
+        """
+        self._apply_delete([point_id])
+        self._ids[row] = point_id
+        self._payloads[row] = payload
+        self._deleted[row] = False
+        self._row_by_id[point_id] = row
+        declaration_id = payload.get("declaration_id")
+        if declaration_id is not None:
+            self._rows_by_declaration.setdefault(declaration_id, set()).add(row)
+
+    def _apply_delete(self, point_ids: list[int | str]) -> int:
+        """Применение удаления точек к состоянию в памяти.
+
+        Args:
+            point_ids: Идентификаторы точек.
+
+        Returns:
+            Количество удаленных точек.
+        """
+        deleted = 0
+        for point_id in point_ids:
+            row = self._row_by_id.pop(point_id, None)
+            if row is None:
+                continue
+            self._deleted[row] = True
+            declaration_id = (self._payloads[row] or {}).get("declaration_id")
+            if declaration_id is not None:
+                self._rows_by_declaration.get(declaration_id, set()).discard(row)
+            self._payloads[row] = None
+            deleted += 1
+        return deleted
+
+    def _append(self, kind: str, data: bytes, wait: bool) -> int:
+        """Дозапись данных в файл текущего поколения (вызывается под блокировкой писателя).
+
+        Args:
+            kind: Вид файла: vectors или log.
+            data: Данные.
+            wait: Дождаться записи на устройство (fsync).
+
+        Returns:
+            Размер файла после записи.
+        """
+        with open(self._file(kind), "ab") as f:
+            f.write(data)
+            f.flush()
+            if wait:
+                os.fsync(f.fileno())
+            return os.fstat(f.fileno()).st_size
+
+    def upsert_arrays(
+        self,
+        ids: Sequence[int | str],
+        vectors: np.ndarray,
+        payload_columns: Mapping[str, Sequence[Any]] | None = None,
+        wait: bool = True,
+    ) -> None:
+        """Массовая запись точек из матрицы векторов и колонок payload.
+
+        Векторы нормализуются и дописываются в конец файла, затем в журнал
+        записываются операции, ссылающиеся на новые строки. Прежние строки
+        перезаписанных точек помечаются удаленными.
+
+        Args:
+            ids: Идентификаторы точек.
+            vectors: Матрица векторов (N x vector_size).
+            payload_columns: Колонки payload: поле → значения в порядке точек.
+                Значения MISSING в колонке пропускаются.
+            wait: Дождаться записи на устройство (fsync).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_size:
+            raise ValueError(
+                f"Ожидается матрица векторов размерности N x {self.vector_size}, получено {vectors.shape}"
+            )
+
+        count = len(vectors)
+        payload_columns = payload_columns or {}
+        if len(ids) != count or any(len(column) != count for column in payload_columns.values()):
+            raise ValueError("Количество идентификаторов, векторов и значений payload должно совпадать")
+
+        if count == 0:
+            return
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.ascontiguousarray(vectors / np.maximum(norms, 1e-12), dtype=np.float32)
+        payloads = [
+            {key: column[i] for key, column in payload_columns.items() if column[i] is not MISSING}
+            for i in range(count)
+        ]
+
+        with self._writer():
+            # Номер первой строки — по размеру файла: другие процессы могли дописать строки
+            start = self._file("vectors").stat().st_size // (self.vector_size * 4)
+            self._extend_rows(start)
+            try:
+                # Векторы записываются раньше операций журнала, которые на них ссылаются
+                self._append("vectors", vectors.tobytes(), wait)
+                self._log_offset = self._append(
+                    "log",
+                    "".join(
+                        json.dumps(
+                            {"op": "upsert", "id": point_id, "row": start + i, "payload": payload},
+                            ensure_ascii=False,
+                            default=str,
+                        )
+                        + "\n"
+                        for i, (point_id, payload) in enumerate(zip(ids, payloads, strict=True))
+                    ).encode("utf-8"),
+                    wait,
+                )
+            except Exception as e:
+                logger.error(f"Ошибка при записи в локальное векторное хранилище: {e}")
+                raise
+
+            self._extend_rows(start + count)
+            for i, (point_id, payload) in enumerate(zip(ids, payloads, strict=True)):
+                self._apply_upsert(point_id, start + i, json.loads(json.dumps(payload, default=str)))
+            self._remap()
+            if self._centroids is not None:
+                self._assign = np.concatenate([self._assign, self._nearest_centroids(start, self._rows)])
+
+            self._maybe_compact()
+
+    def delete_points(self, point_ids: list[int | str]) -> None:
+        """Удаление точек по идентификаторам.
+
+        Args:
+            point_ids: Идентификаторы точек.
+        """
+        if not point_ids:
+            return
+
+        with self._writer():
+            try:
+                self._log_offset = self._append(
+                    "log", (json.dumps({"op": "delete", "ids": list(point_ids)}) + "\n").encode("utf-8"), True
+                )
+            except Exception as e:
+                logger.error(f"Ошибка при удалении чанков: {e}")
+                raise
+
+            deleted = self._apply_delete(list(point_ids))
+            logger.info(f"Удалено {deleted} чанков из локального векторного хранилища")
+            self._maybe_compact()
+
+    def delete_by_declaration_ids(self, declaration_ids: Sequence[str]) -> None:
+        """Массовое удаление всех чанков деклараций одной записью журнала.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+        """
+        with self._writer():
+            point_ids = [
+                point_id
+                for declaration_id in dict.fromkeys(declaration_ids)
+                for row in self._rows_by_declaration.get(declaration_id, set())
+                if (point_id := self._ids[row]) is not None
+            ]
+            self.delete_points(point_ids)
+
+    def get_chunk_hashes(self, declaration_ids: list[str]) -> dict[str, dict[int | str, str | None]]:
+        """Хэши содержимого проиндексированных чанков деклараций.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+
+        Returns:
+            Словарь declaration_id → {идентификатор точки: хэш содержимого}.
+        """
+        self.refresh()
+        hashes: dict[str, dict[int | str, str | None]] = {}
+        with self._lock:
+            for declaration_id in declaration_ids:
+                rows = self._rows_by_declaration.get(declaration_id)
+                if rows:
+                    hashes[declaration_id] = {
+                        point_id: (self._payloads[row] or {}).get("content_hash")
+                        for row in rows
+                        if (point_id := self._ids[row]) is not None
+                    }
+        return hashes
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 10,
+        filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск похожих векторов.
+
+        Args:
+            query_embedding: Эмбединг запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Список результатов поиска с метаданными.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        self.refresh()
+        if self.index == "ivf":
+            self._maybe_train()
+
+        with self._lock:
+            matrix, payloads = self._matrix, self._payloads
+            live = ~self._deleted[: len(matrix)]
+            if self._centroids is not None:
+                probe = np.argsort(-(self._centroids @ query))[: self.nprobe]
+                live &= np.isin(self._assign[: len(matrix)], probe)
+
+        rows = np.flatnonzero(live)
+        if not len(rows) or top_k <= 0:
+            return []
+
+        scores = self._scores(matrix, rows, query)
+
+        results: list[dict[str, Any]] = []
+        if filters:
+            # Кандидаты проверяются по фильтрам в порядке убывания скора
+            for i in np.argsort(-scores, kind="stable"):
+                payload = payloads[rows[i]]
+                if payload is not None and matches_filters(payload, filters):
+                    results.append(self.make_result(payload, float(scores[i])))
+                    if len(results) == top_k:
+                        break
+            return results
+
+        k = min(top_k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        for i in top[np.argsort(-scores[top], kind="stable")]:
+            payload = payloads[rows[i]]
+            if payload is not None:
+                results.append(self.make_result(payload, float(scores[i])))
+        return results
+
+    def _scores(self, matrix: np.ndarray, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Косинусная близость запроса к строкам матрицы (блоками).
+
+        Args:
+            matrix: Матрица нормализованных векторов.
+            rows: Номера строк.
+            query: Нормализованный вектор запроса.
+
+        Returns:
+            Скоры в порядке строк.
+        """
+        if len(rows) == len(matrix):
+            return np.concatenate(
+                [matrix[start : start + self.BLOCK_ROWS] @ query for start in range(0, len(matrix), self.BLOCK_ROWS)]
+            )
+        return np.concatenate(
+            [matrix[rows[start : start + self.BLOCK_ROWS]] @ query for start in range(0, len(rows), self.BLOCK_ROWS)]
+        )
+
+    def _nearest_centroids(self, start: int, stop: int) -> np.ndarray:
+        """Номера ближайших кластеров IVF для строк матрицы.
+
+        Args:
+            start: Первая строка.
+            stop: Строка после последней.
+
+        Returns:
+            Массив номеров кластеров.
+        """
+        centroids = self._centroids
+        if centroids is None or stop <= start:
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate(
+            [
+                np.argmax(self._matrix[block : min(block + self.BLOCK_ROWS, stop)] @ centroids.T, axis=1)
+                for block in range(start, stop, self.BLOCK_ROWS)
+            ]
+        ).astype(np.int32)
+
+    def _maybe_train(self) -> None:
+        """Построение IVF при достаточном объеме или вдвое выросшем количестве векторов."""
+        with self._lock:
+            live_rows = len(self._row_by_id)
+            if live_rows < self.ivf_min_rows:
+                return
+            if self._centroids is not None and live_rows < 2 * self._trained_rows:
+                return
+            self.train_index()
+
+    def train_index(self, iterations: int = 10, seed: int = 0) -> None:
+        """Построение кластеров IVF сферическим k-means.
+
+        Args:
+            iterations: Количество итераций k-means.
+            seed: Зерно генератора случайных чисел.
+        """
+        with self._lock:
+            live = np.flatnonzero(~self._deleted[: self._rows])
+            if not len(live):
+                return
+
+            nlist = self.nlist or max(int(np.sqrt(len(live))), 1)
+            nlist = min(nlist, len(live))
+            rng = np.random.default_rng(seed)
+
+            # Обучение на выборке (до 64 векторов на кластер)
+            sample = np.sort(rng.choice(live, size=min(len(live), nlist * 64), replace=False))
+            data = np.asarray(self._matrix[sample])
+            centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+
+            for _ in range(iterations):
+                assign = np.argmax(data @ centroids.T, axis=1)
+                # Суммы векторов кластеров по отсортированным назначениям
+                order = np.argsort(assign, kind="stable")
+                counts = np.bincount(assign, minlength=nlist)
+                filled = np.flatnonzero(counts)
+                sums = np.add.reduceat(data[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[filled])
+                centroids[filled] = sums / np.linalg.norm(sums, axis=1, keepdims=True).clip(1e-12)
+
+            self._centroids = centroids
+            self._trained_rows = len(live)
+            self._assign = self._nearest_centroids(0, self._rows)
+            self._save_ivf()
+
+            logger.info(f"Построен IVF индекс: {nlist} кластеров по {len(live)} векторам")
+
+    def _save_ivf(self) -> None:
+        """Атомарное сохранение кластеров IVF текущего поколения."""
+        if self._centroids is None:
+            return
+        ivf_path = self._file("ivf")
+        tmp_path = ivf_path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, centroids=self._centroids, assign=self._assign, trained_rows=self._trained_rows)
+        os.replace(tmp_path, ivf_path)
+
+    def _maybe_compact(self) -> None:
+        """Компакция при превышении доли удаленных строк."""
+        deleted = self._rows - len(self._row_by_id)
+        if deleted and deleted > self.compact_ratio * self._rows:
+            self.compact()
+
+    def compact(self) -> None:
+        """Перезапись хранилища без удаленных строк в новое поколение."""
+        with self._writer():
+            live = np.flatnonzero(~self._deleted[: self._rows])
+            old_generation = self._generation
+            generation = old_generation + 1
+
+            with open(self._file("vectors", generation), "wb") as f:
+                for start in range(0, len(live), self.BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(self._matrix[live[start : start + self.BLOCK_ROWS]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self._file("log", generation), "w", encoding="utf-8") as f:
+                for new_row, row in enumerate(live):
+                    f.write(
+                        json.dumps(
+                            {"op": "upsert", "id": self._ids[row], "row": new_row, "payload": self._payloads[row]},
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+                f.flush()
+                os.fsync(f.fileno())
+
+            centroids, trained_rows = self._centroids, self._trained_rows
+            assign = self._assign[live] if centroids is not None else self._assign
+
+            self._generation = generation
+            if centroids is not None:
+                self._centroids, self._assign, self._trained_rows = centroids, assign, trained_rows
+                self._save_ivf()
+            self._write_manifest()
+
+            for kind in ("vectors", "log", "ivf"):
+                self._file(kind, old_generation).unlink(missing_ok=True)
+
+            self._load()
+            logger.info(f"Компакция локального векторного хранилища: {len(live)} векторов, поколение {generation}")
+
+    def close(self) -> None:
+        """Освобождение отображения файла векторов и состояния в памяти.
+
+        Файлы открываются только на время записи, поэтому держать открытым
+        нечего; при следующем обращении хранилище загружается с диска заново.
+        """
+        with self._lock:
+            self._reset_state(0)
+            self._manifest_version = None
+
+    async def aclose(self) -> None:
+        """Закрытие файлов хранилища."""
+        self.close()
+
+    def get_collection_info(self) -> dict[str, Any]:
+        """Получение информации о хранилище.
+
+        Returns:
+            Словарь с информацией о хранилище.
+        """
+        self.refresh()
+        with self._lock:
+            return {
+                "name": self.collection_name,
+                "backend": "local",
+                "vectors_count": len(self._row_by_id),
+                "deleted_count": self._rows - len(self._row_by_id),
+                "vector_size": self.vector_size,
+                "distance": "COSINE",
+                "index": "ivf" if self._centroids is not None else "exact",
+                "generation": self._generation,
+            }
+
+
+@lru_cache()
+def get_local_vector_store() -> LocalVectorStore:
+    """Получить локальное векторное хранилище из настроек (singleton)."""
+    return LocalVectorStore()
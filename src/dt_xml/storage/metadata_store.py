@@ -1,14 +1,50 @@
 """Хранилище метаданных деклараций в PostgreSQL."""
 
 import logging
+import time
+from collections.abc import Iterator, Sequence
 from datetime import datetime
-from typing import Any
-
-from sqlalchemy import JSON, Column, DateTime, String, create_engine, text
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    Engine,
+    Index,
+    Insert,
+    Numeric,
+    Select,
+    String,
+    event,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from dt_xml.config.models import DeclarationMetadata
 from dt_xml.config.settings import get_settings
+from dt_xml.normalizer.field_normalizer import company_search_key
+from dt_xml.storage.database import get_async_engine, get_engine
+from dt_xml.storage.migrations import SEARCH_VECTOR_DDL, apply_migrations
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    from sqlalchemy.ext.asyncio import AsyncEngine
+else:
+    # pyarrow — необязательная зависимость (extra "arrow")
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,47 +55,142 @@ class DeclarationMetadataModel(Base):
     """Модель метаданных декларации в БД."""
 
     __tablename__ = "declaration_metadata"
+    # Составные индексы под типовые фильтры (поле + период) и BRIN по дате:
+    # строки пишутся примерно в порядке дат, BRIN занимает единицы страниц
+    __table_args__ = (
+        Index("ix_declaration_metadata_tenant_date", "tenant_id", "date_issued"),
+        Index("ix_declaration_metadata_product_code_date", "product_code", "date_issued"),
+        Index("ix_declaration_metadata_manufacturer_date", "manufacturer", "date_issued"),
+        Index("ix_declaration_metadata_importer_date", "importer", "date_issued"),
+        Index("ix_declaration_metadata_country_origin_date", "country_origin", "date_issued"),
+        Index("brin_declaration_metadata_date_issued", "date_issued", postgresql_using="brin"),
+        # Ключ keyset-пагинации потоковых выборок
+        Index("ix_declaration_metadata_date_id", "date_issued", "declaration_id"),
+        # Trigram индексы нечеткого поиска компаний (только PostgreSQL, расширение pg_trgm)
+        *(
+            Index(
+                f"trgm_declaration_metadata_{field}_key",
+                f"{field}_key",
+                postgresql_using="gin",
+                postgresql_ops={f"{field}_key": "gin_trgm_ops"},
+            ).ddl_if(dialect="postgresql")
+            for field in ("manufacturer", "importer", "exporter")
+        ),
+    )
 
     declaration_id = Column(String, primary_key=True)
     declaration_number = Column(String, nullable=False, index=True)
-    date_issued = Column(DateTime, nullable=False, index=True)
+    tenant_id = Column(String, nullable=False, default="default", server_default="default")
+    date_issued = Column(DateTime, nullable=False)
     declaration_type = Column(String, nullable=False)
     status = Column(String, nullable=False)
-    manufacturer = Column(String, index=True)
-    importer = Column(String, index=True)
+    manufacturer = Column(String)
+    importer = Column(String)
     exporter = Column(String, index=True)
-    product_code = Column(String, index=True)
-    country_origin = Column(String, index=True)
-    customs_value = Column(String)
+    product_code = Column(String)
+    country_origin = Column(String)
+    customs_value = Column(Numeric(18, 2))
     currency = Column(String)
-    quantity = Column(String)
+    quantity = Column(Numeric(18, 3))
     unit_of_measure = Column(String)
     language = Column(String)
     version = Column(String)
     source = Column(String)
     processed_at = Column(DateTime, default=datetime.utcnow)
-    metadata_json = Column(JSON)  # Дополнительные метаданные
+    # Ключи нечеткого поиска компаний (см. company_search_key)
+    manufacturer_key = Column(String)
+    importer_key = Column(String)
+    exporter_key = Column(String)
+
+
+# Полнотекстовый вектор по ключам компаний и коду товара — вычисляемая колонка
+# PostgreSQL; в модели не описывается, чтобы схема создавалась и в SQLite
+event.listen(
+    DeclarationMetadataModel.__table__,
+    "before_create",
+    DDL(SEARCH_VECTOR_DDL[0]).execute_if(dialect="postgresql"),
+)
+for _statement in SEARCH_VECTOR_DDL[1:]:
+    event.listen(
+        DeclarationMetadataModel.__table__,
+        "after_create",
+        DDL(_statement).execute_if(dialect="postgresql"),
+    )
+
+COMPANY_FIELDS = ("manufacturer", "importer", "exporter")
+
+# Колонки потоковой выборки по умолчанию (без служебных ключей поиска)
+STREAM_COLUMNS = tuple(
+    column.name for column in DeclarationMetadataModel.__table__.columns if not column.name.endswith("_key")
+)
+
+
+# Колонки, по которым search_by_filters строит условия
+FILTER_COLUMNS = (
+    "declaration_number",
+    "tenant_id",
+    "date_issued",
+    "declaration_type",
+    "status",
+    "manufacturer",
+    "importer",
+    "exporter",
+    "product_code",
+    "country_origin",
+    "customs_value",
+    "currency",
+    "quantity",
+)
+
+# Операторы диапазонного фильтра {"gte": ..., "lt": ...}
+_RANGE_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+}
 
 
 class MetadataStore:
-    """Хранилище метаданных деклараций."""
+    """Хранилище метаданных деклараций.
+
+    Использует общие движки процесса (см. dt_xml.storage.database), поэтому
+    создание экземпляра не открывает новый пул соединений. Схема БД создается
+    и мигрируется отдельно, методом create_schema, при старте приложения
+    или конвейера загрузки.
+    """
+
+    def __init__(self, engine: Engine | None = None, async_engine: "AsyncEngine | None" = None):
+        """Инициализация хранилища метаданных.
 
-    def __init__(self):
-        """Инициализация хранилища метаданных."""
+        Args:
+            engine: Синхронный движок. Если None, общий движок процесса.
+            async_engine: Асинхронный движок. Если None, общий движок процесса
+                (создается при первом асинхронном запросе).
+        """
         self.settings = get_settings()
-        self.engine = create_engine(
-            self.settings.database.url,
-            pool_size=self.settings.database.pool_size,
-            max_overflow=self.settings.database.max_overflow,
-        )
+        self.engine = engine or get_engine()
+        self._async_engine = async_engine
         self.SessionLocal = sessionmaker(bind=self.engine)
-        self._create_tables()
 
-    def _create_tables(self) -> None:
-        """Создание таблиц в БД."""
+    @property
+    def async_engine(self) -> "AsyncEngine":
+        """Асинхронный движок базы метаданных."""
+        if self._async_engine is None:
+            self._async_engine = get_async_engine()
+        return self._async_engine
+
+    def create_schema(self) -> int:
+        """Создание таблиц в БД и применение миграций схемы.
+
+        Returns:
+            Версия схемы.
+        """
         try:
-            Base.metadata.create_all(self.engine)
-            logger.info("Таблицы метаданных созданы/проверены")
+            version = apply_migrations(self.engine, Base.metadata)
+            logger.info(f"Таблицы метаданных созданы/проверены (версия схемы {version})")
+            return version
         except Exception as e:
             logger.error(f"Ошибка при создании таблиц: {e}")
             raise
@@ -74,59 +205,204 @@ class MetadataStore:
         Returns:
             Идентификатор декларации.
         """
-        if declaration_id is None:
-            declaration_id = metadata.declaration_number
+        declaration_id = self.save_metadata_many([metadata], [declaration_id])[0]
+        logger.info(f"Метаданные декларации {declaration_id} сохранены")
+        return declaration_id
 
-        session = self.SessionLocal()
+    async def asave_metadata(self, metadata: DeclarationMetadata, declaration_id: str | None = None) -> str:
+        """Асинхронное сохранение метаданных декларации.
+
+        Args:
+            metadata: Метаданные декларации.
+            declaration_id: Идентификатор декларации. Если None, генерируется из номера.
+
+        Returns:
+            Идентификатор декларации.
+        """
+        declaration_id = (await self.asave_metadata_many([metadata], [declaration_id]))[0]
+        logger.info(f"Метаданные декларации {declaration_id} сохранены")
+        return declaration_id
+
+    def save_metadata_many(
+        self,
+        metadata_list: Sequence[DeclarationMetadata],
+        declaration_ids: Sequence[str | None] | None = None,
+        batch_size: int | None = None,
+    ) -> list[str]:
+        """Массовое сохранение метаданных деклараций.
+
+        Каждая пачка записывается одним запросом INSERT ... ON CONFLICT
+        (declaration_id) DO UPDATE в отдельной транзакции, без загрузки
+        существующих строк в ORM.
+
+        Args:
+            metadata_list: Метаданные деклараций.
+            declaration_ids: Идентификаторы деклараций в том же порядке.
+                Если None (или None для элемента), используется номер декларации.
+            batch_size: Количество строк в одном запросе. Если None, из настроек.
+
+        Returns:
+            Идентификаторы деклараций в порядке входных данных.
+        """
+        values, result_ids = self._prepare_rows(metadata_list, declaration_ids)
+        batch_size = max(batch_size or self.settings.database.bulk_batch_size, 1)
         try:
-            # Проверка существования
-            existing = session.query(DeclarationMetadataModel).filter_by(
-                declaration_id=declaration_id
-            ).first()
+            for start in range(0, len(values), batch_size):
+                with self.engine.begin() as connection:
+                    connection.execute(self._upsert_statement(values[start : start + batch_size]))
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении метаданных: {e}")
+            raise
 
-            db_metadata = DeclarationMetadataModel(
-                declaration_id=declaration_id,
-                declaration_number=metadata.declaration_number,
-                date_issued=metadata.date_issued,
-                declaration_type=metadata.declaration_type.value,
-                status=metadata.status.value,
-                manufacturer=metadata.manufacturer,
-                importer=metadata.importer,
-                exporter=metadata.exporter,
-                product_code=metadata.product_code,
-                country_origin=metadata.country_origin,
-                customs_value=str(metadata.customs_value) if metadata.customs_value else None,
-                currency=metadata.currency,
-                quantity=str(metadata.quantity) if metadata.quantity else None,
-                unit_of_measure=metadata.unit_of_measure,
-                language=metadata.language,
-                version=metadata.version,
-                source=metadata.source,
-                processed_at=metadata.processed_at or datetime.utcnow(),
-                metadata_json=metadata.model_dump(),
-            )
+        logger.debug(f"Сохранены метаданные {len(values)} деклараций")
+        return result_ids
 
-            if existing:
-                # Обновление существующей записи
-                for key, value in db_metadata.__dict__.items():
-                    if key != "declaration_id":
-                        setattr(existing, key, value)
-                session.commit()
-                logger.info(f"Метаданные декларации {declaration_id} обновлены")
-            else:
-                # Создание новой записи
-                session.add(db_metadata)
-                session.commit()
-                logger.info(f"Метаданные декларации {declaration_id} сохранены")
+    async def asave_metadata_many(
+        self,
+        metadata_list: Sequence[DeclarationMetadata],
+        declaration_ids: Sequence[str | None] | None = None,
+        batch_size: int | None = None,
+    ) -> list[str]:
+        """Асинхронное массовое сохранение метаданных деклараций (см. save_metadata_many).
 
-            return declaration_id
+        Args:
+            metadata_list: Метаданные деклараций.
+            declaration_ids: Идентификаторы деклараций в том же порядке.
+            batch_size: Количество строк в одном запросе. Если None, из настроек.
 
+        Returns:
+            Идентификаторы деклараций в порядке входных данных.
+        """
+        values, result_ids = self._prepare_rows(metadata_list, declaration_ids)
+        batch_size = max(batch_size or self.settings.database.bulk_batch_size, 1)
+        try:
+            for start in range(0, len(values), batch_size):
+                async with self.async_engine.begin() as connection:
+                    await connection.execute(self._upsert_statement(values[start : start + batch_size]))
         except Exception as e:
-            session.rollback()
             logger.error(f"Ошибка при сохранении метаданных: {e}")
             raise
-        finally:
-            session.close()
+
+        logger.debug(f"Сохранены метаданные {len(values)} деклараций")
+        return result_ids
+
+    def _prepare_rows(
+        self,
+        metadata_list: Sequence[DeclarationMetadata],
+        declaration_ids: Sequence[str | None] | None,
+    ) -> tuple[list[dict[str, Any]], list[str]]:
+        """Строки для массового сохранения.
+
+        Args:
+            metadata_list: Метаданные деклараций.
+            declaration_ids: Идентификаторы деклараций в том же порядке.
+
+        Returns:
+            Кортеж (строки без повторов идентификаторов, идентификаторы в порядке входных данных).
+        """
+        if declaration_ids is None:
+            declaration_ids = [None] * len(metadata_list)
+        if len(declaration_ids) != len(metadata_list):
+            raise ValueError("Количество метаданных и идентификаторов деклараций должно совпадать")
+
+        # При повторе идентификатора сохраняется последняя версия
+        rows: dict[str, dict[str, Any]] = {}
+        result_ids: list[str] = []
+        for metadata, declaration_id in zip(metadata_list, declaration_ids, strict=True):
+            declaration_id = declaration_id or metadata.declaration_number
+            rows[declaration_id] = self._to_row(metadata, declaration_id)
+            result_ids.append(declaration_id)
+        return list(rows.values()), result_ids
+
+    @staticmethod
+    def _to_row(metadata: DeclarationMetadata, declaration_id: str) -> dict[str, Any]:
+        """Значения колонок таблицы метаданных.
+
+        Args:
+            metadata: Метаданные декларации.
+            declaration_id: Идентификатор декларации.
+
+        Returns:
+            Словарь колонка → значение.
+        """
+        return {
+            "declaration_id": declaration_id,
+            "declaration_number": metadata.declaration_number,
+            "date_issued": metadata.date_issued,
+            "declaration_type": metadata.declaration_type.value,
+            "status": metadata.status.value,
+            "manufacturer": metadata.manufacturer,
+            "importer": metadata.importer,
+            "exporter": metadata.exporter,
+            "product_code": metadata.product_code,
+            "country_origin": metadata.country_origin,
+            "customs_value": metadata.customs_value,
+            "currency": metadata.currency,
+            "quantity": metadata.quantity,
+            "unit_of_measure": metadata.unit_of_measure,
+            "language": metadata.language,
+            "version": metadata.version,
+            "source": metadata.source,
+            "tenant_id": metadata.tenant_id,
+            "processed_at": metadata.processed_at or datetime.utcnow(),
+            "manufacturer_key": company_search_key(metadata.manufacturer),
+            "importer_key": company_search_key(metadata.importer),
+            "exporter_key": company_search_key(metadata.exporter),
+        }
+
+    @staticmethod
+    def _from_row(db_metadata: Row) -> DeclarationMetadata:
+        """Метаданные декларации из строки таблицы.
+
+        Args:
+            db_metadata: Строка таблицы метаданных.
+
+        Returns:
+            Метаданные декларации.
+        """
+        return DeclarationMetadata(
+            declaration_number=db_metadata.declaration_number,
+            date_issued=db_metadata.date_issued,
+            declaration_type=db_metadata.declaration_type,
+            status=db_metadata.status,
+            manufacturer=db_metadata.manufacturer,
+            importer=db_metadata.importer,
+            exporter=db_metadata.exporter,
+            product_code=db_metadata.product_code,
+            country_origin=db_metadata.country_origin,
+            customs_value=float(db_metadata.customs_value) if db_metadata.customs_value is not None else None,
+            currency=db_metadata.currency,
+            quantity=float(db_metadata.quantity) if db_metadata.quantity is not None else None,
+            unit_of_measure=db_metadata.unit_of_measure,
+            language=db_metadata.language,
+            version=db_metadata.version,
+            source=db_metadata.source,
+            tenant_id=db_metadata.tenant_id,
+            processed_at=db_metadata.processed_at,
+        )
+
+    def _upsert_statement(self, rows: list[dict[str, Any]]) -> Insert:
+        """Запрос INSERT ... ON CONFLICT (declaration_id) DO UPDATE.
+
+        Args:
+            rows: Значения колонок строк.
+
+        Returns:
+            Запрос вставки с обновлением при конфликте.
+        """
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(DeclarationMetadataModel).values(rows)
+        elif dialect == "sqlite":
+            statement = sqlite.insert(DeclarationMetadataModel).values(rows)
+        else:
+            raise RuntimeError(f"Массовое сохранение метаданных не поддерживается для СУБД {dialect}")
+
+        columns = [column for column in rows[0] if column != "declaration_id"]
+        return statement.on_conflict_do_update(
+            index_elements=["declaration_id"],
+            set_={column: statement.excluded[column] for column in columns},
+        )
 
     def get_metadata(self, declaration_id: str) -> DeclarationMetadata | None:
         """Получение метаданных декларации.
@@ -137,110 +413,368 @@ class MetadataStore:
         Returns:
             Метаданные декларации или None.
         """
-        session = self.SessionLocal()
         try:
-            db_metadata = session.query(DeclarationMetadataModel).filter_by(
-                declaration_id=declaration_id
-            ).first()
-
-            if db_metadata:
-                # Восстановление из JSON, если доступно
-                if db_metadata.metadata_json:
-                    return DeclarationMetadata(**db_metadata.metadata_json)
-                else:
-                    # Создание из полей БД
-                    return DeclarationMetadata(
-                        declaration_number=db_metadata.declaration_number,
-                        date_issued=db_metadata.date_issued,
-                        declaration_type=db_metadata.declaration_type,
-                        status=db_metadata.status,
-                        manufacturer=db_metadata.manufacturer,
-                        importer=db_metadata.importer,
-                        exporter=db_metadata.exporter,
-                        product_code=db_metadata.product_code,
-                        country_origin=db_metadata.country_origin,
-                        customs_value=float(db_metadata.customs_value) if db_metadata.customs_value else None,
-                        currency=db_metadata.currency,
-                        quantity=float(db_metadata.quantity) if db_metadata.quantity else None,
-                        unit_of_measure=db_metadata.unit_of_measure,
-                        language=db_metadata.language,
-                        version=db_metadata.version,
-                        source=db_metadata.source,
-                        processed_at=db_metadata.processed_at,
-                    )
+            with self.engine.connect() as connection:
+                db_metadata = connection.execute(self._get_statement(declaration_id)).first()
+            return self._from_row(db_metadata) if db_metadata else None
 
+        except Exception as e:
+            logger.error(f"Ошибка при получении метаданных: {e}")
             return None
 
+    async def aget_metadata(self, declaration_id: str) -> DeclarationMetadata | None:
+        """Асинхронное получение метаданных декларации.
+
+        Args:
+            declaration_id: Идентификатор декларации.
+
+        Returns:
+            Метаданные декларации или None.
+        """
+        try:
+            async with self.async_engine.connect() as connection:
+                db_metadata = (await connection.execute(self._get_statement(declaration_id))).first()
+            return self._from_row(db_metadata) if db_metadata else None
+
         except Exception as e:
             logger.error(f"Ошибка при получении метаданных: {e}")
             return None
-        finally:
-            session.close()
 
     def search_by_filters(self, filters: dict[str, Any], limit: int = 100) -> list[DeclarationMetadata]:
         """Поиск метаданных по фильтрам.
 
+        Значение фильтра по колонке (см. FILTER_COLUMNS):
+
+        - скаляр — равенство;
+        - список — принадлежность списку (IN);
+        - словарь с ключами eq/gt/gte/lt/lte — диапазон,
+          например {"customs_value": {"gte": 1000, "lt": 5000}}.
+
+        Поддерживаются также ключи <колонка>_from и <колонка>_to
+        (включительные границы), например date_issued_from.
+
         Args:
             filters: Словарь фильтров (поле -> значение).
             limit: Максимальное количество результатов.
 
         Returns:
-            Список метаданных деклараций.
+            Список метаданных деклараций, новые сначала.
         """
-        session = self.SessionLocal()
         try:
-            query = session.query(DeclarationMetadataModel)
-
-            # Применение фильтров
-            if "manufacturer" in filters:
-                query = query.filter(DeclarationMetadataModel.manufacturer == filters["manufacturer"])
-            if "importer" in filters:
-                query = query.filter(DeclarationMetadataModel.importer == filters["importer"])
-            if "product_code" in filters:
-                query = query.filter(DeclarationMetadataModel.product_code == filters["product_code"])
-            if "country_origin" in filters:
-                query = query.filter(DeclarationMetadataModel.country_origin == filters["country_origin"])
-            if "date_issued_from" in filters:
-                query = query.filter(DeclarationMetadataModel.date_issued >= filters["date_issued_from"])
-            if "date_issued_to" in filters:
-                query = query.filter(DeclarationMetadataModel.date_issued <= filters["date_issued_to"])
-
-            results = query.limit(limit).all()
-
-            metadata_list = []
-            for db_metadata in results:
-                if db_metadata.metadata_json:
-                    metadata_list.append(DeclarationMetadata(**db_metadata.metadata_json))
-                else:
-                    metadata_list.append(
-                        DeclarationMetadata(
-                            declaration_number=db_metadata.declaration_number,
-                            date_issued=db_metadata.date_issued,
-                            declaration_type=db_metadata.declaration_type,
-                            status=db_metadata.status,
-                            manufacturer=db_metadata.manufacturer,
-                            importer=db_metadata.importer,
-                            exporter=db_metadata.exporter,
-                            product_code=db_metadata.product_code,
-                            country_origin=db_metadata.country_origin,
-                            customs_value=float(db_metadata.customs_value) if db_metadata.customs_value else None,
-                            currency=db_metadata.currency,
-                            quantity=float(db_metadata.quantity) if db_metadata.quantity else None,
-                            unit_of_measure=db_metadata.unit_of_measure,
-                            language=db_metadata.language,
-                            version=db_metadata.version,
-                            source=db_metadata.source,
-                            processed_at=db_metadata.processed_at,
-                        )
-                    )
+            with self.engine.connect() as connection:
+                results = connection.execute(self._search_statement(filters, limit)).all()
+            return [self._from_row(db_metadata) for db_metadata in results]
 
-            return metadata_list
+        except Exception as e:
+            logger.error(f"Ошибка при поиске метаданных: {e}")
+            return []
+
+    async def asearch_by_filters(self, filters: dict[str, Any], limit: int = 100) -> list[DeclarationMetadata]:
+        """Асинхронный поиск метаданных по фильтрам (см. search_by_filters).
+
+        Args:
+            filters: Словарь фильтров (поле -> значение).
+            limit: Максимальное количество результатов.
+
+        Returns:
+            Список метаданных деклараций, новые сначала.
+        """
+        try:
+            async with self.async_engine.connect() as connection:
+                results = (await connection.execute(self._search_statement(filters, limit))).all()
+            return [self._from_row(db_metadata) for db_metadata in results]
 
         except Exception as e:
             logger.error(f"Ошибка при поиске метаданных: {e}")
             return []
-        finally:
-            session.close()
+
+    async def aping(self) -> dict[str, Any]:
+        """Проверка подключения к БД через асинхронный пул.
+
+        Returns:
+            Словарь с задержкой запроса и состоянием пула соединений.
+        """
+        start_time = time.perf_counter()
+        async with self.async_engine.connect() as connection:
+            await connection.execute(select(1))
+        return {
+            "status": "connected",
+            "latency_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            "pool": self.async_engine.pool.status(),
+        }
+
+    @staticmethod
+    def _get_statement(declaration_id: str) -> Select:
+        """Запрос строки метаданных по идентификатору декларации.
+
+        Args:
+            declaration_id: Идентификатор декларации.
+
+        Returns:
+            Запрос SELECT.
+        """
+        table = DeclarationMetadataModel.__table__
+        return select(table).where(table.c.declaration_id == declaration_id)
+
+    def _search_statement(self, filters: dict[str, Any], limit: int) -> Select:
+        """Запрос поиска метаданных по фильтрам.
+
+        Args:
+            filters: Словарь фильтров (см. search_by_filters).
+            limit: Максимальное количество результатов.
+
+        Returns:
+            Запрос SELECT.
+        """
+        table = DeclarationMetadataModel.__table__
+        return (
+            select(table)
+            .where(*self._filter_conditions(filters))
+            .order_by(table.c.date_issued.desc())
+            .limit(limit)
+        )
+
+    @staticmethod
+    def _filter_conditions(filters: dict[str, Any]) -> list[Any]:
+        """Условия запроса по словарю фильтров.
+
+        Args:
+            filters: Словарь фильтров (см. search_by_filters).
+
+        Returns:
+            Список условий SQLAlchemy. Неизвестные поля и None пропускаются.
+        """
+        conditions = []
+        for key, value in filters.items():
+            if value is None:
+                continue
+
+            if key in FILTER_COLUMNS:
+                column = getattr(DeclarationMetadataModel, key)
+                if isinstance(value, dict):
+                    for operator, bound in value.items():
+                        if operator not in _RANGE_OPERATORS:
+                            raise ValueError(f"Неизвестный оператор фильтра {key}: {operator}")
+                        conditions.append(_RANGE_OPERATORS[operator](column, bound))
+                elif isinstance(value, (list, tuple, set)):
+                    conditions.append(column.in_(list(value)))
+                else:
+                    conditions.append(column == value)
+            elif key.endswith("_from") and key[: -len("_from")] in FILTER_COLUMNS:
+                conditions.append(getattr(DeclarationMetadataModel, key[: -len("_from")]) >= value)
+            elif key.endswith("_to") and key[: -len("_to")] in FILTER_COLUMNS:
+                conditions.append(getattr(DeclarationMetadataModel, key[: -len("_to")]) <= value)
+            else:
+                logger.debug(f"Фильтр {key} не поддерживается хранилищем метаданных и пропущен")
+        return conditions
+
+    def lookup_companies(
+        self,
+        query: str,
+        fields: Sequence[str] | None = None,
+        tenant_id: str | None = None,
+        limit: int | None = None,
+        min_similarity: float | None = None,
+    ) -> list[tuple[str, float]]:
+        """Нечеткий и префиксный поиск деклараций по названию компании.
+
+        Запрос и названия сравниваются по ключам company_search_key, поэтому
+        "самсунг" находит "Samsung Electronics". В PostgreSQL используются
+        GIN индексы pg_trgm (word_similarity) и префиксный полнотекстовый
+        запрос по search_vector; в остальных СУБД — поиск подстроки.
+        Предназначен для отбора кандидатов перед векторным поиском.
+
+        Args:
+            query: Название компании или его часть.
+            fields: Поля компаний (по умолчанию search.fuzzy_filters.fields).
+            tenant_id: Идентификатор заказчика. Если None, по всем заказчикам.
+            limit: Максимум деклараций (по умолчанию search.fuzzy_filters.max_candidates).
+            min_similarity: Порог сходства (по умолчанию search.fuzzy_filters.min_similarity).
+
+        Returns:
+            Список (declaration_id, скор сходства) по убыванию скора.
+        """
+        fuzzy_settings = self.settings.search.fuzzy_filters
+        key = company_search_key(query)
+        if not key:
+            return []
+
+        fields = list(fields or fuzzy_settings.get("fields", COMPANY_FIELDS))
+        unknown = [field for field in fields if field not in COMPANY_FIELDS]
+        if unknown:
+            raise ValueError(f"Нечеткий поиск не поддерживается для полей: {', '.join(unknown)}")
+
+        limit = limit or fuzzy_settings.get("max_candidates", 1000)
+        if min_similarity is None:
+            min_similarity = fuzzy_settings.get("min_similarity", 0.4)
+        columns = [getattr(DeclarationMetadataModel, f"{field}_key") for field in fields]
+
+        try:
+            with self.engine.begin() as connection:
+                if self.engine.dialect.name == "postgresql":
+                    connection.execute(
+                        select(func.set_config("pg_trgm.word_similarity_threshold", str(min_similarity), True))
+                    )
+                    prefix_query = " & ".join(f"{word}:*" for word in key.split())
+                    score = func.greatest(*[func.coalesce(func.word_similarity(key, column), 0) for column in columns])
+                    condition = or_(
+                        *[literal(key).op("<%")(column) for column in columns],
+                        literal_column("search_vector").op("@@")(func.to_tsquery("simple", prefix_query)),
+                    )
+                    statement = select(DeclarationMetadataModel.declaration_id, score).where(condition)
+                    if tenant_id is not None:
+                        statement = statement.where(DeclarationMetadataModel.tenant_id == tenant_id)
+                    rows = connection.execute(statement.order_by(score.desc()).limit(limit)).all()
+                    return [(declaration_id, float(score)) for declaration_id, score in rows]
+
+                statement = select(DeclarationMetadataModel.declaration_id, *columns).where(
+                    or_(*[column.contains(key) for column in columns])
+                )
+                if tenant_id is not None:
+                    statement = statement.where(DeclarationMetadataModel.tenant_id == tenant_id)
+                rows = connection.execute(statement).all()
+        except Exception as e:
+            logger.error(f"Ошибка при нечетком поиске компаний: {e}")
+            raise
+
+        scored = [
+            (row[0], max(SequenceMatcher(None, key, value).ratio() for value in row[1:] if value))
+            for row in rows
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def iter_metadata(
+        self,
+        filters: dict[str, Any] | None = None,
+        columns: Sequence[str] | None = None,
+        page_size: int | None = None,
+        batch_size: int | None = None,
+    ) -> Iterator[Row]:
+        """Потоковый обход метаданных деклараций.
+
+        Строки отдаются в порядке (date_issued, declaration_id) без
+        построения моделей Pydantic, память не зависит от размера выборки
+        (см. iter_metadata_batches).
+
+        Args:
+            filters: Словарь фильтров (см. search_by_filters).
+            columns: Колонки строк (по умолчанию STREAM_COLUMNS).
+            page_size: Строк в одном запросе (по умолчанию database.stream_page_size).
+            batch_size: Строк в одной выборке из курсора (по умолчанию database.stream_batch_size).
+
+        Yields:
+            Строки (именованные кортежи) с запрошенными колонками.
+        """
+        for batch in self.iter_metadata_batches(filters, columns, page_size, batch_size):
+            yield from batch
+
+    def iter_metadata_batches(
+        self,
+        filters: dict[str, Any] | None = None,
+        columns: Sequence[str] | None = None,
+        page_size: int | None = None,
+        batch_size: int | None = None,
+    ) -> Iterator[Sequence[Row]]:
+        """Потоковый обход метаданных деклараций пачками строк.
+
+        Выборка разбивается на страницы keyset-пагинацией по индексу
+        (date_issued, declaration_id): каждая следующая страница начинается
+        после последней строки предыдущей, без OFFSET. Страница читается через
+        серверный курсор пачками по batch_size строк, каждая страница — в
+        отдельном коротком запросе.
+
+        Args:
+            filters: Словарь фильтров (см. search_by_filters).
+            columns: Колонки строк (по умолчанию STREAM_COLUMNS). Колонки
+                date_issued и declaration_id добавляются, если не указаны.
+            page_size: Строк в одном запросе (по умолчанию database.stream_page_size).
+            batch_size: Строк в одной выборке из курсора (по умолчанию database.stream_batch_size).
+
+        Yields:
+            Пачки строк (именованных кортежей) с запрошенными колонками.
+        """
+        table = DeclarationMetadataModel.__table__
+        names = list(columns or STREAM_COLUMNS)
+        unknown = [name for name in names if name not in table.c]
+        if unknown:
+            raise ValueError(f"Неизвестные колонки метаданных: {', '.join(unknown)}")
+        names += [name for name in ("date_issued", "declaration_id") if name not in names]
+
+        page_size = max(page_size or self.settings.database.stream_page_size, 1)
+        batch_size = max(min(batch_size or self.settings.database.stream_batch_size, page_size), 1)
+        conditions = self._filter_conditions(filters or {})
+        key = (table.c.date_issued, table.c.declaration_id)
+
+        last_key = None
+        while True:
+            statement = select(*[table.c[name] for name in names]).where(*conditions)
+            if last_key is not None:
+                statement = statement.where(tuple_(*key) > tuple_(*last_key))
+            statement = statement.order_by(*key).limit(page_size)
+
+            fetched = 0
+            with self.engine.connect() as connection:
+                result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                    statement
+                )
+                for batch in result.partitions(batch_size):
+                    fetched += len(batch)
+                    last_key = (batch[-1].date_issued, batch[-1].declaration_id)
+                    yield batch
+
+            if fetched < page_size:
+                return
+
+    def iter_metadata_arrow(
+        self,
+        filters: dict[str, Any] | None = None,
+        columns: Sequence[str] | None = None,
+        page_size: int | None = None,
+        batch_size: int | None = None,
+    ) -> Iterator["pa.RecordBatch"]:
+        """Потоковый обход метаданных деклараций пачками Arrow.
+
+        Требует pyarrow (extra "arrow").
+
+        Args:
+            filters: Словарь фильтров (см. search_by_filters).
+            columns: Колонки (по умолчанию STREAM_COLUMNS).
+            page_size: Строк в одном запросе (по умолчанию database.stream_page_size).
+            batch_size: Строк в одной пачке (по умолчанию database.stream_batch_size).
+
+        Yields:
+            Пачки pyarrow.RecordBatch.
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow не установлен, выгрузка в Arrow недоступна (pip install dt-xml[arrow])")
+
+        schema = None
+        for batch in self.iter_metadata_batches(filters, columns, page_size, batch_size):
+            if schema is None:
+                schema = pa.schema([(name, self._arrow_type(name)) for name in batch[0]._fields])
+            columns_values = zip(*batch, strict=True)
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns_values, schema, strict=True)],
+                schema=schema,
+            )
+
+    @staticmethod
+    def _arrow_type(column_name: str) -> "pa.DataType":
+        """Тип Arrow для колонки таблицы метаданных.
+
+        Args:
+            column_name: Имя колонки.
+
+        Returns:
+            Тип pyarrow.
+        """
+        column_type = DeclarationMetadataModel.__table__.c[column_name].type
+        if isinstance(column_type, Numeric):
+            return pa.decimal128(column_type.precision, column_type.scale)
+        if isinstance(column_type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
 
     def delete_metadata(self, declaration_id: str) -> None:
         """Удаление метаданных декларации.
@@ -267,3 +801,9 @@ class MetadataStore:
             raise
         finally:
             session.close()
+
+
+@lru_cache()
+def get_metadata_store() -> MetadataStore:
+    """Получить хранилище метаданных на общих движках процесса (singleton)."""
+    return MetadataStore()
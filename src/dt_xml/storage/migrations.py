@@ -0,0 +1,329 @@
+"""Миграции схемы базы метаданных.
+
+Примененные миграции учитываются в таблице schema_migrations. Новая база
+создается сразу в актуальной схеме по моделям SQLAlchemy и помечается как
+мигрированная до последней версии; для существующей базы без таблицы учета
+считается, что она в исходной схеме (версия 1), и применяются последующие
+миграции. Каждая миграция выполняется в отдельной транзакции.
+
+Процессы, одновременно запускающие миграции (несколько воркеров API),
+сериализуются advisory-блокировкой PostgreSQL: проверка версии и миграции
+выполняются только держателем блокировки.
+"""
+
+import logging
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from typing import cast
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from dt_xml.normalizer.field_normalizer import company_search_key
+
+logger = logging.getLogger(__name__)
+
+METADATA_TABLE = "declaration_metadata"
+
+# Индексы исходной схемы, замененные составными индексами и BRIN
+_LEGACY_INDEXES = [
+    "ix_declaration_metadata_date_issued",
+    "ix_declaration_metadata_manufacturer",
+    "ix_declaration_metadata_importer",
+    "ix_declaration_metadata_product_code",
+    "ix_declaration_metadata_country_origin",
+]
+
+# Колонки, хранившиеся в исходной схеме строками
+_NUMERIC_COLUMNS = ("customs_value", "quantity")
+
+# Составные индексы и BRIN, добавленные миграцией 2
+_COMPOSITE_INDEXES = [
+    "ix_declaration_metadata_tenant_date",
+    "ix_declaration_metadata_product_code_date",
+    "ix_declaration_metadata_manufacturer_date",
+    "ix_declaration_metadata_importer_date",
+    "ix_declaration_metadata_country_origin_date",
+    "brin_declaration_metadata_date_issued",
+]
+
+_COMPANY_FIELDS = ("manufacturer", "importer", "exporter")
+
+# Ключ advisory-блокировки миграций (общий для всех процессов)
+MIGRATIONS_LOCK_KEY = 0x6474786D6C
+# Размер пачки строк при заполнении новых колонок
+BACKFILL_BATCH_SIZE = 1000
+
+# Расширение pg_trgm и полнотекстовый вектор по ключам компаний и коду товара
+SEARCH_VECTOR_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"ALTER TABLE {METADATA_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', "
+    "coalesce(manufacturer_key, '') || ' ' || coalesce(importer_key, '') || ' ' || "
+    "coalesce(exporter_key, '') || ' ' || coalesce(product_code, ''))) STORED",
+    f"CREATE INDEX IF NOT EXISTS gin_declaration_metadata_search_vector "
+    f"ON {METADATA_TABLE} USING gin (search_vector)",
+]
+
+
+def _numeric_columns_and_indexes(connection: Connection, metadata: MetaData) -> None:
+    """Числовые стоимость и количество, колонка заказчика, составные индексы, без metadata_json.
+
+    В PostgreSQL колонки меняются через ALTER TABLE; SQLite не умеет менять
+    тип колонки, поэтому таблица пересоздается с копированием строк.
+
+    Args:
+        connection: Соединение в транзакции миграции.
+        metadata: Метаданные моделей SQLAlchemy.
+    """
+    table = metadata.tables[METADATA_TABLE]
+    columns = {column["name"] for column in inspect(connection).get_columns(METADATA_TABLE)}
+
+    if connection.dialect.name != "postgresql":
+        _rebuild_table(connection, table, columns)
+        return
+
+    if "tenant_id" not in columns:
+        connection.execute(
+            text(f"ALTER TABLE {METADATA_TABLE} ADD COLUMN tenant_id VARCHAR NOT NULL DEFAULT 'default'")
+        )
+
+    for column in _NUMERIC_COLUMNS:
+        numeric = cast(Numeric, table.c[column].type)
+        precision, scale = numeric.precision, numeric.scale
+        connection.execute(
+            text(
+                f"ALTER TABLE {METADATA_TABLE} ALTER COLUMN {column} TYPE NUMERIC({precision}, {scale}) "
+                f"USING NULLIF(TRIM({column}::text), '')::numeric"
+            )
+        )
+
+    for index_name in _LEGACY_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    _create_indexes(connection, table, _COMPOSITE_INDEXES)
+
+    # Все поля метаданных хранятся в колонках, копия строки в JSON не нужна
+    if "metadata_json" in columns:
+        connection.execute(text(f"ALTER TABLE {METADATA_TABLE} DROP COLUMN metadata_json"))
+
+
+def _company_search_keys(connection: Connection, metadata: MetaData) -> None:
+    """Ключи нечеткого поиска компаний, trigram индексы и полнотекстовый вектор.
+
+    Args:
+        connection: Соединение в транзакции миграции.
+        metadata: Метаданные моделей SQLAlchemy.
+    """
+    table = metadata.tables[METADATA_TABLE]
+    columns = {column["name"] for column in inspect(connection).get_columns(METADATA_TABLE)}
+    for field in _COMPANY_FIELDS:
+        if f"{field}_key" not in columns:
+            connection.execute(text(f"ALTER TABLE {METADATA_TABLE} ADD COLUMN {field}_key VARCHAR"))
+
+    # Заполнение ключей существующих строк пачками с keyset-пагинацией
+    page = text(
+        f"SELECT declaration_id, {', '.join(_COMPANY_FIELDS)} FROM {METADATA_TABLE} "
+        "WHERE declaration_id > :after ORDER BY declaration_id LIMIT :limit"
+    )
+    assignments = ", ".join(f"{field}_key = :{field}_key" for field in _COMPANY_FIELDS)
+    update = text(f"UPDATE {METADATA_TABLE} SET {assignments} WHERE declaration_id = :declaration_id")
+    after = ""
+    while rows := connection.execute(page, {"after": after, "limit": BACKFILL_BATCH_SIZE}).all():
+        connection.execute(
+            update,
+            [
+                {
+                    "declaration_id": row[0],
+                    **{f"{field}_key": company_search_key(name) for field, name in zip(_COMPANY_FIELDS, row[1:], strict=True)},
+                }
+                for row in rows
+            ],
+        )
+        after = rows[-1][0]
+
+    if connection.dialect.name == "postgresql":
+        for statement in SEARCH_VECTOR_DDL:
+            connection.execute(text(statement))
+        _create_indexes(connection, table, [f"trgm_declaration_metadata_{field}_key" for field in _COMPANY_FIELDS])
+
+
+def _keyset_index(connection: Connection, metadata: MetaData) -> None:
+    """Индекс (date_issued, declaration_id) для keyset-пагинации.
+
+    Args:
+        connection: Соединение в транзакции миграции.
+        metadata: Метаданные моделей SQLAlchemy.
+    """
+    _create_indexes(connection, metadata.tables[METADATA_TABLE], ["ix_declaration_metadata_date_id"])
+
+
+def _create_indexes(connection: Connection, table: Table, names: list[str]) -> None:
+    """Создание индексов модели по именам, если их еще нет.
+
+    Args:
+        connection: Соединение в транзакции миграции.
+        table: Таблица в актуальной схеме.
+        names: Имена индексов.
+    """
+    for index in table.indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+
+def _rebuild_table(connection: Connection, table: Table, columns: set[str]) -> None:
+    """Пересоздание таблицы в актуальной схеме с переносом строк.
+
+    Args:
+        connection: Соединение в транзакции миграции.
+        table: Таблица в актуальной схеме.
+        columns: Колонки существующей таблицы.
+    """
+    legacy_name = f"{table.name}_legacy"
+    for index in inspect(connection).get_indexes(table.name):
+        connection.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy_name}"))
+    table.create(connection)
+
+    copied = [column.name for column in table.columns if column.name in columns]
+    selected = [
+        f"CAST(NULLIF(TRIM({name}), '') AS REAL)" if name in _NUMERIC_COLUMNS else name for name in copied
+    ]
+    connection.execute(
+        text(f"INSERT INTO {table.name} ({', '.join(copied)}) SELECT {', '.join(selected)} FROM {legacy_name}")
+    )
+    connection.execute(text(f"DROP TABLE {legacy_name}"))
+
+
+# Версия → (описание, функция миграции); версия 1 — исходная схема
+MIGRATIONS: dict[int, tuple[str, Callable[[Connection, MetaData], None]]] = {
+    2: ("numeric-columns-tenant-composite-indexes", _numeric_columns_and_indexes),
+    3: ("company-search-keys", _company_search_keys),
+    4: ("keyset-index", _keyset_index),
+}
+
+LATEST_VERSION = max(MIGRATIONS, default=1)
+
+_schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def get_schema_version(engine: Engine) -> int:
+    """Текущая версия схемы базы.
+
+    Args:
+        engine: Движок SQLAlchemy.
+
+    Returns:
+        Номер последней примененной миграции (0 — схема не создана).
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(_schema_migrations.name):
+        return 1 if inspector.has_table(METADATA_TABLE) else 0
+    with engine.connect() as connection:
+        versions = connection.execute(select(_schema_migrations.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+@contextmanager
+def _migrations_lock(engine: Engine) -> Iterator[None]:
+    """Блокировка миграций между процессами.
+
+    В PostgreSQL берется сессионная advisory-блокировка на отдельном
+    соединении: миграции выполняются несколькими транзакциями, и блокировка
+    уровня транзакции не покрыла бы их все. Для SQLite блокировка не нужна
+    (база одного процесса).
+
+    Args:
+        engine: Движок SQLAlchemy.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            connection.commit()
+
+
+def apply_migrations(engine: Engine, metadata: MetaData) -> int:
+    """Создание схемы или применение недостающих миграций.
+
+    Выполняется под блокировкой миграций: процесс, дождавшийся блокировки
+    после другого, видит уже примененные миграции и не повторяет их.
+
+    Args:
+        engine: Движок SQLAlchemy.
+        metadata: Метаданные моделей SQLAlchemy (актуальная схема).
+
+    Returns:
+        Версия схемы после применения миграций.
+    """
+    with _migrations_lock(engine):
+        return _apply_migrations(engine, metadata)
+
+
+def _apply_migrations(engine: Engine, metadata: MetaData) -> int:
+    """Применение миграций (вызывается под блокировкой миграций).
+
+    Args:
+        engine: Движок SQLAlchemy.
+        metadata: Метаданные моделей SQLAlchemy (актуальная схема).
+
+    Returns:
+        Версия схемы после применения миграций.
+    """
+    tracked = inspect(engine).has_table(_schema_migrations.name)
+    version = get_schema_version(engine)
+    _schema_migrations.create(engine, checkfirst=True)
+
+    def record(connection: Connection, migration_version: int, name: str) -> None:
+        connection.execute(
+            _schema_migrations.insert().values(version=migration_version, name=name, applied_at=datetime.utcnow())
+        )
+
+    if version == 0:
+        with engine.begin() as connection:
+            metadata.create_all(connection)
+            record(connection, LATEST_VERSION, "initial")
+        logger.info(f"Схема метаданных создана (версия {LATEST_VERSION})")
+        return LATEST_VERSION
+
+    if not tracked:
+        with engine.begin() as connection:
+            record(connection, 1, "baseline")
+
+    for migration_version in sorted(MIGRATIONS):
+        if migration_version <= version:
+            continue
+        name, migrate = MIGRATIONS[migration_version]
+        logger.info(f"Применение миграции схемы метаданных {migration_version}: {name}")
+        with engine.begin() as connection:
+            migrate(connection, metadata)
+            record(connection, migration_version, name)
+        version = migration_version
+
+    # Таблицы, добавленные в модели без миграций
+    metadata.create_all(engine, checkfirst=True)
+    return version
@@ -0,0 +1,282 @@
+"""Общий интерфейс векторных хранилищ и выбор реализации по настройкам.
+
+Реализации:
+
+- "qdrant" — VectorStore, удаленный Qdrant;
+- "local" — LocalVectorStore, встроенный индекс в процессе (матрица векторов
+  в memory-mapped файле), без внешних сервисов.
+"""
+
+import hashlib
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+import numpy as np
+
+from dt_xml.config.models import DeclarationChunk
+from dt_xml.config.settings import get_settings
+from dt_xml.runtime.executors import get_search_executor, run_in_executor
+
+logger = logging.getLogger(__name__)
+
+# Отсутствующее значение в колонке payload (поле не записывается в точку)
+MISSING = object()
+
+VECTOR_BACKENDS = ("qdrant", "local")
+
+
+class VectorBackend(ABC):
+    """Базовый класс векторного хранилища.
+
+    Реализации определяют запись точек (upsert_arrays), поиск, удаление и
+    получение хэшей проиндексированных чанков; преобразование чанков в точки
+    и сравнение при переиндексации общие.
+    """
+
+    def add_chunks(
+        self,
+        chunks: list[DeclarationChunk],
+        embeddings: list[np.ndarray] | np.ndarray,
+        wait: bool = True,
+    ) -> None:
+        """Добавление чанков с эмбедингами в хранилище.
+
+        Args:
+            chunks: Список чанков деклараций.
+            embeddings: Эмбединги чанков (список векторов или матрица).
+            wait: Дождаться применения записи (барьер согласованности).
+        """
+        if len(chunks) != len(embeddings):
+            raise ValueError("Количество чанков и эмбедингов должно совпадать")
+
+        if not chunks:
+            return
+
+        # Колонки payload: общие поля чанков и поля метаданных
+        payload_columns: dict[str, list[Any]] = {
+            "declaration_id": [chunk.declaration_id for chunk in chunks],
+            "chunk_id": [chunk.chunk_id for chunk in chunks],
+            "content": [chunk.content for chunk in chunks],
+            "section": [chunk.section for chunk in chunks],
+            "chunk_index": [chunk.chunk_index for chunk in chunks],
+            "content_hash": [self.content_hash(chunk) for chunk in chunks],
+        }
+        for i, chunk in enumerate(chunks):
+            for key, value in chunk.metadata.items():
+                payload_columns.setdefault(key, [MISSING] * len(chunks))[i] = value
+
+        self.upsert_arrays(
+            ids=[self.point_id(chunk.chunk_id) for chunk in chunks],
+            vectors=np.asarray(embeddings, dtype=np.float32),
+            payload_columns=payload_columns,
+            wait=wait,
+        )
+
+        logger.info(f"Добавлено {len(chunks)} чанков в векторное хранилище")
+
+    @staticmethod
+    def point_id(chunk_id: str) -> str:
+        """Идентификатор точки для чанка.
+
+        UUID чанка используется как есть, прочие идентификаторы переводятся
+        в UUIDv5, чтобы одинаковый чанк всегда попадал в одну точку.
+
+        Args:
+            chunk_id: Идентификатор чанка.
+
+        Returns:
+            Идентификатор точки (UUID в строковом виде).
+        """
+        try:
+            return str(uuid.UUID(chunk_id))
+        except ValueError:
+            return str(uuid.uuid5(uuid.NAMESPACE_OID, chunk_id))
+
+    @staticmethod
+    def content_hash(chunk: DeclarationChunk) -> str:
+        """Хэш содержимого чанка, от которого зависят вектор и payload точки.
+
+        Args:
+            chunk: Чанк декларации.
+
+        Returns:
+            Хэш в шестнадцатеричном виде.
+        """
+        content = json.dumps(
+            [chunk.content, chunk.section, chunk.chunk_index, chunk.metadata],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    def diff_chunks(
+        self,
+        chunks: list[DeclarationChunk],
+        existing: dict[int | str, str | None],
+    ) -> tuple[list[DeclarationChunk], list[int | str]]:
+        """Сравнение новых чанков декларации с проиндексированными.
+
+        Args:
+            chunks: Новые чанки декларации.
+            existing: Проиндексированные точки декларации (см. get_chunk_hashes).
+
+        Returns:
+            Кортеж (новые и измененные чанки, идентификаторы устаревших точек).
+        """
+        changed: list[DeclarationChunk] = []
+        current: set[int | str] = set()
+        for chunk in chunks:
+            point_id = self.point_id(chunk.chunk_id)
+            current.add(point_id)
+            if existing.get(point_id) != self.content_hash(chunk):
+                changed.append(chunk)
+
+        stale = [point_id for point_id in existing if point_id not in current]
+        return changed, stale
+
+    @abstractmethod
+    def upsert_arrays(
+        self,
+        ids: Sequence[int | str],
+        vectors: np.ndarray,
+        payload_columns: Mapping[str, Sequence[Any]] | None = None,
+        wait: bool = True,
+    ) -> None:
+        """Массовая запись точек из матрицы векторов и колонок payload.
+
+        Args:
+            ids: Идентификаторы точек.
+            vectors: Матрица векторов (N x vector_size).
+            payload_columns: Колонки payload: поле → значения в порядке точек.
+                Значения MISSING в колонке пропускаются.
+            wait: Дождаться применения записи.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 10,
+        filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Поиск похожих векторов.
+
+        Args:
+            query_embedding: Эмбединг запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Список результатов поиска с метаданными.
+        """
+
+    async def asearch(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 10,
+        filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Асинхронный поиск похожих векторов (в пуле потоков поиска).
+
+        Args:
+            query_embedding: Эмбединг запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Список результатов поиска с метаданными.
+        """
+        return await run_in_executor(get_search_executor(), self.search, query_embedding, top_k, filters)
+
+    async def aclose(self) -> None:  # noqa: B027 — хранилищу может быть нечего освобождать
+        """Освобождение ресурсов хранилища."""
+
+    @abstractmethod
+    def get_chunk_hashes(self, declaration_ids: list[str]) -> dict[str, dict[int | str, str | None]]:
+        """Хэши содержимого проиндексированных чанков деклараций.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+
+        Returns:
+            Словарь declaration_id → {идентификатор точки: хэш содержимого}.
+            Для точек, записанных без хэша, значение None.
+        """
+
+    @abstractmethod
+    def delete_points(self, point_ids: list[int | str]) -> None:
+        """Удаление точек по идентификаторам.
+
+        Args:
+            point_ids: Идентификаторы точек.
+        """
+
+    def delete_by_declaration_id(self, declaration_id: str) -> None:
+        """Удаление всех чанков декларации.
+
+        Args:
+            declaration_id: Идентификатор декларации.
+        """
+        self.delete_by_declaration_ids([declaration_id])
+
+    @abstractmethod
+    def delete_by_declaration_ids(self, declaration_ids: Sequence[str]) -> None:
+        """Массовое удаление всех чанков деклараций.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+        """
+
+    @abstractmethod
+    def get_collection_info(self) -> dict[str, Any]:
+        """Получение информации о коллекции.
+
+        Returns:
+            Словарь с информацией о коллекции.
+        """
+
+    @staticmethod
+    def make_result(payload: dict[str, Any], score: float) -> dict[str, Any]:
+        """Результат поиска по payload точки.
+
+        Args:
+            payload: Payload точки.
+            score: Скор близости.
+
+        Returns:
+            Результат поиска с метаданными.
+        """
+        return {
+            "chunk_id": payload.get("chunk_id"),
+            "declaration_id": payload.get("declaration_id"),
+            "content": payload.get("content"),
+            "section": payload.get("section"),
+            "score": score,
+            "metadata": {k: v for k, v in payload.items() if k not in ["content", "content_hash"]},
+        }
+
+
+def create_vector_store() -> VectorBackend:
+    """Создание векторного хранилища по настройке vector_db.type.
+
+    Возвращается общий экземпляр: локальное хранилище держит индекс в памяти
+    процесса, а хранилище Qdrant — пулы соединений клиентов.
+
+    Returns:
+        Векторное хранилище.
+    """
+    backend = get_settings().vector_db.type
+    if backend == "qdrant":
+        from dt_xml.storage.vector_store import get_vector_store
+
+        return get_vector_store()
+    if backend == "local":
+        from dt_xml.storage.local_vector_store import get_local_vector_store
+
+        return get_local_vector_store()
+    raise ValueError(f"Неизвестный тип векторного хранилища: {backend}. Допустимые: {', '.join(VECTOR_BACKENDS)}")
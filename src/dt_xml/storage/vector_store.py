@@ -1,38 +1,82 @@
 """Интерфейс к векторной базе данных."""
 
 import logging
-from typing import Any
+from collections.abc import Iterator, Mapping, Sequence
+from datetime import date
+from functools import lru_cache
+from typing import Any, cast
 
 import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
-
-from dt_xml.config.models import DeclarationChunk
-from dt_xml.config.settings import get_settings
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    Batch,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    DatetimeRange,
+    Distance,
+    ExtendedPointId,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HnswConfigDiff,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    QuantizationSearchParams,
+    Range,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    ScoredPoint,
+    SearchParams,
+    VectorParams,
+)
+
+from dt_xml.config.settings import Settings, get_settings
+from dt_xml.storage.vector_backend import MISSING, VectorBackend
 
 logger = logging.getLogger(__name__)
 
+class VectorStore(VectorBackend):
+    """Хранилище векторов для эмбедингов в Qdrant."""
 
-class VectorStore:
-    """Хранилище векторов для эмбедингов."""
+    def __init__(
+        self,
+        client: QdrantClient | None = None,
+        async_client: AsyncQdrantClient | None = None,
+        settings: Settings | None = None,
+        collection_name: str | None = None,
+        vector_size: int | None = None,
+    ):
+        """Инициализация хранилища векторов.
 
-    def __init__(self):
-        """Инициализация хранилища векторов."""
-        self.settings = get_settings()
-        self.client: QdrantClient | None = None
-        self.collection_name = self.settings.vector_db.collection_name
-        self.vector_size = self.settings.vector_db.vector_size
+        Args:
+            client: Клиент Qdrant. Если None, подключение по настройкам vector_db.
+            async_client: Асинхронный клиент Qdrant. Если None, создается
+                при первом асинхронном запросе.
+            settings: Настройки приложения. Если None, общие настройки процесса.
+            collection_name: Имя коллекции. Если None, из настроек.
+            vector_size: Размерность векторов. Если None, из настроек.
+        """
+        self.settings = settings or get_settings()
+        self.client = client
+        self.async_client = async_client
+        self.collection_name = collection_name or self.settings.vector_db.collection_name
+        self.vector_size = vector_size or self.settings.vector_db.vector_size
         self._connect()
 
     def _connect(self) -> None:
         """Подключение к векторной базе данных."""
         try:
-            self.client = QdrantClient(
-                host=self.settings.vector_db.host,
-                port=self.settings.vector_db.port,
-                grpc_port=self.settings.vector_db.grpc_port,
-            )
-            logger.info("Подключение к Qdrant установлено")
+            if self.client is None:
+                self.client = QdrantClient(
+                    host=self.settings.vector_db.host,
+                    port=self.settings.vector_db.port,
+                    grpc_port=self.settings.vector_db.grpc_port,
+                    prefer_grpc=self.settings.vector_db.prefer_grpc,
+                )
+                logger.info("Подключение к Qdrant установлено")
             self._ensure_collection()
         except Exception as e:
             logger.error(f"Ошибка при подключении к Qdrant: {e}")
@@ -49,78 +93,318 @@ class VectorStore:
 
             if self.collection_name not in collection_names:
                 logger.info(f"Создание коллекции {self.collection_name}")
+                hnsw = self.settings.vector_db.hnsw
                 self.client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
                         distance=Distance.COSINE,
+                        on_disk=self.settings.vector_db.on_disk_vectors,
                     ),
+                    hnsw_config=HnswConfigDiff(
+                        m=hnsw.get("m"),
+                        ef_construct=hnsw.get("ef_construct"),
+                        on_disk=hnsw.get("on_disk"),
+                    ),
+                    quantization_config=self._quantization_config(),
                 )
                 logger.info(f"Коллекция {self.collection_name} создана")
             else:
                 logger.info(f"Коллекция {self.collection_name} уже существует")
+
+            self._ensure_payload_indexes()
         except Exception as e:
             logger.error(f"Ошибка при создании коллекции: {e}")
             raise
 
-    def add_chunks(
+    def _quantization_config(self) -> ScalarQuantization | BinaryQuantization | None:
+        """Конфигурация квантизации векторов коллекции.
+
+        Returns:
+            Конфигурация квантизации или None, если квантизация отключена.
+        """
+        quantization = self.settings.vector_db.quantization
+        quantization_type = quantization.get("type", "none")
+        always_ram = quantization.get("always_ram", True)
+
+        if quantization_type == "none":
+            return None
+        if quantization_type == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=quantization.get("quantile"),
+                    always_ram=always_ram,
+                )
+            )
+        if quantization_type == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=always_ram))
+        raise ValueError(f"Неизвестный тип квантизации: {quantization_type}. Допустимые: none, scalar, binary")
+
+    def _search_params(self) -> SearchParams:
+        """Параметры поиска: ширина поиска HNSW и пересчет скоров квантованных векторов.
+
+        Returns:
+            Параметры поиска Qdrant.
+        """
+        quantization = self.settings.vector_db.quantization
+        quantization_params = None
+        if quantization.get("type", "none") != "none":
+            quantization_params = QuantizationSearchParams(
+                rescore=quantization.get("rescore", True),
+                oversampling=quantization.get("oversampling"),
+            )
+        return SearchParams(hnsw_ef=self.settings.vector_db.hnsw.get("ef"), quantization=quantization_params)
+
+    def _payload_index_fields(self) -> dict[str, PayloadSchemaType]:
+        """Поля payload, по которым строятся индексы.
+
+        Returns:
+            Словарь поле → тип индекса.
+        """
+        fields = {"declaration_id": PayloadSchemaType.KEYWORD}
+
+        metadata_filters = self.settings.search.metadata_filters
+        if metadata_filters.get("enabled", True):
+            field_types = metadata_filters.get("field_types", {})
+            for field in metadata_filters.get("fields", []):
+                field_type = field_types.get(field, "keyword")
+                try:
+                    fields[field] = PayloadSchemaType(field_type)
+                except ValueError as e:
+                    raise ValueError(f"Неизвестный тип payload индекса для поля {field}: {field_type}") from e
+
+        return fields
+
+    def _ensure_payload_indexes(self) -> None:
+        """Создание недостающих payload индексов.
+
+        С индексами Qdrant применяет фильтры внутри HNSW (filterable HNSW)
+        вместо полного перебора точек.
+        """
+        if self.client is None:
+            raise RuntimeError("Клиент Qdrant не инициализирован")
+
+        existing = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field, schema in self._payload_index_fields().items():
+            if field in existing:
+                continue
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field,
+                field_schema=schema,
+            )
+            logger.info(f"Создан payload индекс {field} ({schema.value})")
+
+    def get_chunk_hashes(self, declaration_ids: list[str]) -> dict[str, dict[int | str, str | None]]:
+        """Хэши содержимого проиндексированных чанков деклараций.
+
+        Args:
+            declaration_ids: Идентификаторы деклараций.
+
+        Returns:
+            Словарь declaration_id → {идентификатор точки: хэш содержимого}.
+            Для точек, записанных без хэша, значение None.
+        """
+        if self.client is None:
+            raise RuntimeError("Клиент Qdrant не инициализирован")
+
+        hashes: dict[str, dict[int | str, str | None]] = {}
+        if not declaration_ids:
+            return hashes
+
+        scroll_filter = Filter(
+            must=[FieldCondition(key="declaration_id", match=MatchAny(any=list(declaration_ids)))]
+        )
+        offset = None
+        try:
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=scroll_filter,
+                    limit=1000,
+                    offset=offset,
+                    with_payload=["declaration_id", "content_hash"],
+                    with_vectors=False,
+                )
+                for point in points:
+                    payload = point.payload or {}
+                    point_id = point.id if isinstance(point.id, int) else str(point.id)
+                    hashes.setdefault(payload["declaration_id"], {})[point_id] = payload.get("content_hash")
+                if offset is None:
+                    return hashes
+        except Exception as e:
+            logger.error(f"Ошибка при получении проиндексированных чанков: {e}")
+            raise
+
+    def delete_points(self, point_ids: list[int | str]) -> None:
+        """Удаление точек по идентификаторам.
+
+        Args:
+            point_ids: Идентификаторы точек.
+        """
+        if self.client is None:
+            raise RuntimeError("Клиент Qdrant не инициализирован")
+
+        if not point_ids:
+            return
+
+        try:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=list(point_ids)),
+            )
+            logger.info(f"Удалено {len(point_ids)} устаревших чанков из векторного хранилища")
+        except Exception as e:
+            logger.error(f"Ошибка при удалении чанков: {e}")
+            raise
+
+    def upsert_arrays(
         self,
-        chunks: list[DeclarationChunk],
-        embeddings: list[np.ndarray],
+        ids: Sequence[int | str],
+        vectors: np.ndarray,
+        payload_columns: Mapping[str, Sequence[Any]] | None = None,
+        wait: bool = True,
     ) -> None:
-        """Добавление чанков с эмбедингами в хранилище.
+        """Массовая запись точек из матрицы векторов и колонок payload.
+
+        Небольшие записи (до vector_db.upload_parallel_min_points точек — запрос
+        /index, разница чанков при переиндексации) отправляются батчами через
+        upsert в текущем процессе с ожиданием только последнего батча. Массовая
+        загрузка идет через upload_collection с vector_db.upload_parallel
+        процессами-воркерами клиента Qdrant. В обоих случаях векторы передаются
+        клиенту матрицей, без преобразования в списки.
 
         Args:
-            chunks: Список чанков деклараций.
-            embeddings: Список эмбедингов для чанков.
+            ids: Идентификаторы точек.
+            vectors: Матрица векторов (N x vector_size).
+            payload_columns: Колонки payload: поле → значения в порядке точек.
+                Значения MISSING в колонке пропускаются.
+            wait: Дождаться применения записи.
         """
         if self.client is None:
             raise RuntimeError("Клиент Qdrant не инициализирован")
 
-        if len(chunks) != len(embeddings):
-            raise ValueError("Количество чанков и эмбедингов должно совпадать")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_size:
+            raise ValueError(
+                f"Ожидается матрица векторов размерности N x {self.vector_size}, получено {vectors.shape}"
+            )
 
-        try:
-            points = []
-            for chunk, embedding in zip(chunks, embeddings):
-                # Преобразование numpy array в список
-                if isinstance(embedding, np.ndarray):
-                    embedding_list = embedding.tolist()
-                else:
-                    embedding_list = list(embedding)
-
-                # Подготовка метаданных
-                payload = {
-                    "declaration_id": chunk.declaration_id,
-                    "chunk_id": chunk.chunk_id,
-                    "content": chunk.content,
-                    "section": chunk.section,
-                    "chunk_index": chunk.chunk_index,
-                    **chunk.metadata,
+        count = len(vectors)
+        payload_columns = payload_columns or {}
+        if len(ids) != count or any(len(column) != count for column in payload_columns.values()):
+            raise ValueError("Количество идентификаторов, векторов и значений payload должно совпадать")
+
+        if count == 0:
+            return
+
+        def payload_rows(start: int, stop: int) -> Iterator[dict[str, Any]]:
+            for i in range(start, stop):
+                yield {
+                    key: column[i] for key, column in payload_columns.items() if column[i] is not MISSING
                 }
 
-                point = PointStruct(
-                    id=hash(chunk.chunk_id) % (2**63),  # Qdrant требует int64 ID
-                    vector=embedding_list,
-                    payload=payload,
+        point_ids: list[ExtendedPointId] = list(ids)
+        batch_size = max(self.settings.vector_db.upload_batch_size, 1)
+
+        try:
+            if count >= self.settings.vector_db.upload_parallel_min_points:
+                self.client.upload_collection(
+                    collection_name=self.collection_name,
+                    vectors=vectors,
+                    payload=payload_rows(0, count),
+                    ids=point_ids,
+                    batch_size=batch_size,
+                    parallel=self.settings.vector_db.upload_parallel,
+                    wait=wait,
                 )
-                points.append(point)
+                return
 
-            # Вставка точек батчами
-            batch_size = 100
-            for i in range(0, len(points), batch_size):
-                batch = points[i : i + batch_size]
+            # Промежуточные батчи не ждут применения: Qdrant применяет записи
+            # коллекции по порядку, поэтому достаточно дождаться последнего
+            for start in range(0, count, batch_size):
+                stop = min(start + batch_size, count)
                 self.client.upsert(
                     collection_name=self.collection_name,
-                    points=batch,
+                    points=Batch(
+                        ids=point_ids[start:stop],
+                        # Модель Batch принимает матрицу numpy, хотя аннотирована списками
+                        vectors=cast(Any, vectors[start:stop]),
+                        payloads=list(payload_rows(start, stop)),
+                    ),
+                    wait=wait and stop == count,
                 )
 
-            logger.info(f"Добавлено {len(chunks)} чанков в векторное хранилище")
-
         except Exception as e:
-            logger.error(f"Ошибка при добавлении чанков: {e}")
+            logger.error(f"Ошибка при массовой записи точек: {e}")
             raise
 
+    def _get_async_client(self) -> AsyncQdrantClient:
+        """Получение асинхронного клиента Qdrant (создается при первом обращении).
+
+        Returns:
+            Асинхронный клиент Qdrant.
+        """
+        if self.async_client is None:
+            self.async_client = AsyncQdrantClient(
+                host=self.settings.vector_db.host,
+                port=self.settings.vector_db.port,
+                grpc_port=self.settings.vector_db.grpc_port,
+                prefer_grpc=self.settings.vector_db.prefer_grpc,
+            )
+        return self.async_client
+
+    @staticmethod
+    def _build_filter(filters: dict[str, Any] | None) -> Filter | None:
+        """Построение фильтра Qdrant по метаданным.
+
+        Args:
+            filters: Фильтры по метаданным.
+
+        Returns:
+            Фильтр Qdrant или None.
+        """
+        if not filters:
+            return None
+
+        conditions = []
+        for key, value in filters.items():
+            if isinstance(value, dict):
+                # Диапазоны и операторы (как в MetadataFilter)
+                if "eq" in value:
+                    conditions.append(FieldCondition(key=key, match=MatchValue(value=value["eq"])))
+                bounds = {op: value[op] for op in ("gt", "gte", "lt", "lte") if op in value}
+                if bounds:
+                    numeric = all(
+                        isinstance(bound, int | float) and not isinstance(bound, bool) for bound in bounds.values()
+                    )
+                    conditions.append(
+                        FieldCondition(key=key, range=Range(**bounds) if numeric else DatetimeRange(**bounds))
+                    )
+            elif isinstance(value, list):
+                # Список допустимых значений
+                conditions.append(FieldCondition(key=key, match=MatchAny(any=value)))
+            elif isinstance(value, date):
+                # Точная дата
+                conditions.append(FieldCondition(key=key, range=DatetimeRange(gte=value, lte=value)))
+            else:
+                conditions.append(FieldCondition(key=key, match=MatchValue(value=value)))
+
+        return Filter(must=conditions) if conditions else None
+
+    @staticmethod
+    def _to_results(points: list[ScoredPoint]) -> list[dict[str, Any]]:
+        """Преобразование найденных точек в результаты поиска.
+
+        Args:
+            points: Точки, найденные Qdrant.
+
+        Returns:
+            Список результатов поиска с метаданными.
+        """
+        return [VectorBackend.make_result(point.payload or {}, point.score) for point in points]
+
     def search(
         self,
         query_embedding: np.ndarray,
@@ -141,92 +425,87 @@ class VectorStore:
             raise RuntimeError("Клиент Qdrant не инициализирован")
 
         try:
-            # Преобразование numpy array в список
-            if isinstance(query_embedding, np.ndarray):
-                query_vector = query_embedding.tolist()
-            else:
-                query_vector = list(query_embedding)
+            response = self.client.query_points(
+                collection_name=self.collection_name,
+                query=np.asarray(query_embedding, dtype=np.float32).tolist(),
+                limit=top_k,
+                query_filter=self._build_filter(filters),
+                search_params=self._search_params(),
+                with_payload=True,
+            )
+            return self._to_results(response.points)
 
-            # Построение фильтров для Qdrant
-            qdrant_filter = None
-            if filters:
-                from qdrant_client.models import Filter, FieldCondition, MatchValue
+        except Exception as e:
+            logger.error(f"Ошибка при поиске: {e}")
+            raise
 
-                conditions = []
-                for key, value in filters.items():
-                    conditions.append(
-                        FieldCondition(
-                            key=f"payload.{key}",
-                            match=MatchValue(value=value),
-                        )
-                    )
+    async def asearch(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 10,
+        filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Асинхронный поиск похожих векторов.
 
-                if conditions:
-                    qdrant_filter = Filter(must=conditions)
+        Args:
+            query_embedding: Эмбединг запроса.
+            top_k: Количество результатов.
+            filters: Фильтры по метаданным.
 
-            # Поиск
-            search_results = self.client.search(
+        Returns:
+            Список результатов поиска с метаданными.
+        """
+        try:
+            response = await self._get_async_client().query_points(
                 collection_name=self.collection_name,
-                query_vector=query_vector,
+                query=np.asarray(query_embedding, dtype=np.float32).tolist(),
                 limit=top_k,
-                query_filter=qdrant_filter,
+                query_filter=self._build_filter(filters),
+                search_params=self._search_params(),
+                with_payload=True,
             )
-
-            # Преобразование результатов
-            results = []
-            for result in search_results:
-                results.append(
-                    {
-                        "chunk_id": result.payload.get("chunk_id"),
-                        "declaration_id": result.payload.get("declaration_id"),
-                        "content": result.payload.get("content"),
-                        "section": result.payload.get("section"),
-                        "score": result.score,
-                        "metadata": {k: v for k, v in result.payload.items() if k not in ["content"]},
-                    }
-                )
-
-            return results
+            return self._to_results(response.points)
 
         except Exception as e:
             logger.error(f"Ошибка при поиске: {e}")
             raise
 
-    def delete_by_declaration_id(self, declaration_id: str) -> None:
-        """Удаление всех чанков декларации.
+    async def aclose(self) -> None:
+        """Закрытие асинхронного клиента Qdrant."""
+        if self.async_client is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+    def delete_by_declaration_ids(self, declaration_ids: Sequence[str]) -> None:
+        """Массовое удаление всех чанков деклараций.
+
+        Точки удаляются на стороне Qdrant по фильтру (FilterSelector) без
+        предварительного чтения идентификаторов. Идентификаторы деклараций
+        передаются пачками по vector_db.delete_batch_size; промежуточные
+        запросы не ждут применения, последний выполняется с ожиданием.
 
         Args:
-            declaration_id: Идентификатор декларации.
+            declaration_ids: Идентификаторы деклараций.
         """
         if self.client is None:
             raise RuntimeError("Клиент Qdrant не инициализирован")
 
-        try:
-            from qdrant_client.models import Filter, FieldCondition, MatchValue
+        declaration_ids = list(dict.fromkeys(declaration_ids))
+        if not declaration_ids:
+            return
 
-            # Поиск всех точек с данным declaration_id
-            search_results = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="payload.declaration_id",
-                            match=MatchValue(value=declaration_id),
-                        )
-                    ]
-                ),
-                limit=10000,
-            )
-
-            # Удаление найденных точек
-            if search_results[0]:
-                point_ids = [point.id for point in search_results[0]]
-                if point_ids:
-                    self.client.delete(
-                        collection_name=self.collection_name,
-                        points_selector=point_ids,
-                    )
-                    logger.info(f"Удалено {len(point_ids)} чанков для декларации {declaration_id}")
+        batch_size = max(self.settings.vector_db.delete_batch_size, 1)
+        try:
+            for start in range(0, len(declaration_ids), batch_size):
+                batch = declaration_ids[start : start + batch_size]
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=FilterSelector(
+                        filter=Filter(must=[FieldCondition(key="declaration_id", match=MatchAny(any=batch))])
+                    ),
+                    wait=start + batch_size >= len(declaration_ids),
+                )
+            logger.info(f"Удалены чанки {len(declaration_ids)} деклараций из векторного хранилища")
 
         except Exception as e:
             logger.error(f"Ошибка при удалении чанков: {e}")
@@ -252,3 +531,9 @@ class VectorStore:
         except Exception as e:
             logger.error(f"Ошибка при получении информации о коллекции: {e}")
             return {}
+
+
+@lru_cache()
+def get_vector_store() -> VectorStore:
+    """Получить хранилище векторов Qdrant из настроек (singleton)."""
+    return VectorStore()
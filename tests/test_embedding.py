@@ -0,0 +1,126 @@
+"""Тесты модуля эмбедингов."""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from dt_xml.embedding.embedding_cache import EmbeddingCache
+from dt_xml.embedding.models import EmbeddingModelConfig
+from dt_xml.embedding.multilingual_embedder import MultilingualEmbedder
+from dt_xml.embedding.query_cache import QueryEmbeddingCache
+
+
+def test_embedding_cache_lru_and_persistence(tmp_path):
+    """Кэш вытесняет давно не использованные записи и переживает перезапуск."""
+    cache = EmbeddingCache(tmp_path, dimension=4, model_name="m", max_length=512,
+                           normalize_embeddings=True, max_entries=2)
+
+    cache.put_many(["a", "b"], [np.ones(4), np.zeros(4)])
+    cache.get_many(["a"])
+    cache.put_many(["c"], [np.full(4, 2.0)])  # вытесняет "b"
+    cache.flush()
+
+    a, b, c = cache.get_many(["a", "b", "c"])
+    assert a is not None and np.allclose(a, 1.0)
+    assert b is None
+    assert c is not None and np.allclose(c, 2.0)
+    assert cache.get_stats()["evictions"] == 1
+    cache.close()
+
+    reopened = EmbeddingCache(tmp_path, dimension=4, model_name="m", max_length=512,
+                              normalize_embeddings=True, max_entries=2)
+    assert reopened.get_many(["c"])[0] is not None
+    reopened.close()
+
+    # Другие параметры модели дают другие ключи
+    other = EmbeddingCache(tmp_path, dimension=4, model_name="other", max_length=512,
+                           normalize_embeddings=True, max_entries=2)
+    assert other.get_many(["c"])[0] is None
+
+
+def test_embedding_cache_never_overwrites_persisted_slots(tmp_path):
+    """Индекс на диске всегда указывает на свои векторы; второй процесс получает свою директорию."""
+    cache = EmbeddingCache(tmp_path, dimension=4, model_name="m", max_length=512,
+                           normalize_embeddings=True, max_entries=2, flush_every=100)
+    cache.put_many(["a", "b"], [np.ones(4), np.zeros(4)])
+    cache.flush()
+    cache.put_many(["c"], [np.full(4, 2.0)])  # вытесняет "a" без сброса "c"
+
+    # Состояние на диске, как после сбоя процесса до сброса
+    entries = dict(json.loads((tmp_path / EmbeddingCache.INDEX_FILE).read_text())["entries"])
+    vectors = np.memmap(tmp_path / EmbeddingCache.VECTORS_FILE, dtype=np.float32, mode="r", shape=(2, 4))
+    assert entries == {cache.make_key("b"): entries[cache.make_key("b")]}
+    assert np.allclose(vectors[entries[cache.make_key("b")]], 0.0)
+
+    other = EmbeddingCache(tmp_path, dimension=4, model_name="m", max_length=512,
+                           normalize_embeddings=True, max_entries=2)
+    assert other.path == tmp_path / "worker-1"
+    other.close()
+    cache.close()
+
+
+def test_query_cache_coalesces_concurrent_queries():
+    """Одинаковые одновременные запросы кодируются одним вызовом модели."""
+    calls: list[str] = []
+    release = threading.Event()
+
+    def embed(text: str) -> np.ndarray:
+        calls.append(text)
+        release.wait(timeout=1)
+        return np.ones(4)
+
+    cache = QueryEmbeddingCache(embed, max_entries=10, ttl_seconds=60)
+
+    queries = ["Смартфоны  Samsung", " Смартфоны Samsung\n"] * 2
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(cache.get, q) for q in queries]
+        release.set()
+        vectors = [future.result() for future in futures]
+
+    assert calls == ["Смартфоны Samsung"]
+    assert all(np.allclose(vector, 1.0) for vector in vectors)
+    assert cache.get_stats()["misses"] == 1
+
+    # Регистр входит в ключ: модель получает ровно тот текст, по которому закэширован вектор
+    cache.get("смартфоны samsung")
+    assert calls[-1] == "смартфоны samsung"
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_embed_batch_buckets_by_token_length():
+    """embed_batch группирует тексты по длине в пределах бюджета токенов и сохраняет порядок."""
+    batch_sizes: list[list[int]] = []
+
+    class FakeModel:
+        max_seq_length = 512
+
+        def tokenizer(self, texts, **kwargs):
+            return {"input_ids": [text.split() for text in texts]}
+
+        def encode(self, texts, batch_size, **kwargs):
+            batch_sizes.append([len(text.split()) for text in texts])
+            return np.array([[len(text.split()), 0.0] for text in texts], dtype=np.float32)
+
+    embedder = MultilingualEmbedder.__new__(MultilingualEmbedder)
+    embedder.config = EmbeddingModelConfig()
+    embedder.config.token_budget = 100
+    embedder.model = FakeModel()
+    embedder.cache = None
+    embedder.real_tokens = embedder.padded_tokens = 0
+
+    lengths = [5, 60, 3, 40, 4, 6]
+    embeddings = embedder.embed_batch([" ".join(["w"] * n) for n in lengths])
+
+    assert [int(e[0]) for e in embeddings] == lengths
+    assert batch_sizes == [[60], [40, 6], [5, 4, 3]]
+    for batch in batch_sizes:
+        assert max(batch) * len(batch) <= 100
+
+    # Без явного batch_size размер группы ограничен конфигурацией
+    batch_sizes.clear()
+    embedder.config.batch_size = 2
+    embedder.embed_batch([" ".join(["w"] * n) for n in lengths])
+    assert batch_sizes == [[60], [40, 6], [5, 4], [3]]
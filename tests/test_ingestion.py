@@ -0,0 +1,104 @@
+"""Тесты конвейера индексации."""
+
+import threading
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from dt_xml.ingestion.pipeline import IngestionPipeline
+from dt_xml.search.bm25_index import BM25Index
+from dt_xml.search.sparse_search import SparseSearch
+from dt_xml.storage.document_store import DocumentStore
+from dt_xml.storage.local_vector_store import LocalVectorStore
+from dt_xml.storage.metadata_store import MetadataStore
+
+DECLARATION_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<declaration>
+    <declaration_number>{number}</declaration_number>
+    <date_issued>2024-03-{day:02d}</date_issued>
+    <declaration_type>import</declaration_type>
+    <manufacturer>Samsung</manufacturer>
+    <product_code>8517120000</product_code>
+    <product_description>Смартфоны Samsung Galaxy партия {number}, мобильные телефоны для сетей сотовой связи,
+    в комплекте с зарядными устройствами и кабелями, упаковка индивидуальная</product_description>
+</declaration>
+"""
+
+
+class FakeEmbedder:
+    """Эмбеддер с детерминированными векторами без загрузки модели."""
+
+    def embed_batch(self, texts, batch_size=None):
+        return [np.array([len(text), 1.0, 0.0, 0.0], dtype=np.float32) for text in texts]
+
+
+def make_pipeline(tmp_path, pipeline_class=IngestionPipeline, **kwargs) -> IngestionPipeline:
+    """Конвейер с локальными хранилищами во временном каталоге."""
+    metadata_store = MetadataStore(engine=create_engine(f"sqlite:///{tmp_path / 'metadata.db'}"))
+    metadata_store.create_schema()
+    return pipeline_class(
+        workers=2,
+        embedder=FakeEmbedder(),
+        vector_store=LocalVectorStore(tmp_path / "vectors", vector_size=4),
+        metadata_store=metadata_store,
+        document_store=DocumentStore(tmp_path / "documents"),
+        sparse_search=SparseSearch(index=BM25Index(tmp_path / "bm25")),
+        **kwargs,
+    )
+
+
+def write_declarations(tmp_path, count: int) -> list:
+    """XML файлы деклараций во временном каталоге."""
+    files = []
+    for i in range(count):
+        file_path = tmp_path / f"decl_{i}.xml"
+        file_path.write_text(DECLARATION_XML.format(number=f"D{i}", day=i + 1), encoding="utf-8")
+        files.append(file_path)
+    return files
+
+
+def test_pipeline_indexes_files_end_to_end(tmp_path):
+    """Файлы проходят parse → embed → write и попадают во все хранилища."""
+    files = write_declarations(tmp_path, 4)
+    (tmp_path / "broken.xml").write_text("<declaration>", encoding="utf-8")
+    pipeline = make_pipeline(tmp_path, queue_size=2, embed_batch_size=3)
+
+    stats = pipeline.run([*files, tmp_path / "broken.xml"])
+
+    assert stats["parse"].items == 4 and stats["parse"].errors == 1
+    assert stats["write"].items == 4 and stats["write"].errors == 0
+    assert set(pipeline.vector_store.get_chunk_hashes([f"D{i}" for i in range(4)])) == {"D0", "D1", "D2", "D3"}
+    assert pipeline.metadata_store.get_metadata("D2").manufacturer == "Samsung"
+    assert {r["declaration_id"] for r in pipeline.sparse_search.search("galaxy", top_k=10)} == {
+        "D0",
+        "D1",
+        "D2",
+        "D3",
+    }
+
+
+def test_pipeline_stops_when_stage_fails(tmp_path):
+    """Падение стадии записи останавливает конвейер вместо зависания на полной очереди."""
+
+    class FailingWritePipeline(IngestionPipeline):
+        def _write_stage(self, write_queue):
+            self._get(write_queue)
+            raise OSError("диск недоступен")
+
+    files = write_declarations(tmp_path, 12)
+    pipeline = make_pipeline(tmp_path, FailingWritePipeline, queue_size=1, embed_batch_size=1)
+    errors: list[BaseException] = []
+
+    def run() -> None:
+        try:
+            pipeline.run(files)
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+    assert "write" in str(errors[0]) and isinstance(errors[0].__cause__, OSError)
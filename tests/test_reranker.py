@@ -0,0 +1,117 @@
+"""Тесты реранкинга."""
+
+import asyncio
+
+from dt_xml.reranker.adaptive_reranker import AdaptiveReranker
+from dt_xml.reranker.model_registry import RerankerModel, RerankerRegistry
+from dt_xml.reranker.score_cache import RerankScoreCache
+
+
+class FakeCrossEncoder:
+    """Модель, оценивающая документ по его длине."""
+
+    def predict(self, pairs, batch_size=16):
+        return [float(len(document)) for _, document in pairs]
+
+
+def test_registry_loads_each_model_once():
+    """Модель загружается один раз и накапливает статистику задержек."""
+    loaded: list[str] = []
+
+    def loader(name: str) -> FakeCrossEncoder:
+        loaded.append(name)
+        return FakeCrossEncoder()
+
+    registry = RerankerRegistry(loader=loader, batch_size=4)
+    registry.warmup(["small"])
+    registry.predict("small", [("q", "abc")])
+    registry.predict("small", [("q", "a"), ("q", "ab")])
+
+    assert loaded == ["small"]
+    stats = registry.get_stats()["small"]
+    assert stats["state"] == RerankerModel.READY
+    assert stats["calls"] == 3
+    assert stats["pairs"] == 4
+
+
+def test_adaptive_reranker_returns_input_positions():
+    """Результаты реранкинга ссылаются на позиции входных документов."""
+    reranker = AdaptiveReranker(registry=RerankerRegistry(loader=lambda name: FakeCrossEncoder()))
+
+    results = reranker.rerank("запрос", ["a", "abc", "ab"], top_k=2)
+
+    assert [r["index"] for r in results] == [1, 2]
+    assert [r["document"] for r in results] == ["abc", "ab"]
+
+
+async def test_registry_batches_concurrent_requests():
+    """Пары конкурентных запросов к одной модели оцениваются общими батчами."""
+    registry = RerankerRegistry(
+        loader=lambda name: FakeCrossEncoder(), max_batch_size=64, max_wait_ms=50
+    )
+
+    scores = await asyncio.gather(
+        *(registry.apredict("small", [("q", "a" * (i + 1)), ("q", "b")]) for i in range(8))
+    )
+    registry.close()
+
+    assert [score.tolist() for score in scores] == [[float(i + 1), 1.0] for i in range(8)]
+    stats = registry.get_stats()["small"]
+    assert stats["pairs"] == 16
+    assert stats["calls"] < 8
+
+
+def test_adaptive_reranker_scores_only_cache_misses():
+    """Повторные пары берутся из кэша скоров, модель получает только промахи."""
+    predicted: list[str] = []
+
+    class CountingCrossEncoder(FakeCrossEncoder):
+        def predict(self, pairs, batch_size=16):
+            predicted.extend(document for _, document in pairs)
+            return super().predict(pairs, batch_size)
+
+    reranker = AdaptiveReranker(
+        registry=RerankerRegistry(loader=lambda name: CountingCrossEncoder()),
+        score_cache=RerankScoreCache(max_entries=100),
+    )
+
+    reranker.rerank("Телефоны", ["a", "abc"])
+    results = reranker.rerank("Телефоны", ["abc", "ab"])
+
+    assert predicted == ["a", "abc", "ab"]
+    assert [r["document"] for r in results] == ["abc", "ab"]
+    assert reranker.score_cache.get_stats()["hits"] == 1
+
+    # Модель оценивает запрос как есть, поэтому другой текст запроса — другой ключ
+    reranker.rerank("телефоны", ["abc"])
+    assert predicted[-1] == "abc"
+
+
+def test_cascade_sends_only_top_candidates_to_complex_model():
+    """В каскаде сложная модель оценивает только top-N кандидатов простой модели."""
+    scored: dict[str, list[str]] = {}
+
+    class NamedCrossEncoder:
+        def __init__(self, name):
+            self.name = name
+
+        def predict(self, pairs, batch_size=16):
+            scored.setdefault(self.name, []).extend(document for _, document in pairs)
+            # Сложная модель предпочитает короткие документы
+            sign = -1.0 if self.name == "complex" else 1.0
+            return [sign * len(document) for _, document in pairs]
+
+    reranker = AdaptiveReranker(
+        registry=RerankerRegistry(loader=NamedCrossEncoder),
+        score_cache=RerankScoreCache(max_entries=100),
+    )
+    reranker.settings = reranker.settings.model_copy(deep=True)
+    reranker.settings.reranker.adaptive.update(cascade=True, cascade_top_n=2, cascade_latency_budget_ms=0)
+    reranker.simple_model, reranker.complex_model = "simple", "complex"
+    reranker.complexity_analyzer.analyze = lambda query: 1.0
+
+    results = reranker.rerank("сложный запрос", ["a", "abcd", "ab", "abc"], top_k=4)
+
+    assert scored == {"simple": ["a", "abcd", "ab", "abc"], "complex": ["abcd", "abc"]}
+    assert [r["document"] for r in results] == ["abc", "abcd", "ab", "a"]
+    assert [r["model_used"] for r in results] == ["complex", "complex", "simple", "simple"]
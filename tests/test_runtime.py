@@ -0,0 +1,59 @@
+"""Тесты инфраструктуры выполнения."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from dt_xml.runtime.batching import MicroBatcher
+from dt_xml.runtime.onnx_backend import check_parity, load_model
+
+
+def test_micro_batcher_merges_requests():
+    """Элементы конкурентных запросов объединяются в батчи и возвращаются по запросам."""
+    calls: list[int] = []
+
+    def process(items: list[int]) -> list[int]:
+        calls.append(len(items))
+        return [item * 10 for item in items]
+
+    batcher: MicroBatcher[int, int] = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(batcher.process, [i, i + 100]) for i in range(4)]
+        results = [future.result() for future in futures]
+
+    batcher.close()
+
+    assert results == [[i * 10, (i + 100) * 10] for i in range(4)]
+    assert sum(calls) == 8
+    assert len(calls) < 4
+
+
+def test_micro_batcher_propagates_errors():
+    """Ошибка обработки батча передается ожидающим запросам."""
+
+    def process(items: list[int]) -> list[int]:
+        raise ValueError("boom")
+
+    batcher: MicroBatcher[int, int] = MicroBatcher(process, max_batch_size=4, max_wait_ms=1)
+    future = batcher.submit([1])
+
+    with pytest.raises(ValueError):
+        future.result()
+
+    batcher.close()
+
+
+def test_onnx_parity_metrics():
+    """Метрики паритета для эмбедингов и скоров."""
+    embeddings = np.array([[1.0, 0.0], [0.6, 0.8]])
+    metrics = check_parity(lambda x: embeddings, lambda x: embeddings * 2.0, ["a", "b"])
+    assert metrics["min_cosine"] == pytest.approx(1.0)
+
+    metrics = check_parity(lambda x: [3.0, 1.0, 2.0], lambda x: [2.9, 1.2, 1.1], ["a", "b", "c"])
+    assert metrics["max_abs_diff"] == pytest.approx(0.9)
+    assert metrics["order_agreement"] == pytest.approx(4 / 6)
+
+    with pytest.raises(ValueError):
+        load_model(object, "model", backend="tensorrt")
@@ -1,16 +1,22 @@
 """Тесты поиска."""
 
-import pytest
+import asyncio
+import threading
+
 import numpy as np
+import pytest
 
-from dt_xml.search.sparse_search import SparseSearch
+from dt_xml.config.models import DeclarationChunk
+from dt_xml.search.bm25_index import BM25Index, select_tiered_merge
 from dt_xml.search.dense_search import DenseSearch
 from dt_xml.search.hybrid_search import HybridSearch
+from dt_xml.search.sparse_search import SparseSearch
+from dt_xml.search.text_analyzer import TextAnalyzer
 
 
-def test_sparse_search():
+def test_sparse_search(tmp_path):
     """Тест BM25 поиска."""
-    search = SparseSearch()
+    search = SparseSearch(index=BM25Index(tmp_path / "bm25"))
     
     documents = [
         "Производитель Samsung, товар телефоны",
@@ -25,9 +31,262 @@ def test_sparse_search():
     assert results[0]["score"] > 0
 
 
+def test_bm25_index_incremental_and_persistent(tmp_path):
+    """Индекс BM25 поддерживает добавление, удаление и переживает перезапуск."""
+    index = BM25Index(tmp_path / "bm25", max_segments=2, merge_factor=2)
+
+    index.add_documents(
+        [
+            {"chunk_id": "a", "declaration_id": "d1", "content": "смартфоны Samsung Galaxy"},
+            {"chunk_id": "b", "declaration_id": "d1", "content": "планшеты Samsung"},
+        ]
+    )
+    index.commit()
+    index.add_documents([{"chunk_id": "c", "declaration_id": "d2", "content": "смартфоны Apple"}])
+    index.commit()
+
+    assert [r["chunk_id"] for r in index.search("apple", top_k=5)] == ["c"]
+
+    # Замена документа и удаление декларации
+    index.add_documents([{"chunk_id": "c", "declaration_id": "d2", "content": "ноутбуки Apple"}])
+    index.delete_by_declaration_id("d1")
+    index.commit()
+
+    reopened = BM25Index(tmp_path / "bm25", max_segments=2, merge_factor=2)
+    assert len(reopened) == 1
+    assert reopened.search("samsung", top_k=5) == []
+    assert [r["content"] for r in reopened.search("ноутбуки", top_k=5)] == ["ноутбуки Apple"]
+
+    reopened.merge(force=True)
+    assert len(list((tmp_path / "bm25").glob("seg_*"))) == 1
+    assert reopened.search("apple", top_k=5)[0]["chunk_id"] == "c"
+
+
+def test_bm25_search_within_declarations(tmp_path):
+    """Фильтр деклараций применяется до отбора top-k, а не к готовым результатам."""
+    index = BM25Index(tmp_path / "bm25")
+    index.add_documents(
+        [
+            {"chunk_id": f"x{i}", "declaration_id": f"X{i}", "content": "смартфоны смартфоны samsung"}
+            for i in range(20)
+        ]
+    )
+    index.commit()
+    index.add_documents([{"chunk_id": "a", "declaration_id": "A", "content": "смартфоны apple iphone ipad"}])
+
+    assert "a" not in [r["chunk_id"] for r in index.search("смартфоны", top_k=2)]
+    assert [r["chunk_id"] for r in index.search("смартфоны", top_k=2, declaration_ids={"A", "missing"})] == ["a"]
+    assert index.search("смартфоны", top_k=2, declaration_ids=set()) == []
+
+
+def test_bm25_index_two_writers(tmp_path):
+    """Два экземпляра индекса на одной директории не теряют записи друг друга."""
+    first = SparseSearch(index=BM25Index(tmp_path / "bm25"))
+    second = SparseSearch(index=BM25Index(tmp_path / "bm25"))
+
+    def chunk(declaration_id: str, content: str) -> DeclarationChunk:
+        return DeclarationChunk(
+            chunk_id=f"{declaration_id}-0", declaration_id=declaration_id, content=content, section="main", chunk_index=0
+        )
+
+    first.index_chunks([chunk("d1", "смартфоны Samsung")])
+    second.index_chunks([chunk("d2", "ноутбуки Apple")])
+    first.index_chunks([chunk("d3", "планшеты Lenovo")])
+
+    reopened = BM25Index(tmp_path / "bm25")
+    assert len(reopened) == 3
+    assert [r["chunk_id"] for r in reopened.search("apple", top_k=5)] == ["d2-0"]
+
+    # Изменения вне writer() поверх чужой записи не затирают ее молча
+    first.index.add_documents([{"chunk_id": "x", "declaration_id": "d4", "content": "принтеры"}])
+    second.index_chunks([chunk("d5", "мониторы")])
+    with pytest.raises(RuntimeError):
+        first.index.commit()
+
+
+def test_bm25_refresh_reopens_only_changed_segments(tmp_path):
+    """refresh() открывает только новые сегменты, поиск не ждет блокировку индекса."""
+    writer = BM25Index(tmp_path / "bm25")
+    for declaration_id in ("d1", "d2"):
+        writer.add_documents(
+            [{"chunk_id": f"{declaration_id}-{i}", "declaration_id": declaration_id, "content": f"смартфоны {i}"}
+             for i in range(3)]
+        )
+        writer.commit()
+
+    reader = BM25Index(tmp_path / "bm25")
+    opened = {segment.segment_id: segment for segment in reader._segments}
+    snapshot = reader._snapshot
+
+    with writer.writer():
+        writer.delete_documents(["d1-0"])
+        writer.add_documents([{"chunk_id": "d3-0", "declaration_id": "d3", "content": "ноутбуки"}])
+        writer.commit()
+
+    reader.refresh()
+    assert all(reader._get_segment(segment_id) is segment for segment_id, segment in opened.items())
+    assert len(reader._segments) == 3 and len(reader) == 6
+    assert "d1-0" not in {r["chunk_id"] for r in reader.search("смартфоны", top_k=10)}
+    assert [r["chunk_id"] for r in reader.search("ноутбуки", top_k=10)] == ["d3-0"]
+    # Ранее выданный снимок не меняется
+    assert "d1-0" in {snapshot.sources[0].document(i)["chunk_id"] for i in range(3)}
+    assert not snapshot.sources[0].deleted_mask().any()
+
+    held, release = threading.Event(), threading.Event()
+
+    def hold_lock() -> None:
+        with reader._lock:
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    held.wait(5)
+    try:
+        assert len(SparseSearch(index=reader).search("смартфоны", top_k=10)) == 5
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_bm25_tiered_merge_write_amplification():
+    """Слияние по уровням размера переписывает документ O(log N) раз."""
+    sizes: list[int] = []
+    written = 0
+    for _ in range(20000):
+        sizes.append(32)
+        written += 32
+        while selected := select_tiered_merge(sizes, segments_per_level=10, merge_factor=10):
+            merged = sum(sizes[i] for i in selected)
+            sizes = [size for i, size in enumerate(sizes) if i not in selected] + [merged]
+            written += merged
+
+    assert sum(sizes) == 20000 * 32
+    assert len(sizes) < 50
+    assert written / sum(sizes) < 6
+
+
+def test_text_analyzer_morphology(tmp_path):
+    """Анализатор приводит слова к нормальной форме и сохраняет коды ТН ВЭД."""
+    analyzer = TextAnalyzer()
+
+    assert analyzer("Смартфоны и планшеты") == ["смартфон", "планшет"]
+    assert analyzer("код 8517 12 000 0") == ["код", "8517120000", "8517", "851712"]
+    # Латинская "o" внутри кириллического слова
+    assert analyzer("тoвары") == ["товар"]
+    # Номера деклараций и ИНН не порождают позиций ТН ВЭД, аббревиатуры не лемматизируются
+    assert analyzer("Декларация 10702070/150124/0012345") == ["декларация", "10702070", "150124", "0012345"]
+    assert analyzer("Импортер ИНН 7701234567") == ["импортер", "инн", "7701234567"]
+    assert analyzer("инн") == ["инн"]
+    assert analyzer("СМАРТФОНЫ SAMSUNG") == ["смартфон", "samsung"]
+
+    index = BM25Index(tmp_path / "bm25", tokenizer=analyzer)
+    index.add_documents(
+        [
+            {"chunk_id": "a", "content": "Смартфоны Samsung, код 8517120000"},
+            {"chunk_id": "b", "content": "Ноутбуки Apple, код 8471300000"},
+        ]
+    )
+    index.commit()
+
+    search = SparseSearch(index=index)
+    assert [r["chunk_id"] for r in search.search("смартфон", top_k=5)] == ["a"]
+    assert [r["chunk_id"] for r in search.search("8471", top_k=5)] == ["b"]
+
+
 def test_hybrid_search():
     """Тест гибридного поиска."""
     search = HybridSearch()
     
     # Тест требует настроенной векторной БД, поэтому может быть пропущен в unit тестах
     pytest.skip("Требует настроенной векторной БД")
+
+
+async def test_hybrid_asearch_runs_dense_and_sparse_concurrently():
+    """Dense и sparse поиск в asearch выполняются одновременно."""
+    dense_started = threading.Event()
+    sparse_started = threading.Event()
+
+    class Dense:
+        async def asearch(self, query, top_k=10, filters=None):
+            dense_started.set()
+            # Ждет начала sparse поиска, не блокируя event loop
+            self.overlapped = await asyncio.to_thread(sparse_started.wait, 5)
+            return [{"chunk_id": "a", "score": 0.9}]
+
+    class Sparse:
+        def search(self, query, top_k=10, declaration_ids=None):
+            sparse_started.set()
+            self.overlapped = dense_started.wait(5)
+            return [{"chunk_id": "b", "score": 3.0}]
+
+    search = HybridSearch(sparse_search=Sparse(), dense_search=Dense(), alpha=0.5)
+
+    results = await search.asearch("телефоны", top_k=2)
+
+    assert {r["chunk_id"] for r in results} == {"a", "b"}
+    assert search.dense_search.overlapped and search.sparse_search.overlapped
+
+
+async def test_hybrid_search_filters_sparse_results(tmp_path):
+    """Фильтры по метаданным применяются и к результатам BM25."""
+
+    class NoDense:
+        def search(self, query, top_k=10, filters=None):
+            return []
+
+        async def asearch(self, query, top_k=10, filters=None):
+            return []
+
+    sparse = SparseSearch(index=BM25Index(tmp_path / "bm25"))
+    sparse.index_chunks(
+        [
+            DeclarationChunk(
+                chunk_id=f"{declaration_id}-0",
+                declaration_id=declaration_id,
+                content="смартфоны Samsung Galaxy",
+                chunk_index=0,
+                metadata={"product_code": product_code},
+            )
+            for declaration_id, product_code in [("D1", "8517"), ("D2", "9999"), ("D3", "8517")]
+        ]
+    )
+    search = HybridSearch(sparse_search=sparse, dense_search=NoDense(), alpha=0.5)
+
+    assert {r["declaration_id"] for r in search.search("смартфоны", top_k=5)} == {"D1", "D2", "D3"}
+    filters = {"product_code": "8517"}
+    assert {r["declaration_id"] for r in search.search("смартфоны", top_k=5, filters=filters)} == {"D1", "D3"}
+    assert {r["declaration_id"] for r in await search.asearch("смартфоны", top_k=5, filters=filters)} == {"D1", "D3"}
+
+
+def test_hybrid_search_fuzzy_company_prefilter():
+    """Нечеткий фильтр компании заменяется списком деклараций-кандидатов."""
+
+    class FakeDense:
+        def search(self, query, top_k=10, filters=None):
+            self.filters = filters
+            return [{"chunk_id": "a", "declaration_id": "D1", "score": 0.9}]
+
+    class FakeSparse:
+        def search(self, query, top_k=10, declaration_ids=None):
+            self.declaration_ids = declaration_ids
+            results = [
+                {"chunk_id": "b", "declaration_id": "D2", "score": 3.0},
+                {"chunk_id": "c", "declaration_id": "D9", "score": 2.0},
+            ]
+            return [r for r in results if declaration_ids is None or r["declaration_id"] in declaration_ids]
+
+    class FakeMetadataStore:
+        def lookup_companies(self, query, fields=None, tenant_id=None):
+            assert query == "самсунг" and fields == ["manufacturer"]
+            return [("D1", 0.8), ("D2", 0.6)]
+
+    search = HybridSearch(
+        sparse_search=FakeSparse(), dense_search=FakeDense(), metadata_store=FakeMetadataStore(), alpha=0.5
+    )
+
+    results = search.search("телефоны", top_k=5, filters={"manufacturer": {"match": "самсунг"}, "country_origin": "KR"})
+
+    assert search.dense_search.filters == {"country_origin": "KR", "declaration_id": ["D1", "D2"]}
+    assert search.sparse_search.declaration_ids == {"D1", "D2"}
+    assert {r["chunk_id"] for r in results} == {"a", "b"}
@@ -0,0 +1,493 @@
+"""Тесты хранилищ."""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    BinaryQuantization,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarType,
+    SearchParams,
+)
+from sqlalchemy import create_engine, inspect, text
+
+from dt_xml.chunker.semantic_chunker import SemanticChunker
+from dt_xml.config.models import (
+    DeclarationChunk,
+    DeclarationMetadata,
+    DeclarationStatus,
+    DeclarationType,
+)
+from dt_xml.config.settings import ChunkingSettings, get_settings
+from dt_xml.storage import migrations
+from dt_xml.storage.local_vector_store import LocalVectorStore
+from dt_xml.storage.metadata_store import MetadataStore
+from dt_xml.storage.vector_store import VectorStore
+
+
+def make_vector_store(vector_size: int = 4, client: QdrantClient | None = None) -> VectorStore:
+    """Хранилище векторов поверх локального Qdrant в памяти."""
+    return VectorStore(
+        client=client or QdrantClient(":memory:"),
+        collection_name="test_declarations",
+        vector_size=vector_size,
+    )
+
+
+def test_add_chunks_bulk_upsert():
+    """Массовая запись сохраняет векторы и payload всех чанков."""
+    store = make_vector_store()
+    chunks = [
+        DeclarationChunk(
+            chunk_id=f"decl-{i}_chunk_0",
+            declaration_id=f"decl-{i}",
+            content=f"товар {i}",
+            chunk_index=0,
+            metadata={"hs_code": "8517130000"} if i % 2 else {},
+        )
+        for i in range(10)
+    ]
+    embeddings = np.eye(10, 4, dtype=np.float32) + 0.1
+
+    store.add_chunks(chunks, embeddings)
+
+    assert store.client.count(store.collection_name).count == 10
+    results = store.search(embeddings[3], top_k=1)
+    assert results[0]["declaration_id"] == "decl-3"
+    assert results[0]["metadata"]["hs_code"] == "8517130000"
+    assert "hs_code" not in store.search(embeddings[2], top_k=1)[0]["metadata"]
+
+
+def test_upsert_arrays_parallel_only_for_bulk_loads(monkeypatch):
+    """Небольшие записи идут через upsert, массовая загрузка — через upload_collection."""
+
+    class RecordingClient(QdrantClient):
+        parallel: list[int] = []
+        waits: list[bool] = []
+
+        def upsert(self, *args, wait=True, **kwargs):
+            self.waits.append(wait)
+            return super().upsert(*args, wait=wait, **kwargs)
+
+        def upload_collection(self, *args, parallel=1, **kwargs):
+            self.parallel.append(parallel)
+            # Воркеры не видят коллекцию в памяти родительского процесса
+            return super().upload_collection(*args, parallel=1, **kwargs)
+
+    store = make_vector_store(client=RecordingClient(":memory:"))
+    monkeypatch.setattr(store.settings.vector_db, "upload_batch_size", 4)
+    monkeypatch.setattr(store.settings.vector_db, "upload_parallel_min_points", 20)
+    monkeypatch.setattr(store.settings.vector_db, "upload_parallel", 3)
+
+    store.upsert_arrays(list(range(10)), np.ones((10, 4)), {"declaration_id": ["small"] * 10})
+    assert RecordingClient.parallel == []
+    assert RecordingClient.waits == [False, False, True]
+    assert store.client.count(store.collection_name).count == 10
+
+    store.upsert_arrays(list(range(100, 130)), np.ones((30, 4)), {"declaration_id": ["bulk"] * 30})
+    assert RecordingClient.parallel == [3]
+    assert store.client.count(store.collection_name).count == 40
+
+
+def test_reindex_writes_only_changed_chunks():
+    """Повторная индексация перезаписывает те же точки и удаляет устаревшие."""
+    store = make_vector_store()
+    settings = get_settings().model_copy(
+        update={"chunking": ChunkingSettings(chunk_size=20, chunk_overlap=0, min_chunk_size=1)}
+    )
+    chunker = SemanticChunker(settings=settings)
+
+    chunks = chunker._chunk_by_size("decl-1", "смартфоны Samsung Galaxy импорт из Китая Вьетнам пылесосы бытовые")
+    assert [c.chunk_id for c in chunks] == [
+        c.chunk_id for c in chunker._chunk_by_size("decl-1", "смартфоны Samsung Galaxy импорт из Китая Вьетнам пылесосы бытовые")
+    ]
+    store.add_chunks(chunks, np.ones((len(chunks), 4), dtype=np.float32))
+
+    updated = chunker._chunk_by_size("decl-1", "смартфоны Samsung Galaxy импорт")
+    existing = store.get_chunk_hashes(["decl-1"])["decl-1"]
+    changed, stale = store.diff_chunks(updated, existing)
+
+    assert len(existing) == len(chunks) > len(updated)
+    assert [c.chunk_id for c in changed] == [updated[-1].chunk_id]
+    assert len(stale) == len(chunks) - len(updated)
+
+    store.add_chunks(changed, np.ones((len(changed), 4), dtype=np.float32))
+    store.delete_points(stale)
+    assert store.diff_chunks(updated, store.get_chunk_hashes(["decl-1"])["decl-1"]) == ([], [])
+
+
+def test_search_filters_by_payload_fields():
+    """Фильтры переводятся в условия Qdrant по полям payload верхнего уровня."""
+    store = make_vector_store()
+    chunks = [
+        DeclarationChunk(
+            chunk_id=f"decl-{i}_chunk_0",
+            declaration_id=f"decl-{i}",
+            content=f"товар {i}",
+            chunk_index=0,
+            metadata={"country_origin": country, "date_issued": f"2024-0{i + 1}-15T00:00:00", "quantity": i},
+        )
+        for i, country in enumerate(["CN", "VN", "CN", "KZ"])
+    ]
+    store.add_chunks(chunks, np.ones((4, 4), dtype=np.float32))
+
+    def found(filters):
+        return sorted(r["declaration_id"] for r in store.search(np.ones(4), top_k=10, filters=filters))
+
+    assert found({"country_origin": "CN"}) == ["decl-0", "decl-2"]
+    assert found({"country_origin": ["VN", "KZ"]}) == ["decl-1", "decl-3"]
+    assert found({"quantity": {"gte": 2}}) == ["decl-2", "decl-3"]
+    assert found({"date_issued": {"gte": "2024-02-01", "lt": "2024-04-01"}}) == ["decl-1", "decl-2"]
+    assert store._payload_index_fields()["date_issued"] == PayloadSchemaType.DATETIME
+
+
+def test_quantization_and_search_params(monkeypatch):
+    """Квантизация коллекции и параметры поиска строятся из настроек vector_db."""
+    store = make_vector_store()
+    quantization = store.settings.vector_db.quantization
+    monkeypatch.setitem(store.settings.vector_db.hnsw, "ef", 64)
+
+    monkeypatch.setitem(quantization, "type", "none")
+    assert store._quantization_config() is None
+    assert store._search_params() == SearchParams(hnsw_ef=64, quantization=None)
+
+    monkeypatch.setitem(quantization, "type", "scalar")
+    monkeypatch.setitem(quantization, "quantile", 0.95)
+    config = store._quantization_config()
+    assert isinstance(config, ScalarQuantization)
+    assert config.scalar.type == ScalarType.INT8 and config.scalar.quantile == 0.95 and config.scalar.always_ram
+
+    monkeypatch.setitem(quantization, "type", "binary")
+    monkeypatch.setitem(quantization, "always_ram", False)
+    config = store._quantization_config()
+    assert isinstance(config, BinaryQuantization) and config.binary.always_ram is False
+
+    monkeypatch.setitem(quantization, "rescore", False)
+    monkeypatch.setitem(quantization, "oversampling", 3.0)
+    assert store._search_params() == SearchParams(
+        hnsw_ef=64, quantization=QuantizationSearchParams(rescore=False, oversampling=3.0)
+    )
+
+    monkeypatch.setitem(quantization, "type", "pq")
+    with pytest.raises(ValueError):
+        store._quantization_config()
+
+
+def test_local_vector_store_persists_and_compacts(tmp_path):
+    """Локальное хранилище переживает перезапуск, удаляет и компактирует строки."""
+    store = LocalVectorStore(tmp_path, vector_size=4, compact_ratio=0.5)
+    chunks = [
+        DeclarationChunk(
+            chunk_id=f"decl-{i % 2}_chunk_{i}",
+            declaration_id=f"decl-{i % 2}",
+            content=f"товар {i}",
+            chunk_index=i,
+            metadata={"country_origin": "CN" if i < 3 else "KZ", "quantity": i},
+        )
+        for i in range(6)
+    ]
+    embeddings = np.eye(6, 4, dtype=np.float32) + 0.1
+    store.add_chunks(chunks, embeddings)
+    store.add_chunks(chunks[:1], embeddings[:1])  # перезапись той же точки
+    store.close()
+
+    store = LocalVectorStore(tmp_path, vector_size=4, compact_ratio=0.5)
+    assert store.get_collection_info()["vectors_count"] == 6
+    assert store.search(embeddings[2], top_k=1)[0]["chunk_id"] == "decl-0_chunk_2"
+    assert [r["chunk_id"] for r in store.search(embeddings[0], top_k=2, filters={"quantity": {"gte": 4}})] == [
+        "decl-0_chunk_4",
+        "decl-1_chunk_5",
+    ]
+    assert {r["chunk_id"] for r in store.search(embeddings[0], top_k=10, filters={"country_origin": ["KZ"]})} == {
+        "decl-1_chunk_3",
+        "decl-0_chunk_4",
+        "decl-1_chunk_5",
+    }
+
+    store.delete_by_declaration_id("decl-1")
+    assert store.get_collection_info()["generation"] == 1
+    store.close()
+
+    store = LocalVectorStore(tmp_path, vector_size=4)
+    assert sorted(store.get_chunk_hashes(["decl-0", "decl-1"])["decl-0"]) == sorted(
+        store.point_id(chunk.chunk_id) for chunk in chunks[::2]
+    )
+    assert {r["declaration_id"] for r in store.search(embeddings[1], top_k=10)} == {"decl-0"}
+
+
+def test_local_vector_store_ivf_recall(tmp_path):
+    """IVF индекс находит ближайших соседей, просматривая часть кластеров."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(16, 8))
+    vectors = (centers[rng.integers(0, 16, size=2000)] + rng.normal(scale=0.1, size=(2000, 8))).astype(np.float32)
+
+    store = LocalVectorStore(tmp_path, vector_size=8, index="ivf", nlist=16, nprobe=4, ivf_min_rows=1000)
+    store.upsert_arrays(list(range(2000)), vectors, {"chunk_id": [str(i) for i in range(2000)]})
+
+    hits = sum(store.search(vectors[i], top_k=1)[0]["chunk_id"] == str(i) for i in range(0, 2000, 20))
+    assert store.get_collection_info()["index"] == "ivf"
+    assert hits >= 95
+
+
+def test_local_vector_store_two_writers(tmp_path):
+    """Два экземпляра на одной директории не ссылаются на строки друг друга."""
+    first = LocalVectorStore(tmp_path, vector_size=4, compact_ratio=0.5)
+    second = LocalVectorStore(tmp_path, vector_size=4, compact_ratio=0.5)
+
+    first.upsert_arrays(["a"], np.array([[1.0, 0, 0, 0]]), {"declaration_id": ["A"]})
+    second.upsert_arrays(["b"], np.array([[0, 1.0, 0, 0]]), {"declaration_id": ["B"]})
+    first.upsert_arrays(["c"], np.array([[0, 0, 1.0, 0]]), {"declaration_id": ["C"]})
+
+    for store in (first, second, LocalVectorStore(tmp_path, vector_size=4)):
+        for i, declaration_id in enumerate("ABC"):
+            result = store.search(np.eye(4)[i], top_k=1)[0]
+            assert result["declaration_id"] == declaration_id and result["score"] == pytest.approx(1.0)
+
+    # Компакция в одном экземпляре переключает поколение у другого
+    second.delete_by_declaration_ids(["A", "B"])
+    assert second.get_collection_info()["generation"] == 1
+    assert first.get_chunk_hashes(["A", "B", "C"]).keys() == {"C"}
+    first.upsert_arrays(["d"], np.array([[0, 0, 0, 1.0]]), {"declaration_id": ["D"]})
+    assert second.search(np.eye(4)[3], top_k=1)[0]["declaration_id"] == "D"
+    assert second.search(np.eye(4)[2], top_k=1)[0]["score"] == pytest.approx(1.0)
+
+
+def test_delete_by_declaration_ids_removes_all_points(monkeypatch):
+    """Массовое удаление по фильтру удаляет все точки деклараций пачками."""
+    store = make_vector_store()
+    monkeypatch.setattr(store.settings.vector_db, "delete_batch_size", 2)
+    chunks = [
+        DeclarationChunk(
+            chunk_id=f"decl-{i % 5}_chunk_{i}",
+            declaration_id=f"decl-{i % 5}",
+            content="товар",
+            chunk_index=i,
+        )
+        for i in range(50)
+    ]
+    store.add_chunks(chunks, np.ones((50, 4), dtype=np.float32))
+
+    store.delete_by_declaration_ids(["decl-0", "decl-1", "decl-2", "decl-unknown"])
+    store.delete_by_declaration_id("decl-3")
+
+    assert store.client.count(store.collection_name).count == 10
+    assert set(store.get_chunk_hashes([f"decl-{i}" for i in range(5)])) == {"decl-4"}
+
+
+def make_metadata_store(tmp_path) -> MetadataStore:
+    """Хранилище метаданных поверх SQLite во временном каталоге."""
+    store = MetadataStore(engine=create_engine(f"sqlite:///{tmp_path / 'metadata.db'}"))
+    store.create_schema()
+    return store
+
+
+async def test_async_metadata_store(tmp_path):
+    """Асинхронные методы хранилища работают через асинхронный движок."""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    store = MetadataStore(
+        engine=create_engine(f"sqlite:///{tmp_path / 'metadata.db'}"),
+        async_engine=create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metadata.db'}"),
+    )
+    store.create_schema()
+
+    ids = await store.asave_metadata_many(
+        [
+            DeclarationMetadata(
+                declaration_number=f"N{i}",
+                date_issued=datetime(2024, 3, 1 + i),
+                declaration_type=DeclarationType.IMPORT,
+                status=DeclarationStatus.RELEASED,
+                country_origin="CN" if i % 2 else "KZ",
+            )
+            for i in range(4)
+        ]
+    )
+
+    assert ids == ["N0", "N1", "N2", "N3"]
+    assert (await store.aget_metadata("N2")).date_issued == datetime(2024, 3, 3)
+    assert await store.aget_metadata("missing") is None
+    found = await store.asearch_by_filters({"country_origin": "CN"})
+    assert sorted(metadata.declaration_number for metadata in found) == ["N1", "N3"]
+    assert (await store.aping())["status"] == "connected"
+    await store.async_engine.dispose()
+
+
+def test_save_metadata_many_upserts(tmp_path):
+    """Массовое сохранение вставляет новые и обновляет существующие строки."""
+    store = make_metadata_store(tmp_path)
+
+    def make(number: str, importer: str) -> DeclarationMetadata:
+        return DeclarationMetadata(
+            declaration_number=number,
+            date_issued=datetime(2024, 3, 1),
+            declaration_type=DeclarationType.IMPORT,
+            status=DeclarationStatus.RELEASED,
+            importer=importer,
+        )
+
+    ids = store.save_metadata_many([make(f"N{i}", "ТОО А") for i in range(5)], batch_size=2)
+    assert ids == [f"N{i}" for i in range(5)]
+
+    store.save_metadata_many([make("N1", "ТОО Б"), make("N7", "ТОО В"), make("N1", "ТОО Г")], batch_size=2)
+
+    assert store.get_metadata("N1").importer == "ТОО Г"
+    assert store.get_metadata("N7").importer == "ТОО В"
+    assert store.get_metadata("N3").date_issued == datetime(2024, 3, 1)
+    assert len(store.search_by_filters({})) == 6
+
+
+def test_search_by_filters_numeric_ranges(tmp_path):
+    """Диапазоны по числовым колонкам сравниваются как числа, а не строки."""
+    store = make_metadata_store(tmp_path)
+    store.save_metadata_many(
+        [
+            DeclarationMetadata(
+                declaration_number=f"N{i}",
+                date_issued=datetime(2024, 1, i + 1),
+                declaration_type=DeclarationType.IMPORT,
+                status=DeclarationStatus.RELEASED,
+                product_code="8471300000",
+                customs_value=value,
+                tenant_id="acme" if i % 2 else "default",
+            )
+            for i, value in enumerate([9.5, 100.0, 950.25, 1200.0, 15000.0])
+        ]
+    )
+
+    found = store.search_by_filters({"customs_value": {"gte": 100, "lt": 2000}})
+    assert [m.declaration_number for m in found] == ["N3", "N2", "N1"]
+    assert found[1].customs_value == 950.25
+
+    found = store.search_by_filters({"tenant_id": "acme", "date_issued_from": datetime(2024, 1, 3)})
+    assert [m.declaration_number for m in found] == ["N3"]
+    assert store.search_by_filters({"product_code": ["8471300000"], "customs_value_to": 10})[0].tenant_id == "default"
+
+
+def test_migrates_legacy_metadata_table(tmp_path, monkeypatch):
+    """Таблица исходной схемы получает колонку заказчика, новые индексы и ключи компаний."""
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH_SIZE", 2)
+    engine = create_engine(f"sqlite:///{tmp_path / 'metadata.db'}")
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE declaration_metadata (declaration_id VARCHAR PRIMARY KEY, "
+                "declaration_number VARCHAR NOT NULL, date_issued DATETIME NOT NULL, "
+                "declaration_type VARCHAR NOT NULL, status VARCHAR NOT NULL, manufacturer VARCHAR, "
+                "importer VARCHAR, exporter VARCHAR, product_code VARCHAR, country_origin VARCHAR, "
+                "customs_value VARCHAR, currency VARCHAR, quantity VARCHAR, unit_of_measure VARCHAR, "
+                "language VARCHAR, version VARCHAR, source VARCHAR, processed_at DATETIME, metadata_json JSON)"
+            )
+        )
+        connection.execute(text("CREATE INDEX ix_declaration_metadata_importer ON declaration_metadata (importer)"))
+        for number in ("N1", "N2", "N3"):
+            connection.execute(
+                text(
+                    "INSERT INTO declaration_metadata (declaration_id, declaration_number, date_issued, "
+                    "declaration_type, status, importer, customs_value, language, version) VALUES (:id, :id, "
+                    "'2024-01-01 00:00:00', 'import', 'released', 'ТОО А', '150.5', 'ru', '1.0')"
+                ),
+                {"id": number},
+            )
+
+    store = make_metadata_store(tmp_path)
+    store.create_schema()
+
+    inspector = inspect(store.engine)
+    columns = {column["name"] for column in inspector.get_columns("declaration_metadata")}
+    indexes = {index["name"] for index in inspector.get_indexes("declaration_metadata")}
+    assert "tenant_id" in columns and "metadata_json" not in columns
+    assert "ix_declaration_metadata_importer" not in indexes
+    assert "ix_declaration_metadata_importer_date" in indexes
+    metadata = store.get_metadata("N1")
+    assert metadata.tenant_id == "default" and metadata.customs_value == 150.5
+    with store.engine.connect() as connection:
+        keys = connection.execute(text("SELECT importer_key FROM declaration_metadata")).scalars().all()
+    assert len(keys) == 3 and all(keys)
+
+
+def test_lookup_companies_transliterated(tmp_path):
+    """Поиск компании по транслитерированному и частичному названию."""
+    store = make_metadata_store(tmp_path)
+    store.save_metadata_many(
+        [
+            DeclarationMetadata(
+                declaration_number=number,
+                date_issued=datetime(2024, 1, 1),
+                declaration_type=DeclarationType.IMPORT,
+                status=DeclarationStatus.RELEASED,
+                manufacturer=manufacturer,
+                tenant_id=tenant_id,
+            )
+            for number, manufacturer, tenant_id in [
+                ("N1", "Samsung Electronics Co., Ltd", "default"),
+                ("N2", "ТОО «Самсунг»", "acme"),
+                ("N3", "LG Electronics Inc.", "default"),
+            ]
+        ]
+    )
+
+    assert {declaration_id for declaration_id, _ in store.lookup_companies("самсунг")} == {"N1", "N2"}
+    assert [declaration_id for declaration_id, _ in store.lookup_companies("самсунг", tenant_id="acme")] == ["N2"]
+    assert store.lookup_companies("ООО") == []
+
+
+def test_iter_metadata_keyset_pages(tmp_path):
+    """Потоковый обход проходит все строки по страницам без повторов."""
+    store = make_metadata_store(tmp_path)
+    store.save_metadata_many(
+        [
+            DeclarationMetadata(
+                declaration_number=f"N{i:02d}",
+                date_issued=datetime(2024, 1, 1 + i % 3),
+                declaration_type=DeclarationType.IMPORT,
+                status=DeclarationStatus.RELEASED,
+                tenant_id="acme" if i % 2 else "default",
+            )
+            for i in range(25)
+        ]
+    )
+
+    rows = list(store.iter_metadata(columns=["declaration_id"], page_size=4, batch_size=3))
+    assert len(rows) == 25 and len({row.declaration_id for row in rows}) == 25
+    assert [(row.date_issued, row.declaration_id) for row in rows] == sorted(
+        (row.date_issued, row.declaration_id) for row in rows
+    )
+
+    acme = [row.declaration_id for row in store.iter_metadata({"tenant_id": "acme"}, page_size=5)]
+    assert len(acme) == 12
+
+
+def test_iter_metadata_arrow_batches(tmp_path):
+    """Выгрузка в Arrow сохраняет типы колонок и размер пачек."""
+    pa = pytest.importorskip("pyarrow")
+    store = make_metadata_store(tmp_path)
+    store.save_metadata_many(
+        [
+            DeclarationMetadata(
+                declaration_number=f"N{i}",
+                date_issued=datetime(2024, 2, 1 + i),
+                declaration_type=DeclarationType.IMPORT,
+                status=DeclarationStatus.RELEASED,
+                customs_value=100.5 * i,
+            )
+            for i in range(5)
+        ]
+    )
+
+    batches = list(
+        store.iter_metadata_arrow(columns=["declaration_id", "customs_value"], page_size=2, batch_size=2)
+    )
+    table = pa.Table.from_batches(batches)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert table.column_names == ["declaration_id", "customs_value", "date_issued"]
+    assert pa.types.is_decimal(table.schema.field("customs_value").type)
+    assert pa.types.is_timestamp(table.schema.field("date_issued").type)
+    assert table.column("declaration_id").to_pylist() == [f"N{i}" for i in range(5)]
+    assert float(table.column("customs_value")[3].as_py()) == 301.5